@@ -0,0 +1,55 @@
+import argparse
+import sys
+sys.path.append("..")
+sys.path.append("../src")
+from src.phantoms_OhGreat.dataset import generate_dataset, FAMILIES
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-out_dir', action='store',
+                        dest='out_dir', type=str,
+                        default='../datasets/dart_dataset',
+                        help="Directory of the dataset.")
+    parser.add_argument('-n', action='store',
+                        dest='n', type=int,
+                        default=1000,
+                        help="Number of (phantom, sinogram) pairs to generate.")
+    parser.add_argument('-families', action='store', nargs='+',
+                        dest='families', type=str,
+                        default=FAMILIES,
+                        help="Phantom families to generate.")
+    parser.add_argument('-img_sizes', action='store', nargs='+',
+                        dest='img_sizes', type=int,
+                        default=[256],
+                        help="Image sizes, 256 or 512.")
+    parser.add_argument('-angles', action='store', nargs='+',
+                        dest='angles', type=int,
+                        default=[50],
+                        help="Numbers of projection angles.")
+    parser.add_argument('-noises', action='store', nargs='+',
+                        dest='noises', type=float,
+                        default=None,
+                        help="Noise factors, noiseless sinograms when not defined.")
+    parser.add_argument('-shard_size', action='store',
+                        dest='shard_size', type=int,
+                        default=64,
+                        help="Number of samples of each shard.")
+    parser.add_argument('-seed', action='store',
+                        dest='seed', type=int,
+                        default=0,
+                        help="Seed of the dataset.")
+    parser.add_argument('-workers', action='store',
+                        dest='workers', type=int,
+                        default=None,
+                        help="Number of processes, defaults to the cpu count.")
+    args = parser.parse_args()
+
+    index = generate_dataset(args.out_dir, args.n, families=args.families,
+                            img_sizes=args.img_sizes, angle_sets=args.angles,
+                            noise_levels=args.noises or [None],
+                            shard_size=args.shard_size, seed=args.seed,
+                            n_workers=args.workers)
+    print("Dataset index:", index)
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,8 @@
 import astra
 import random
 import numpy as np
-from PIL import Image
-from os.path import exists
-from os import listdir, makedirs
+from os.path import exists, basename
+from os import makedirs
 import sys
 sys.path.append("..")
 sys.path.append("../src")
@@ -13,6 +12,7 @@ from src.algorithms_OhGreat.SART import *
 from src.algorithms_OhGreat.SIRT import *
 from src.algorithms_OhGreat.FBP import *
 from src.projections_OhGreat.project import *
+from src.utils_OhGreat.loader import load_phantoms
 
 def main():
     # total iterations for comparison algorithms
@@ -36,7 +36,9 @@ def main():
         # input directory
         in_dir = base_in_dir + f"{curr_phantom}/"
     
-        for phantom_name in sorted(listdir(in_dir)):
+        # the next phantoms are read while the current one is reconstructed
+        for phantom_path, phantom in load_phantoms(in_dir):
+            phantom_name = basename(phantom_path)
             # skip already done experiments
             #if 'semilunar_0' in phantom_name or 'semilunar_1' in phantom_name:
             #    continue
@@ -45,8 +47,6 @@ def main():
             if not exists(out_dir_noise):
                     makedirs(out_dir_noise)
 
-            # choose a phantom
-            phantom = np.array(Image.open(in_dir+phantom_name), dtype=np.uint8)
             img_width, img_height = phantom.shape
             gray_values = np.unique(phantom).astype(np.float32)
             print("~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~")
@@ -73,22 +73,22 @@ def main():
                                                                 detector_spacing=det_spacing,
                                                                 angles=angles,
                                                                 noise_factor=None,
-                                                                use_gpu=True)
+                                                                use_gpu="auto")
                 proj_geom = astra.create_proj_geom('parallel', det_spacing, 
                                                     n_detectors, angles)
 
                 # SART
                 _, sart_res = SART(vol_geom, 0, projector_id, sino_id, 
-                                            iters, use_gpu=True)
+                                            iters, use_gpu="auto")
                 p_fixed_sart.append(np.abs(phantom - sart_res).mean())
 
                 # SIRT
-                _, sirt_res = SIRT(vol_geom, 0, sino_id, iters, use_gpu=True)
+                _, sirt_res = SIRT(vol_geom, 0, sino_id, iters, use_gpu="auto")
                 p_fixed_sirt.append(np.abs(phantom - sirt_res).mean())
 
                 # RBF
                 _, fbp_res = FBP(vol_geom, 0, projector_id, sino_id, 
-                                        iters, use_gpu=True)
+                                        iters, use_gpu="auto")
                 p_fixed_rbf.append(np.abs(phantom - fbp_res).mean())
 
                 # DART with SART
@@ -96,7 +96,7 @@ def main():
                     proj_geom=proj_geom, projector_id=projector_id,
                     sinogram=sinogram)
                 # run the algorithm
-                dart_res = d.run(iters=dart_iters,rec_alg="SART_CUDA",rec_iter=rec_alg_iters)
+                dart_res = d.run(iters=dart_iters,rec_alg="SART_AUTO",rec_iter=rec_alg_iters)
                 p_fixed_dart_sart.append(np.abs(phantom - dart_res).mean())
 
                 # DART with SIRT
@@ -104,7 +104,7 @@ def main():
                     proj_geom=proj_geom, projector_id=projector_id,
                     sinogram=sinogram)
                 # run the algorithm
-                dart_res = d.run(iters=dart_iters,rec_alg="SIRT_CUDA",rec_iter=rec_alg_iters)
+                dart_res = d.run(iters=dart_iters,rec_alg="SIRT_AUTO",rec_iter=rec_alg_iters)
                 p_fixed_dart_sirt.append(np.abs(phantom - dart_res).mean())
 
                 # DART with FBP
@@ -112,7 +112,7 @@ def main():
                     proj_geom=proj_geom, projector_id=projector_id,
                     sinogram=sinogram)
                 # run the algorithm
-                dart_res = d.run(iters=dart_iters,rec_alg="FBP_CUDA",rec_iter=rec_alg_iters)
+                dart_res = d.run(iters=dart_iters,rec_alg="FBP_AUTO",rec_iter=rec_alg_iters)
                 p_fixed_dart_fbp.append(np.abs(phantom - dart_res).mean())
 
             np.save(out_dir_noise+"SART", p_fixed_sart)
@@ -66,22 +66,22 @@ def main():
                                                                 detector_spacing=det_spacing,
                                                                 angles=angles,
                                                                 noise_factor=noise,
-                                                                use_gpu=True)
+                                                                use_gpu="auto")
                 proj_geom = astra.create_proj_geom('parallel', det_spacing, 
                                                     n_detectors, angles)
 
                 # SART
                 _, sart_res = SART(vol_geom, 0, projector_id, sino_id, 
-                                            iters, use_gpu=True)
+                                            iters, use_gpu="auto")
                 noise_errors_sart.append(np.abs(phantom - sart_res).mean())
 
                 # SIRT
-                _, sirt_res = SIRT(vol_geom, 0, sino_id, iters, use_gpu=True)
+                _, sirt_res = SIRT(vol_geom, 0, sino_id, iters, use_gpu="auto")
                 noise_errors_sirt.append(np.abs(phantom - sirt_res).mean())
 
                 # RBF
                 _, fbp_res = FBP(vol_geom, 0, projector_id, sino_id, 
-                                        iters, use_gpu=True)
+                                        iters, use_gpu="auto")
                 noise_errors_rbf.append(np.abs(phantom - fbp_res).mean())
 
                 # DART with SART
@@ -90,7 +90,7 @@ def main():
                     proj_geom=proj_geom, projector_id=projector_id,
                     sinogram=sinogram)
                 # run the algorithm
-                dart_res = d.run(iters=dart_iters,rec_alg="SART_CUDA",rec_iter=rec_alg_iters)
+                dart_res = d.run(iters=dart_iters,rec_alg="SART_AUTO",rec_iter=rec_alg_iters)
                 noise_errors_dart_sart.append(np.abs(phantom - dart_res).mean())
 
                 # DART with SIRT
@@ -99,7 +99,7 @@ def main():
                     proj_geom=proj_geom, projector_id=projector_id,
                     sinogram=sinogram)
                 # run the algorithm
-                dart_res = d.run(iters=dart_iters,rec_alg="SIRT_CUDA",rec_iter=rec_alg_iters)
+                dart_res = d.run(iters=dart_iters,rec_alg="SIRT_AUTO",rec_iter=rec_alg_iters)
                 noise_errors_dart_sirt.append(np.abs(phantom - dart_res).mean())
 
                 # DART with FBP
@@ -107,7 +107,7 @@ def main():
                     proj_geom=proj_geom, projector_id=projector_id,
                     sinogram=sinogram)
                 # run the algorithm
-                dart_res = d.run(iters=dart_iters,rec_alg="FBP_CUDA",rec_iter=rec_alg_iters)
+                dart_res = d.run(iters=dart_iters,rec_alg="FBP_AUTO",rec_iter=rec_alg_iters)
                 noise_errors_dart_fbp.append(np.abs(phantom - dart_res).mean())
 
             np.save(out_dir_noise+"SART", noise_errors_sart)
@@ -72,22 +72,22 @@ def main():
                                                                 detector_spacing=det_spacing,
                                                                 angles=angles,
                                                                 noise_factor=None,
-                                                                use_gpu=True)
+                                                                use_gpu="auto")
                 proj_geom = astra.create_proj_geom('parallel', det_spacing, 
                                                     n_detectors, angles)
 
                 # SART
                 _, sart_res = SART(vol_geom, 0, projector_id, sino_id, 
-                                            iters, use_gpu=True)
+                                            iters, use_gpu="auto")
                 gray_val_err_sart.append(np.abs(phantom - sart_res).mean())
 
                 # SIRT
-                _, sirt_res = SIRT(vol_geom, 0, sino_id, iters, use_gpu=True)
+                _, sirt_res = SIRT(vol_geom, 0, sino_id, iters, use_gpu="auto")
                 gray_val_err_sirt.append(np.abs(phantom - sirt_res).mean())
 
                 # RBF
                 _, fbp_res = FBP(vol_geom, 0, projector_id, sino_id, 
-                                        iters, use_gpu=True)
+                                        iters, use_gpu="auto")
                 gray_val_err_rbf.append(np.abs(phantom - fbp_res).mean())
 
                 # DART with SART
@@ -95,7 +95,7 @@ def main():
                     proj_geom=proj_geom, projector_id=projector_id,
                     sinogram=sinogram)
                 # run the algorithm
-                dart_res = d.run(iters=dart_iters,rec_alg="SART_CUDA",rec_iter=rec_alg_iters)
+                dart_res = d.run(iters=dart_iters,rec_alg="SART_AUTO",rec_iter=rec_alg_iters)
                 gray_val_err_dart_sart.append(np.abs(phantom - dart_res).mean())
 
                 # DART with SIRT
@@ -103,7 +103,7 @@ def main():
                     proj_geom=proj_geom, projector_id=projector_id,
                     sinogram=sinogram)
                 # run the algorithm
-                dart_res = d.run(iters=dart_iters,rec_alg="SIRT_CUDA",rec_iter=rec_alg_iters)
+                dart_res = d.run(iters=dart_iters,rec_alg="SIRT_AUTO",rec_iter=rec_alg_iters)
                 gray_val_err_dart_sirt.append(np.abs(phantom - dart_res).mean())
 
                 # DART with FBP
@@ -111,7 +111,7 @@ def main():
                     proj_geom=proj_geom, projector_id=projector_id,
                     sinogram=sinogram)
                 # run the algorithm
-                dart_res = d.run(iters=dart_iters,rec_alg="FBP_CUDA",rec_iter=rec_alg_iters)
+                dart_res = d.run(iters=dart_iters,rec_alg="FBP_AUTO",rec_iter=rec_alg_iters)
                 gray_val_err_dart_fbp.append(np.abs(phantom - dart_res).mean())
 
             np.save(out_dir_noise+"SART", gray_val_err_sart)
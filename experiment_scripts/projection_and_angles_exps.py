@@ -63,22 +63,22 @@ def main():
                                                                 detector_spacing=det_spacing,
                                                                 angles=angles,
                                                                 noise_factor=None,
-                                                                use_gpu=True)
+                                                                use_gpu="auto")
                 proj_geom = astra.create_proj_geom('parallel', det_spacing, 
                                                     n_detectors, angles)
 
                 # SART
                 _, sart_res = SART(vol_geom, 0, projector_id, sino_id, 
-                                            iters, use_gpu=True)
+                                            iters, use_gpu="auto")
                 proj_errors_sart.append(np.abs(phantom - sart_res).mean())
 
                 # SIRT
-                _, sirt_res = SIRT(vol_geom, 0, sino_id, iters, use_gpu=True)
+                _, sirt_res = SIRT(vol_geom, 0, sino_id, iters, use_gpu="auto")
                 proj_errors_sirt.append(np.abs(phantom - sirt_res).mean())
 
                 # RBF
                 _, fbp_res = FBP(vol_geom, 0, projector_id, sino_id, 
-                                        iters, use_gpu=True)
+                                        iters, use_gpu="auto")
                 proj_errors_rbf.append(np.abs(phantom - fbp_res).mean())
 
                 # DART with SART
@@ -87,7 +87,7 @@ def main():
                     proj_geom=proj_geom, projector_id=projector_id,
                     sinogram=sinogram)
                 # run the algorithm
-                dart_res = d.run(iters=dart_iters,rec_alg="SART_CUDA",rec_iter=rec_alg_iters)
+                dart_res = d.run(iters=dart_iters,rec_alg="SART_AUTO",rec_iter=rec_alg_iters)
                 proj_errors_dart_sart.append(np.abs(phantom - dart_res).mean())
 
                 # DART with SIRT
@@ -96,7 +96,7 @@ def main():
                     proj_geom=proj_geom, projector_id=projector_id,
                     sinogram=sinogram)
                 # run the algorithm
-                dart_res = d.run(iters=dart_iters,rec_alg="SIRT_CUDA",rec_iter=rec_alg_iters)
+                dart_res = d.run(iters=dart_iters,rec_alg="SIRT_AUTO",rec_iter=rec_alg_iters)
                 proj_errors_dart_sirt.append(np.abs(phantom - dart_res).mean())
 
                 # DART with FBP
@@ -104,7 +104,7 @@ def main():
                     proj_geom=proj_geom, projector_id=projector_id,
                     sinogram=sinogram)
                 # run the algorithm
-                dart_res = d.run(iters=dart_iters,rec_alg="FBP_CUDA",rec_iter=rec_alg_iters)
+                dart_res = d.run(iters=dart_iters,rec_alg="FBP_AUTO",rec_iter=rec_alg_iters)
                 proj_errors_dart_fbp.append(np.abs(phantom - dart_res).mean())
 
             np.save(out_dir_proj+"SART", proj_errors_sart)
@@ -135,22 +135,22 @@ def main():
                                                                 detector_spacing=det_spacing,
                                                                 angles=angles,
                                                                 noise_factor=None,
-                                                                use_gpu=True)
+                                                                use_gpu="auto")
                 proj_geom = astra.create_proj_geom('parallel', det_spacing, 
                                                     n_detectors, angles)
 
                 # SART
                 _, sart_res = SART(vol_geom, 0, projector_id, sino_id,
-                                            iters, use_gpu=True)
+                                            iters, use_gpu="auto")
                 ang_errors_sart.append(np.abs(phantom - sart_res).mean())
 
                 # SIRT
-                _, sirt_res = SIRT(vol_geom, 0, sino_id, iters, use_gpu=True)
+                _, sirt_res = SIRT(vol_geom, 0, sino_id, iters, use_gpu="auto")
                 ang_errors_sirt.append(np.abs(phantom - sirt_res).mean())
 
                 # FBP
                 _, fbp_res = FBP(vol_geom, 0, projector_id, sino_id, 
-                                        iters, use_gpu=True)
+                                        iters, use_gpu="auto")
                 ang_errors_rbf.append(np.abs(phantom - fbp_res).mean())
 
                 # instanciate DART with SIRT
@@ -159,7 +159,7 @@ def main():
                     proj_geom=proj_geom, projector_id=projector_id,
                     sinogram=sinogram)
                 # run the algorithm
-                dart_res = d.run(iters=dart_iters,rec_alg="SIRT_CUDA",rec_iter=rec_alg_iters)
+                dart_res = d.run(iters=dart_iters,rec_alg="SIRT_AUTO",rec_iter=rec_alg_iters)
                 ang_errors_dart_sirt.append(np.abs(phantom - dart_res).mean())
 
                 # instanciate DART with SART
@@ -168,7 +168,7 @@ def main():
                     proj_geom=proj_geom, projector_id=projector_id,
                     sinogram=sinogram)
                 # run the algorithm
-                dart_res = d.run(iters=dart_iters,rec_alg="SART_CUDA",rec_iter=rec_alg_iters)
+                dart_res = d.run(iters=dart_iters,rec_alg="SART_AUTO",rec_iter=rec_alg_iters)
                 ang_errors_dart_sart.append(np.abs(phantom - dart_res).mean())
 
                 # instanciate DART with FBP
@@ -176,7 +176,7 @@ def main():
                     proj_geom=proj_geom, projector_id=projector_id,
                     sinogram=sinogram)
                 # run the algorithm
-                dart_res = d.run(iters=dart_iters,rec_alg="FBP_CUDA",rec_iter=rec_alg_iters)
+                dart_res = d.run(iters=dart_iters,rec_alg="FBP_AUTO",rec_iter=rec_alg_iters)
                 ang_errors_dart_fbp.append(np.abs(phantom - dart_res).mean())
 
                 astra.data2d.clear()
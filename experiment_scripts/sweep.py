@@ -0,0 +1,119 @@
+import argparse
+import astra
+import numpy as np
+from PIL import Image
+from os.path import exists, abspath, basename, dirname
+from os import listdir, makedirs
+import sys
+sys.path.append("..")
+sys.path.append("../src")
+from src.algorithms_OhGreat.DART import DART
+from src.algorithms_OhGreat.SART import SART
+from src.algorithms_OhGreat.SIRT import SIRT
+from src.algorithms_OhGreat.FBP import FBP
+from src.projections_OhGreat.project import project_from_2D
+from src.utils_OhGreat.work_queue import WorkQueue
+
+def proj_ang_job(phantom_path, n_proj, angle_range, iters=10000,
+                dart_iters=10, rec_alg_iters=1000, p_fixed=0.9):
+    """ Single experiment of proj_ang_comb.py, run by the workers.
+        Returns the mean absolute error of each algorithm.
+    """
+    phantom = np.array(Image.open(phantom_path), dtype=np.uint8)
+    phant_grays = np.unique(phantom).astype(np.float32)
+    img_width, img_height = phantom.shape
+    n_detectors, det_spacing = 512, 1
+    vol_geom = astra.creators.create_vol_geom([img_width,img_height])
+    phantom_id = astra.data2d.create('-vol', vol_geom, data=phantom)
+    angles = np.linspace(0, np.pi*(angle_range/180), n_proj)
+    projector_id, sino_id, sinogram = project_from_2D(phantom_id=phantom_id,
+                                                    vol_geom=vol_geom,
+                                                    n_projections=n_proj,
+                                                    n_detectors=n_detectors,
+                                                    detector_spacing=det_spacing,
+                                                    angles=angles,
+                                                    noise_factor=None,
+                                                    use_gpu="auto")
+    proj_geom = astra.create_proj_geom('parallel', det_spacing,
+                                        n_detectors, angles)
+    errors = {}
+    _, sart_res = SART(vol_geom, 0, projector_id, sino_id, iters, use_gpu="auto")
+    errors["SART"] = np.abs(phantom - sart_res).mean()
+    _, sirt_res = SIRT(vol_geom, 0, sino_id, iters, use_gpu="auto")
+    errors["SIRT"] = np.abs(phantom - sirt_res).mean()
+    _, fbp_res = FBP(vol_geom, 0, projector_id, sino_id, iters, use_gpu="auto")
+    errors["RBF"] = np.abs(phantom - fbp_res).mean()
+    for name, alg in [("DART_sart", "SART_AUTO"), ("DART_sirt", "SIRT_AUTO"),
+                        ("DART_fbp", "FBP_AUTO")]:
+        d = DART(gray_levels=phant_grays, p=p_fixed, rec_shape=phantom.shape,
+                proj_geom=proj_geom, projector_id=projector_id,
+                sinogram=sinogram)
+        dart_res = d.run(iters=dart_iters, rec_alg=alg, rec_iter=rec_alg_iters)
+        errors[name] = np.abs(phantom - dart_res).mean()
+    # free memory
+    astra.data2d.clear()
+    astra.projector.clear()
+    astra.algorithm.clear()
+    return errors
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('action', choices=["submit", "work", "status", "collect"],
+                        help="submit the jobs of the sweep, run a worker, "
+                            "show the queue status or collect the results.")
+    parser.add_argument('-queue_dir', action='store',
+                        dest='queue_dir', type=str,
+                        default='../results/queue/proj_ang_comb',
+                        help="Queue directory, on a filesystem shared by all the nodes.")
+    parser.add_argument('-out_dir', action='store',
+                        dest='out_dir', type=str,
+                        default='../results/proj_ang_comb/',
+                        help="Directory of the collected results.")
+    parser.add_argument('-timeout', action='store',
+                        dest='timeout', type=float,
+                        default=1800,
+                        help="Seconds without heartbeat before a job is requeued.")
+    args = parser.parse_args()
+
+    queue = WorkQueue(args.queue_dir, timeout=args.timeout)
+    # sweep of proj_ang_comb.py
+    phantom_families = ["semilunars", "paws", "aliens", "clouds"]
+    n_projections = [2, 4, 6, 8, 10, 12, 14, 16, 18]
+    angle_range = [20, 40, 60, 80, 100, 120, 140, 160, 180]
+    base_in_dir = "../phantoms/"
+
+    if args.action == "submit":
+        ids = []
+        for curr_phantom in phantom_families:
+            in_dir = base_in_dir + f"{curr_phantom}/"
+            for phantom_name in sorted(listdir(in_dir)):
+                for n_proj, ang in zip(n_projections, angle_range):
+                    ids.append(queue.submit("sweep:proj_ang_job",
+                                            {"phantom_path": abspath(in_dir + phantom_name),
+                                            "n_proj": n_proj, "angle_range": ang}))
+        print(f"{len(ids)} jobs in the queue.")
+    elif args.action == "work":
+        n_jobs = queue.work()
+        print(f"Worker done, {n_jobs} jobs run.")
+    elif args.action == "status":
+        print(queue.status())
+    else:
+        # same file structure as proj_ang_comb.py
+        results = {}
+        for job in queue.results():
+            params = job["params"]
+            key = (basename(dirname(params["phantom_path"])),
+                    basename(params["phantom_path"]))
+            results.setdefault(key, {})[params["n_proj"]] = job["result"]
+        for (curr_phantom, phantom_name), res in results.items():
+            if len(res) < len(n_projections):
+                print(f"Skipping {phantom_name}, not all the jobs are done.")
+                continue
+            out_dir = args.out_dir + f"{curr_phantom}/{phantom_name}/"
+            if not exists(out_dir):
+                makedirs(out_dir)
+            for alg in res[n_projections[0]]:
+                np.save(out_dir + alg, [res[n_proj][alg] for n_proj in n_projections])
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+import argparse
+import json
+import numpy as np
+from PIL import Image
+from os import listdir
+import sys
+sys.path.append("..")
+sys.path.append("../src")
+from src.algorithms_OhGreat.tuning import tune, config_grid, make_problem
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n_proj', action='store',
+                        dest='n_proj', type=int,
+                        default=10,
+                        help="Number of projections of the tuning problems.")
+    parser.add_argument('-angle_range', action='store',
+                        dest='angle_range', type=float,
+                        default=120,
+                        help="Angular range of the projections, in degrees.")
+    parser.add_argument('-max_iters', action='store',
+                        dest='max_iters', type=int,
+                        default=10,
+                        help="DART iterations of the last round.")
+    parser.add_argument('-workers', action='store',
+                        dest='workers', type=int,
+                        default=None,
+                        help="Number of processes, defaults to the cpu count.")
+    parser.add_argument('-out', action='store',
+                        dest='out', type=str,
+                        default='../results/tuning.json',
+                        help="File to save the best configurations to.")
+    args = parser.parse_args()
+
+    # phantom family
+    phantom_families = ["semilunars", "paws", "aliens", "clouds"]
+    base_in_dir = "../phantoms/"
+    # define tunable parameters
+    configs = config_grid(p=[0., 0.25, 0.5, 0.85, 1.],
+                        rec_iter=[100, 500, 1000],
+                        smoothing=[0., 0.5, 1.],
+                        rec_alg=["SART", "SIRT", "FBP"])
+    problems = {}
+    for curr_phantom in phantom_families:
+        in_dir = base_in_dir + f"{curr_phantom}/"
+        problems[curr_phantom] = [make_problem(np.array(Image.open(in_dir+phantom_name),
+                                                        dtype=np.uint8),
+                                                n_projections=args.n_proj,
+                                                angle_range=args.angle_range)
+                                    for phantom_name in sorted(listdir(in_dir))]
+    results = tune(problems, configs, max_iters=args.max_iters, n_workers=args.workers)
+    best = {}
+    for family, (config, score, history) in results.items():
+        print(f"{family}: {config}, mean absolute error {score:.3f}")
+        best[family] = {"config": config, "score": score}
+    with open(args.out, "w") as f:
+        json.dump(best, f, indent=2)
+
+if __name__ == "__main__":
+    main()
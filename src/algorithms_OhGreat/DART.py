@@ -1,11 +1,37 @@
+import os
+import json
+import mmap
+import time
 from copy import deepcopy
 import numpy as np
 import astra
-from scipy.ndimage import gaussian_filter
+from scipy.ndimage import gaussian_filter, binary_dilation
+from scipy.sparse import vstack
+from projections_OhGreat.system_matrix import system_matrix, cached_system_matrix
+from projections_OhGreat.threaded import ThreadedProjector
+from utils_OhGreat.labels import label_table, label_map
+from .matrix_solvers import SIRTSolver, CGLSSolver
+from .ordered_subsets import OSSolver
+from .kernels import fused_stage
+from .backends import select_algorithm, is_cuda_projector, rec_iter_for
+
+# reconstruction algorithms running on the explicit system matrix
+MATRIX_ALGS = ["SIRT_NUMPY", "CGLS_NUMPY", "OS_SART", "OS_SIRT"]
+# CPU projectors of parallel geometries that can be split by angles
+THREADED_PROJECTORS = ["line", "linear", "strip"]
+
+def decay_schedule(start, factor=0.5, minimum=10):
+    """ Returns a rec_iter schedule starting from start iterations for the
+        initial reconstruction and decaying geometrically by factor at
+        every DART iteration, without going below minimum.
+    """
+    return lambda i: max(minimum, int(round(start * factor**i)))
 
 class DART():
     def __init__(self, gray_levels, p, rec_shape, 
-                proj_geom, projector_id, sinogram):
+                proj_geom, projector_id, sinogram,
+                matrix_cache_dir=None, seed=None, projector_type=None,
+                support="auto", zero_tol=None):
         """ Instanciate DART with thw following parameters
             Parameters:
                 - gray_levels: gray levels known a priori used in the segmentation step.
@@ -13,7 +39,21 @@ class DART():
                 - rec_shape: shape of the volume to create as output.
                 - proj_geom: projection geometry to use for the sinogram creation. 
                 - projector_id: reference to the astra toolbox projector used to make the projections.
-                - sinogram: sinogram as numpy matrix
+                - sinogram: sinogram as numpy matrix. Pass a read-only memory map
+                    (e.g. np.load(path, mmap_mode='r')) to share it between processes:
+                    pickled instances then only reference the file.
+                - matrix_cache_dir: directory where the system matrix used by the
+                    NumPy solvers is saved and memory mapped from. "default" uses the
+                    default cache directory, None computes it in memory.
+                - seed: seed of the random generator used to sample free pixels.
+                - projector_type: astra type of the projector, used to rebuild it
+                    in other processes. Detected as 'cuda' or 'linear' when not given.
+                - support: pixels that can be non zero. "auto" computes them from the
+                    field of view of the scanner and by space carving of the sinogram,
+                    None disables the constraint, a boolean mask defines them directly.
+                    Pixels outside of the support are fixed to 0.
+                - zero_tol: sinogram values up to this one are considered zero rays
+                    by the space carving, defaults to 1e-6 times the sinogram maximum.
         """
         self.gray_levels = gray_levels
         # define thresholds for gray levels with start and end values
@@ -22,93 +62,897 @@ class DART():
         self.c, self.probs = [0,1], [self.p, 1-self.p]
         self.rec_shape = rec_shape
         self.vol_geom = astra.creators.create_vol_geom(self.rec_shape)
-        # calculated in advance for efficiency
-        self.all_neighbours_idx = [[self.pixel_neighborhood(rec_shape, i,j)
-                                    for j in range(self.rec_shape[1])]
-                                        for i in range(self.rec_shape[0])]
+        # boundary set tracked across iterations
+        self.boundary_mask, self.prev_segmented = None, None
+        # free pixels of the last iteration
+        self.free_mask = None
         self.proj_geom = proj_geom
-        self.projector_id = projector_id
         self.sinogram = sinogram
-        self.sinogram_id = astra.data2d.create('-sino', proj_geom, sinogram)
+        # preallocated sinogram rows of streamed projections
+        self._sino_buffer = None
+        # astra objects are only valid in the process that created them,
+        # they are rebuilt lazily after unpickling
+        self._projector_id = projector_id
+        self._sinogram_id = None
+        # projectors created by DART are deleted when replaced
+        self._owns_projector = False
+        # a projector given without its type is used as it is, not threaded
+        self.thread_projections = projector_id is None or projector_type is not None
+        if projector_type is None:
+            projector_type = 'cuda' if is_cuda_projector(projector_id) else 'linear'
+        self.projector_type = projector_type
+        self.rng = np.random.default_rng(seed)
+        # system matrix and NumPy solvers, created on first use
+        self.W, self.WT = None, None
+        self.matrix_cache_dir = matrix_cache_dir
+        self.matrix_solvers = {}
+        # ordered subsets settings
+        self.n_subsets, self.subset_order = 10, "golden"
+        # inner iterations settings and iterations run by each inner reconstruction
+        self.rec_tol, self.tol_every = None, 10
+        # per-pixel stage of the iterations in a single pass (kernels.fused_stage),
+        # instead of the separate steps with the incremental boundary update
+        self.fused = False
+        # standard deviation of the gaussian smoothing of the free pixels
+        self.smoothing = 1.
+        self.inner_history = []
+        # projectors for algorithms not matching the given projector
+        self.extra_projectors = {}
+        # CPU projections split by angles over n_threads threads (cpu count when None)
+        self.n_threads = None
+        self._threaded = None
+        # support constraint, computed on first use
+        self.support_mode, self.zero_tol = support, zero_tol
+        self._support = None
+        # last reconstruction returned by run, used to warm start updates
+        self.last_rec = None
+        # pixels allowed to change in the frames of a sequence, all when None
+        self.region_mask = None
+
+    @property
+    def projector_id(self):
+        """ Reference to the astra projector, created for the
+            stored geometry when missing.
+        """
+        if self._projector_id is None:
+            self._projector_id = astra.create_projector(self.projector_type,
+                                                        self.proj_geom, self.vol_geom)
+            self._owns_projector = True
+        return self._projector_id
+
+    @property
+    def sinogram_id(self):
+        """ Reference to the astra sinogram object, created on first use.
+        """
+        if self._sinogram_id is None:
+            self._sinogram_id = astra.data2d.create('-sino', self.proj_geom, self.sinogram)
+        return self._sinogram_id
+
+    @property
+    def support(self):
+        """ Boolean mask of the pixels that can be non zero,
+            computed on first use as defined by the support parameter.
+        """
+        if self._support is None:
+            if self.support_mode is None:
+                self._support = np.ones(self.rec_shape, dtype=bool)
+            elif isinstance(self.support_mode, str):
+                if self.support_mode != "auto":
+                    raise ValueError(f"Unknown support mode: {self.support_mode}")
+                self._support = self.field_of_view() & ~self.carved_pixels()
+            else:
+                self._support = np.asarray(self.support_mode, dtype=bool)
+                if self._support.shape != tuple(self.rec_shape):
+                    raise ValueError(f"Support of shape {self._support.shape} does not "
+                                    f"match the reconstruction shape {self.rec_shape}.")
+        return self._support
+
+    def active_pixels(self):
+        """ Returns the mask of the pixels that can be updated:
+            the support, restricted to the region mask when defined.
+        """
+        if self.region_mask is None:
+            return self.support
+        return self.support & self.region_mask
+
+    def field_of_view(self):
+        """ Computes the pixels seen by the detector at every projection
+            angle. Only parallel beam geometries are handled, for other
+            geometries all the pixels are considered in the field of view.
+            Returns:
+                - (np.array) boolean mask of the pixels in the field of view.
+        """
+        if self.proj_geom.get('type') != 'parallel':
+            return np.ones(self.rec_shape, dtype=bool)
+        rows, cols = self.rec_shape
+        opt = self.vol_geom.get('option', {})
+        min_x, max_x = opt.get('WindowMinX', -cols/2), opt.get('WindowMaxX', cols/2)
+        min_y, max_y = opt.get('WindowMinY', -rows/2), opt.get('WindowMaxY', rows/2)
+        dx, dy = (max_x - min_x) / cols, (max_y - min_y) / rows
+        # pixel centers, the first row is at the top of the volume
+        x = min_x + (np.arange(cols) + 0.5) * dx
+        y = max_y - (np.arange(rows) + 0.5) * dy
+        xv, yv = np.meshgrid(x, y)
+        # largest distance from the detector center over all angles
+        dist = np.zeros(self.rec_shape)
+        for angle in self.proj_geom['ProjectionAngles']:
+            np.maximum(dist, np.abs(xv * np.cos(angle) + yv * np.sin(angle)), out=dist)
+        half_det = self.proj_geom['DetectorCount'] * self.proj_geom['DetectorWidth'] / 2
+        # keep the pixels partially covered by the detector
+        return dist - np.hypot(dx, dy) / 2 < half_det
+
+    def carved_pixels(self):
+        """ Space carving of the sinogram: pixels crossed by a ray
+            that measured zero have to be zero as well.
+            Returns:
+                - (np.array) boolean mask of the carved pixels.
+        """
+        sinogram = np.asarray(self.sinogram)
+        zero_tol = self.zero_tol
+        if zero_tol is None:
+            zero_tol = 1e-6 * np.abs(sinogram).max()
+        zero_rays = (np.abs(sinogram) <= zero_tol).astype(np.float32)
+        if not zero_rays.any():
+            return np.zeros(self.rec_shape, dtype=bool)
+        # backprojection of the zero rays is positive on the pixels they cross
+        return self.backproject(zero_rays) > 1e-6
+
+    def forward_project(self, rec):
+        """ Projects an image on the geometry of DART, with the system
+            matrix when loaded and with astra otherwise.
+            Parameters:
+                - rec: image to project. (np.array)
+            Output:
+                - (np.array) sinogram of the image.
+        """
+        if self.W is not None:
+            return (self.W @ np.asarray(rec, dtype=np.float64).ravel()).reshape(self.sinogram.shape)
+        if self.threaded_projections():
+            return self.threaded_projector().forward(rec)
+        proj_id, proj = astra.creators.create_sino(np.asarray(rec), self.projector_id)
+        astra.data2d.delete(proj_id)
+        return proj
+
+    def backproject(self, sinogram):
+        """ Backprojects a sinogram on the reconstruction grid,
+            with the system matrix when loaded and with astra otherwise.
+            Parameters:
+                - sinogram: sinogram to backproject. (np.array)
+            Output:
+                - (np.array) backprojected image.
+        """
+        if self.W is not None:
+            bp = self.W.T @ np.asarray(sinogram, dtype=np.float64).ravel()
+        elif self.threaded_projections():
+            bp = self.threaded_projector().backward(sinogram)
+        else:
+            bp_id, bp = astra.creators.create_backprojection(
+                            np.asarray(sinogram, dtype=np.float32), self.projector_id)
+            astra.data2d.delete(bp_id)
+        return np.asarray(bp).reshape(self.rec_shape)
+
+    def __getstate__(self):
+        """ Describes the instance by its geometry, sinogram, parameters
+            and random state. Astra references and cached solvers are
+            dropped, memory mapped sinograms are passed by file reference.
+        """
+        state = self.__dict__.copy()
+        state.update(_projector_id=None, _sinogram_id=None, W=None, WT=None,
+                    matrix_solvers={}, extra_projectors={}, _sino_buffer=None,
+                    _threaded=None)
+        sino = self.sinogram
+        if isinstance(sino, np.memmap) and isinstance(sino.base, mmap.mmap):
+            state["sinogram"] = None
+            state["sinogram_ref"] = (sino.filename, sino.offset, sino.dtype.str,
+                                    sino.shape, 'F' if np.isfortran(sino) else 'C')
+        return state
+
+    def __setstate__(self, state):
+        """ Restores an instance, mapping back the referenced sinogram.
+        """
+        ref = state.pop("sinogram_ref", None)
+        self.__dict__.update(state)
+        if ref is not None:
+            filename, offset, dtype, shape, order = ref
+            self.sinogram = np.memmap(filename, dtype=np.dtype(dtype), mode='r',
+                                    offset=offset, shape=shape, order=order)
 
     def run(self, iters, p=None, gray_levels=None, 
-            rec_alg="SART_CUDA", rec_iter=5):
+            rec_alg="SART_CUDA", rec_iter=5,
+            n_subsets=None, subset_order=None,
+            checkpoint_path=None, checkpoint_every=1,
+            rec_tol=None, tol_every=10, x0=None, smoothing=None,
+            return_labels=False):
         """ Parameters:
                 - iters: (int) number of DART iteration to perform
                 - p: (float) probability of a pixel to not be sampled as a free pixel.
                 - gray_levels: (list) gray levels known a priori used in the segmentation step.
                 - rec_algs: (string) tuple containing the initial and the iterated 
-                    reconstruction algorithms to use.
+                    reconstruction algorithms to use. "auto" selects the fastest
+                    available SART implementation, "SART_AUTO", "SIRT_AUTO" and
+                    "FBP_AUTO" the fastest implementation of the given algorithm.
                 - rec_iters: (int) number of iterations of the reconstruction subrutine.
+                    For OS_SART and OS_SIRT an iteration is a full pass over all the subsets.
+                    Can also be a schedule: a list with the iterations of the initial
+                    reconstruction followed by those of each DART iteration (the last
+                    value is repeated), or a function of the index in that list
+                    (e.g. decay_schedule(1000)).
+                - rec_tol: (float) when defined, an inner reconstruction stops as soon
+                    as its projection residual decreased by less than this fraction
+                    over the last tol_every iterations.
+                - tol_every: (int) iterations between two residual checks.
+                - n_subsets: (int) number of subsets used by OS_SIRT.
+                - subset_order: (string) "sequential", "random" or "golden"
+                    order of the subsets for OS_SART and OS_SIRT.
+                - checkpoint_path: (string) file where the state of the run is saved,
+                    checkpoints are disabled when not defined.
+                - checkpoint_every: (int) number of DART iterations between checkpoints.
+                - x0: (np.array) starting image of the initial reconstruction,
+                    e.g. the result of a previous run. Starts from zeros when not defined.
+                - smoothing: (float) standard deviation of the gaussian filter
+                    smoothing the free pixels, 1 by default. 0 disables the smoothing.
+                - return_labels: (bool) also return the label map of the segmented
+                    reconstruction and its gray level table, as label_map does.
             Output:
                 (np.array) returns the reconstructed phantom 
-                of shape = vol_shape, as a numpy 2D array
+                of shape = vol_shape, as a numpy 2D array.
+                With return_labels, a tuple (reconstruction, labels, table).
+        """
+        rec_alg, schedule = self._prepare_run(iters, p, gray_levels, rec_alg, rec_iter,
+                                            n_subsets, subset_order, rec_tol, tol_every,
+                                            smoothing)
+        # create initial reconstruction, only on the active pixels
+        # (FBP does not take a mask, the other pixels are restored)
+        active = self.active_pixels()
+        mask = None if active.all() else active
+        if x0 is None:
+            start_rec = np.full(shape=self.rec_shape,fill_value=0.)
+        else:
+            start_rec = np.array(x0, dtype=np.float64)
+            # a full mask continues from the starting image
+            mask = active
+        curr_rec = self.ART(start_rec.copy(),
+                                    mask=None if rec_alg.startswith("FBP") else mask,
+                                    alg=rec_alg, iters=schedule[0],
+                                    tol=self.rec_tol, check_every=self.tol_every)
+        if mask is not None:
+            curr_rec[~mask] = start_rec[~mask]
+        self.last_rec = self.iterate(curr_rec, 0, iters, rec_alg, schedule,
+                                    checkpoint_path, checkpoint_every)
+        if return_labels:
+            return (self.last_rec,) + self.label_map(self.last_rec)
+        return self.last_rec
+
+    def add_projections(self, angles, projections):
+        """ Appends newly acquired projections to the geometry and to the
+            sinogram. The sinogram grows in a preallocated buffer and the
+            system matrix, when loaded, is extended with the rows of the new
+            angles only. The astra objects are recreated on their next use.
+            Parameters:
+                - angles: (float or np.array) angle(s) of the new projections.
+                - projections: (np.array) new sinogram rows, of shape
+                    (n_detectors,) or (len(angles), n_detectors).
+            The projector is rebuilt for the extended geometry with the same
+            projector_type, so a projector given without its type can only
+            be extended if it is a cuda one.
+        """
+        if not self.thread_projections and self.projector_type != 'cuda':
+            raise ValueError("The type of the projector given is unknown, "
+                            "pass projector_type to rebuild it for the new angles.")
+        angles = np.atleast_1d(np.asarray(angles, dtype=np.float64))
+        n_detectors = self.proj_geom['DetectorCount']
+        dtype = np.result_type(self.sinogram.dtype, np.float32)
+        projections = np.asarray(projections, dtype=dtype).reshape(len(angles), -1)
+        if projections.shape[1] != n_detectors:
+            raise ValueError(f"Expected projections of {n_detectors} detectors, "
+                            f"got {projections.shape[1]}.")
+        n_old = self.sinogram.shape[0]
+        n_new = n_old + len(angles)
+        # the buffer doubles its capacity when full
+        buffer = self._sino_buffer
+        if buffer is None or buffer.shape[0] < n_new or \
+            not np.shares_memory(buffer, self.sinogram):
+            buffer = np.empty((max(n_new, 2 * n_old), n_detectors), dtype=dtype)
+            buffer[:n_old] = self.sinogram
+            self._sino_buffer = buffer
+        buffer[n_old:n_new] = projections
+        self.sinogram = buffer[:n_new]
+        new_geom = dict(self.proj_geom, ProjectionAngles=angles)
+        self.proj_geom = dict(self.proj_geom, ProjectionAngles=np.concatenate(
+                                [self.proj_geom['ProjectionAngles'], angles]))
+        if self.W is not None:
+            self.W = vstack([self.W, system_matrix(new_geom, self.vol_geom,
+                                                    self.cpu_projector_type())], format="csr")
+            self.WT = None
+        # astra objects and solvers of the previous geometry, a projector
+        # given by the user does not match it either and is rebuilt with its type
+        self.delete_astra_objects()
+        self._projector_id = None
+        if isinstance(self.support_mode, str):
+            self._support = None
+
+    def delete_astra_objects(self):
+        """ Deletes the astra objects created by DART and the NumPy
+            solvers with their threads, they are recreated on their next use.
+        """
+        for solver in self.matrix_solvers.values():
+            solver.close()
+        self.matrix_solvers = {}
+        if self._sinogram_id is not None:
+            astra.data2d.delete(self._sinogram_id)
+            self._sinogram_id = None
+        if self._owns_projector:
+            astra.projector.delete(self._projector_id)
+            self._projector_id, self._owns_projector = None, False
+        for proj_id in self.extra_projectors.values():
+            astra.projector.delete(proj_id)
+        self.extra_projectors = {}
+        if self._threaded is not None:
+            self._threaded.close()
+            self._threaded = None
+
+    def set_sinogram(self, sinogram):
+        """ Replaces the sinogram with a new measurement on the same
+            geometry, reusing the astra sinogram object and the solvers.
+            Parameters:
+                - sinogram: (np.array) new sinogram of the same shape.
+        """
+        if np.shape(sinogram) != self.sinogram.shape:
+            raise ValueError(f"Expected a sinogram of shape {self.sinogram.shape}, "
+                            f"got {np.shape(sinogram)}.")
+        self.sinogram = sinogram
+        self._sino_buffer = None
+        if self._sinogram_id is not None:
+            astra.data2d.store(self._sinogram_id, sinogram)
+        if isinstance(self.support_mode, str):
+            self._support = None
+
+    def changed_region(self, rec, change_tol=None, min_fraction=0.5, dilation=1):
+        """ Finds the pixels that may have changed between the given
+            reconstruction and the current sinogram. A pixel is changed when
+            at least min_fraction of the rays crossing it (weighted by the
+            projector) changed by more than change_tol.
+            Parameters:
+                - rec: (np.array) reconstruction of a previous measurement.
+                - change_tol: (float) minimum change of a ray, defaults to
+                    1% of the sinogram maximum.
+                - min_fraction: (float) fraction of changed rays of a pixel.
+                - dilation: (int) pixels the changed region is grown by.
+            Returns:
+                - (np.array) boolean mask of the changed pixels.
+        """
+        sinogram = np.asarray(self.sinogram)
+        if change_tol is None:
+            change_tol = 1e-2 * np.abs(sinogram).max()
+        changed = (np.abs(sinogram - self.forward_project(rec)) > change_tol)
+        if not changed.any():
+            return np.zeros(self.rec_shape, dtype=bool)
+        weights = self.backproject(np.ones(sinogram.shape))
+        fraction = np.zeros(self.rec_shape)
+        np.divide(self.backproject(changed), weights, out=fraction, where=weights > 0)
+        region = fraction >= min_fraction
+        if dilation > 0 and region.any():
+            region = binary_dilation(region, iterations=dilation)
+        return region
+
+    def run_sequence(self, sinograms, iters=10, frame_iters=2,
+                    change_tol=None, min_fraction=0.5, **run_params):
+        """ Reconstructs a time series of sinograms measured on the
+            geometry of DART. The first frame is reconstructed with a full
+            run, the next ones start from the segmentation of the previous
+            frame and only update the pixels in the region where the
+            projections changed (see changed_region).
+            Parameters:
+                - sinograms: iterable of sinograms of the same shape.
+                - iters: (int) DART iterations of the first frame.
+                - frame_iters: (int) DART iterations of the next frames.
+                - change_tol, min_fraction: as in changed_region.
+                - run_params: other parameters of the run method.
+            Yields:
+                (np.array) the reconstruction of each frame.
+        """
+        prev_rec = None
+        try:
+            for sinogram in sinograms:
+                self.set_sinogram(sinogram)
+                if prev_rec is None:
+                    self.region_mask = None
+                    rec = self.run(iters, **run_params)
+                else:
+                    start = self.segment(prev_rec).astype(np.float64)
+                    start[~self.support] = 0.
+                    self.region_mask = self.changed_region(start, change_tol, min_fraction)
+                    if self.region_mask.any():
+                        rec = self.run(frame_iters, x0=start, **run_params)
+                    else:
+                        # nothing changed, the previous segmentation is kept
+                        rec = start
+                prev_rec = rec
+                yield rec
+        finally:
+            self.region_mask = None
+
+    def update(self, angles, projections, iters=1, **run_params):
+        """ Streaming reconstruction: adds the new projections and runs
+            DART warm started from the last reconstruction.
+            Parameters:
+                - angles, projections: as in add_projections.
+                - iters: (int) number of DART iterations to perform.
+                - run_params: other parameters of the run method.
+            Output:
+                (np.array) the updated reconstruction.
+        """
+        self.add_projections(angles, projections)
+        return self.run(iters, x0=self.last_rec, **run_params)
+
+    def run_roi(self, iters, roi=None, global_iters=2, change_tol=None,
+                min_fraction=0.2, dilation=2, **run_params):
+        """ Region of interest DART. After global_iters iterations on the
+            whole image, the pixels out of the region of interest are frozen
+            to their segmented values and their projections are subtracted
+            from the sinogram once. The remaining iterations run on the
+            bounding box of the region only, so their cost follows the size
+            of the region instead of rec_shape. Frozen pixels keep the values
+            of the global reconstruction, which explain the projections
+            better than its segmentation.
+            Parameters:
+                - iters: (int) DART iterations on the region of interest.
+                - roi: (np.array) boolean mask of the region of interest. When not
+                    defined, the region where the projections of the segmented
+                    global reconstruction disagree with the sinogram is used.
+                - global_iters: (int) DART iterations on the whole image.
+                - change_tol, min_fraction, dilation: as in changed_region,
+                    to detect the region of interest. Lower min_fraction
+                    values give larger regions.
+                - run_params: other parameters of the run method.
+            Output:
+                (np.array) the reconstructed phantom, of shape rec_shape.
+        """
+        rec = self.run(global_iters, **run_params)
+        run_params.pop("x0", None)
+        frozen = np.where(self.support, rec, 0.)
+        if roi is None:
+            # pixels crossed by the rays the segmentation does not explain
+            segmented = self.segment(rec).astype(np.float64)
+            segmented[~self.support] = 0.
+            roi = self.changed_region(segmented, change_tol, min_fraction, dilation)
+        roi = np.asarray(roi, dtype=bool)
+        if roi.shape != tuple(self.rec_shape):
+            raise ValueError(f"Expected a region of interest of shape {self.rec_shape}, "
+                            f"got {roi.shape}.")
+        roi = roi & self.support
+        if not roi.any():
+            return rec
+        rows, cols = np.where(roi.any(axis=1))[0], np.where(roi.any(axis=0))[0]
+        box = (slice(rows[0], rows[-1] + 1), slice(cols[0], cols[-1] + 1))
+        outside = frozen.copy()
+        outside[box] = 0.
+        # volume geometry of the bounding box, in the window of the full volume
+        n_rows, n_cols = self.rec_shape
+        opt = self.vol_geom.get('option', {})
+        min_x, max_x = opt.get('WindowMinX', -n_cols/2), opt.get('WindowMaxX', n_cols/2)
+        min_y, max_y = opt.get('WindowMinY', -n_rows/2), opt.get('WindowMaxY', n_rows/2)
+        dx, dy = (max_x - min_x) / n_cols, (max_y - min_y) / n_rows
+        box_shape = (rows[-1] + 1 - rows[0], cols[-1] + 1 - cols[0])
+        roi_dart = DART(self.gray_levels, self.p, box_shape, self.proj_geom, None,
+                        # projections of the frozen pixels out of the box, computed once
+                        self.sinogram - self.forward_project(outside),
+                        matrix_cache_dir=self.matrix_cache_dir,
+                        seed=self.rng.integers(2**32), projector_type=self.projector_type,
+                        support=self.support[box])
+        roi_dart.vol_geom = astra.create_vol_geom(box_shape[0], box_shape[1],
+                                                min_x + cols[0] * dx, min_x + (cols[-1] + 1) * dx,
+                                                max_y - (rows[-1] + 1) * dy, max_y - rows[0] * dy)
+        roi_dart.region_mask = roi[box]
+        roi_dart.n_subsets, roi_dart.subset_order = self.n_subsets, self.subset_order
+        roi_dart.rec_tol, roi_dart.tol_every = self.rec_tol, self.tol_every
+        roi_dart.smoothing, roi_dart.n_threads = self.smoothing, self.n_threads
+        roi_dart.fused = self.fused
+        # the pixels of the box out of the region are frozen as well
+        frozen[box] = roi_dart.run(iters, x0=frozen[box], **run_params)
+        roi_dart.delete_astra_objects()
+        self.last_rec = frozen
+        return self.last_rec
+
+    def _prepare_run(self, iters, p, gray_levels, rec_alg, rec_iter,
+                    n_subsets, subset_order, rec_tol, tol_every, smoothing=None):
+        """ Applies the parameters of a run and resolves the reconstruction
+            algorithm and the inner iterations schedule.
+            Parameters as in the run method.
+            Returns:
+                - (tuple) name of the algorithm and schedule of the run.
         """
         # to run experiments on different gray values
         # and fixed pixel probabilities
         # without reinstanciating DART
         if p is not None:
             self.p = p
+            self.probs = [self.p, 1-self.p]
         if gray_levels is not None:
             self.gray_levels = gray_levels
             self.thresholds = self.update_gray_thresholds()
+        if n_subsets is not None:
+            self.n_subsets = n_subsets
+        if subset_order is not None:
+            self.subset_order = subset_order
+        if smoothing is not None:
+            self.smoothing = smoothing
+        self.rec_tol, self.tol_every = rec_tol, tol_every
+        # iterations of the initial and of every DART reconstruction
+        schedule = self.inner_schedule(rec_iter, iters)
+        # choose the fastest implementation available
+        if rec_alg == "auto" or rec_alg.endswith("_AUTO"):
+            family = "SART" if rec_alg == "auto" else rec_alg[:-len("_AUTO")]
+            rec_alg, _ = select_algorithm(family, self.rec_shape,
+                                        *self.sinogram.shape,
+                                        int(np.mean(schedule)), n_calls=iters+1)
+            # the threaded projections only handle parallel beams
+            if rec_alg == "SIRT_THREADS" and self.proj_geom['type'] != 'parallel':
+                rec_alg = "SIRT"
+            schedule = [rec_iter_for(rec_alg, n, self.sinogram.shape[0])
+                        for n in schedule]
         # reconstruction algorithm check
         if rec_alg not in [ "SART", "SART_CUDA",
                             "SIRT", "SIRT_CUDA",
-                            "FBP" , "FBP_CUDA"]:
-            exit("Select a valid reconstruction algorithm.") 
-        # create initial reconstruction
-        curr_rec = self.ART(np.full(shape=self.rec_shape,fill_value=0.),
-                                    mask=None, alg=rec_alg, iters=rec_iter)
+                            "FBP" , "FBP_CUDA", "SIRT_THREADS"] + MATRIX_ALGS:
+            raise ValueError(f"Select a valid reconstruction algorithm, got {rec_alg}.")
+        # forget the boundary set and the statistics of previous runs
+        self.prev_segmented = None
+        self.inner_history = []
+        return rec_alg, schedule
+
+    def run_anytime(self, time_budget, p=None, gray_levels=None,
+                    rec_alg="SART_CUDA", rec_iter=5, max_iters=100,
+                    n_subsets=None, subset_order=None,
+                    rec_tol=None, tol_every=10, smoothing=None,
+                    margin=0.05, n_chunks=4):
+        """ Runs DART within a wall-clock time budget. The time of the
+            reconstruction subrutines is modeled as overhead + cost * iterations
+            from the calls already made, and the inner iterations of each
+            DART iteration are reduced to end before the deadline. The run
+            stops when not even one inner iteration fits in the remaining time.
+            Parameters:
+                - time_budget: (float) seconds available for the whole run.
+                - max_iters: (int) maximum number of DART iterations.
+                - margin: (float) fraction of the budget kept as safety margin.
+                - n_chunks: (int) the initial reconstruction is run in this many
+                    chunks, to calibrate the time model and stop at the deadline.
+                - other parameters as in the run method, with rec_iter giving
+                    the maximum number of inner iterations.
+            Output:
+                (tuple) the reconstruction with the lowest projection residual
+                seen during the run and the number of DART iterations completed.
+        """
+        deadline = time.perf_counter() + time_budget * (1 - margin)
+        rec_alg, schedule = self._prepare_run(max_iters, p, gray_levels, rec_alg, rec_iter,
+                                            n_subsets, subset_order, rec_tol, tol_every,
+                                            smoothing)
+        # (iterations, seconds) of the timed calls, fitted by the time model
+        timings = []
+        def fit_iters(max_n):
+            # number of inner iterations fitting before the deadline
+            n_done, secs = np.array(timings, dtype=np.float64).T
+            if len(np.unique(n_done)) > 1:
+                cost, overhead = np.polyfit(n_done, secs, 1)
+                cost, overhead = max(cost, 1e-9), max(overhead, 0.)
+            else:
+                cost, overhead = secs.sum() / max(n_done.sum(), 1), 0.
+            n = int((deadline - time.perf_counter() - overhead) / cost)
+            return min(max_n, n)
+        # initial reconstruction by chunks, continued on the support
+        support = self.support
+        curr_rec = np.full(shape=self.rec_shape, fill_value=0.)
+        chunks = 1 if rec_alg.startswith("FBP") else n_chunks
+        done, chunk = 0, max(1, -(-schedule[0] // chunks))
+        while done < schedule[0]:
+            n = min(chunk, schedule[0] - done)
+            if timings:
+                n = fit_iters(n)
+                if n < 1:
+                    break
+            start = time.perf_counter()
+            mask = None if done == 0 and (support.all() or chunks == 1) else support
+            curr_rec = self.ART(curr_rec, mask=mask, alg=rec_alg, iters=n,
+                                tol=self.rec_tol, check_every=self.tol_every)
+            timings.append((self.inner_history[-1], time.perf_counter() - start))
+            done += self.inner_history[-1]
+            if self.inner_history[-1] < n:
+                # converged within the tolerance
+                break
+        curr_rec[~support] = 0.
+        best_rec, best_res = curr_rec.copy(), self.residual(curr_rec)
+        completed = 0
+        for i in range(max_iters):
+            n = fit_iters(schedule[i + 1])
+            if n < 1:
+                break
+            start = time.perf_counter()
+            curr_rec = self.step(curr_rec, rec_alg, n, smooth=False)
+            res = self.residual(curr_rec)
+            timings.append((self.inner_history[-1], time.perf_counter() - start))
+            if res < best_res:
+                best_rec, best_res = curr_rec.copy(), res
+            completed += 1
+            # smoothing of the free pixels for the next iteration
+            curr_rec = self.smooth_free_pixels(curr_rec, self.free_mask)
+        self.last_rec = best_rec
+        return best_rec, completed
+
+    def run_ensemble(self, n_members, iters, p=None, gray_levels=None,
+                    rec_alg="SIRT_NUMPY", rec_iter=5,
+                    n_subsets=None, subset_order=None,
+                    rec_tol=None, tol_every=10, smoothing=None):
+        """ Runs n_members independent DART realizations, differing only in
+            their random free pixels, advanced together as a (K, rows, cols)
+            stack. Segmentation, boundary detection and smoothing are vectorized
+            along the stack, and the NumPy solvers ("SIRT_NUMPY", "CGLS_NUMPY",
+            "OS_SART", "OS_SIRT") reconstruct all the members as one batch.
+            The astra algorithms reconstruct the members one at a time.
+            Parameters:
+                - n_members: (int) number of realizations K.
+                - other parameters as in the run method.
+            Output:
+                (tuple) the mean reconstruction, the majority vote segmentation
+                and the disagreement of each pixel, as the fraction of members
+                not agreeing with the majority.
+        """
+        rec_alg, schedule = self._prepare_run(iters, p, gray_levels, rec_alg, rec_iter,
+                                            n_subsets, subset_order, rec_tol, tol_every,
+                                            smoothing)
+        # the initial reconstruction is the same for all the members
+        active = self.active_pixels()
+        start_rec = self.ART(np.full(shape=self.rec_shape,fill_value=0.),
+                            mask=None if rec_alg.startswith("FBP") or active.all() else active,
+                            alg=rec_alg, iters=schedule[0],
+                            tol=self.rec_tol, check_every=self.tol_every)
+        start_rec[~active] = 0.
+        recs = np.repeat(start_rec[None], n_members, axis=0)
         for i in range(iters):
-            # segment current reconstructed image
-            segmented_img = self.segment(curr_rec)
-            # calculate boundary pixels
-            boundary_pixels = self.boundary_pixels(segmented_img)
-            # calculate free pixels
-            free_pixels = self.free_pixels()
-            # mask of all free pixels
-            free_pixels = np.logical_or(boundary_pixels,free_pixels)
-            # take indexes of non fixed pixels
-            free_pixels_idx = np.where(free_pixels)
-            # fixed pixels
-            fixed_pixels = free_pixels == 0
-            # take indexes of non fixed pixels
-            fixed_pixels_idx = np.where(fixed_pixels)
-            #create image to feed to reconstructor
-            curr_rec[fixed_pixels_idx[0],
-                     fixed_pixels_idx[1]] = segmented_img[fixed_pixels_idx[0],
-                                                        fixed_pixels_idx[1]]
-            # run reconstruction algorithm on free pixels
-            curr_rec = self.ART(curr_rec, mask=free_pixels,
-                                        alg=rec_alg, iters=rec_iter)
+            segmented = self.segment(recs)
+            segmented[:, ~self.support] = 0
+            free = self.boundary_pixels(segmented)
+            free |= self.rng.random(recs.shape) < self.probs[1]
+            free &= active
+            recs = np.where(free, recs, segmented)
+            if rec_alg in MATRIX_ALGS:
+                recs = self.matrix_ART(recs, mask=free, alg=rec_alg, iters=schedule[i + 1],
+                                        tol=self.rec_tol, check_every=self.tol_every)
+            else:
+                recs = np.stack([self.ART(rec, mask=mask, alg=rec_alg, iters=schedule[i + 1],
+                                        tol=self.rec_tol, check_every=self.tol_every)
+                                for rec, mask in zip(recs, free)])
             # smoothing operation except on last iteration
             if i < iters - 1:
-                smooth_rec = gaussian_filter(curr_rec, sigma=1)
-                curr_rec[free_pixels_idx[0],
-                            free_pixels_idx[1]] = smooth_rec[free_pixels_idx[0], 
-                                                            free_pixels_idx[1]]
+                sigma = (0, self.smoothing, self.smoothing)
+                recs = np.where(free, gaussian_filter(recs, sigma=sigma), recs)
+        # the vote counts the 0 label of the pixels out of the support
+        # or below the thresholds as well
+        labels, table = self.label_map(recs)
+        votes = np.stack([(labels == k).sum(axis=0) for k in range(len(table))])
+        majority = table[votes.argmax(axis=0)]
+        disagreement = 1. - votes.max(axis=0) / n_members
+        return recs.mean(axis=0), majority, disagreement
+
+    def inner_schedule(self, rec_iter, iters):
+        """ Resolves the rec_iter parameter of the run method to the list
+            of iterations of the initial reconstruction and of each of the
+            iters DART iterations.
+        """
+        if callable(rec_iter):
+            return [int(rec_iter(i)) for i in range(iters + 1)]
+        if np.ndim(rec_iter) > 0:
+            return [int(rec_iter[min(i, len(rec_iter) - 1)]) for i in range(iters + 1)]
+        return [int(rec_iter)] * (iters + 1)
+
+    def iterate(self, curr_rec, start, iters, rec_alg, schedule,
+                checkpoint_path=None, checkpoint_every=1):
+        """ Runs the DART iterations from start to iters on the
+            given reconstruction, saving checkpoints when requested.
+            Parameters as in the run method, with schedule the list
+            returned by inner_schedule.
+        """
+        for i in range(start, iters):
+            # smoothing operation except on last iteration
+            curr_rec = self.step(curr_rec, rec_alg, schedule[i + 1],
+                                smooth=i < iters - 1)
+            if checkpoint_path is not None and (i + 1) % checkpoint_every == 0:
+                self.save_checkpoint(checkpoint_path, curr_rec, i + 1,
+                                    iters, rec_alg, schedule)
+        return curr_rec
+
+    def step(self, curr_rec, rec_alg, rec_iter, smooth=True):
+        """ Performs a single DART iteration.
+            Parameters:
+                - curr_rec: current reconstruction. (np.array)
+                - rec_alg: reconstruction algorithm to use. (string)
+                - rec_iter: iterations of the reconstruction subrutine. (int)
+                - smooth: wether to smooth the free pixels. (bool)
+            Output:
+                - the updated reconstruction. (np.array)
+        """
+        if self.fused:
+            # single pass over the image, same results as the steps below,
+            # the random values are drawn tile by tile from the generator
+            _, free_pixels = fused_stage(curr_rec, self.thresholds,
+                                            self.gray_levels, self.support,
+                                            self.active_pixels(),
+                                            self.rng, self.probs[1])
+            self.free_mask = free_pixels
+            # the incremental boundary set is not tracked by the fused stage
+            self.prev_segmented = None
+        else:
+            free_pixels = self.separate_stage(curr_rec)
+        # run reconstruction algorithm on free pixels
+        curr_rec = self.ART(curr_rec, mask=free_pixels,
+                                    alg=rec_alg, iters=rec_iter,
+                                    tol=self.rec_tol, check_every=self.tol_every)
+        if smooth:
+            curr_rec = self.smooth_free_pixels(curr_rec, free_pixels)
         return curr_rec
 
+    def separate_stage(self, curr_rec):
+        """ Segments the reconstruction, computes the free pixels and sets
+            the fixed pixels to their gray level, in separate steps.
+            Parameters:
+                - curr_rec: current reconstruction, updated in place. (np.array)
+            Output:
+                - the mask of the free pixels. (np.array)
+        """
+        # segment current reconstructed image,
+        # pixels out of the support are known to be zero
+        segmented_img = self.segment(curr_rec)
+        segmented_img[~self.support] = 0
+        # calculate boundary pixels, updating those of the previous iteration
+        boundary_pixels = self.update_boundary_pixels(segmented_img)
+        # calculate free pixels
+        free_pixels = self.free_pixels()
+        # mask of all free pixels, always fixed out of the active pixels
+        free_pixels = np.logical_or(boundary_pixels,free_pixels) & self.active_pixels()
+        self.free_mask = free_pixels
+        # fixed pixels
+        fixed_pixels = free_pixels == 0
+        # take indexes of non fixed pixels
+        fixed_pixels_idx = np.where(fixed_pixels)
+        #create image to feed to reconstructor
+        curr_rec[fixed_pixels_idx[0],
+                 fixed_pixels_idx[1]] = segmented_img[fixed_pixels_idx[0],
+                                                    fixed_pixels_idx[1]]
+        return free_pixels
+
+    def smooth_free_pixels(self, curr_rec, free_pixels):
+        """ Smooths the free pixels of a reconstruction with a gaussian filter.
+            Parameters:
+                - curr_rec: reconstruction to smooth. (np.array)
+                - free_pixels: mask of the free pixels. (np.array)
+            Output:
+                - the smoothed reconstruction. (np.array)
+        """
+        free_pixels_idx = np.where(free_pixels)
+        if self.smoothing <= 0:
+            return curr_rec
+        smooth_rec = gaussian_filter(curr_rec, sigma=self.smoothing)
+        curr_rec[free_pixels_idx[0],
+                    free_pixels_idx[1]] = smooth_rec[free_pixels_idx[0],
+                                                    free_pixels_idx[1]]
+        return curr_rec
+
+    def save_checkpoint(self, path, curr_rec, iteration, iters,
+                        rec_alg, rec_iter):
+        """ Saves the full state of a run as a compressed numpy archive.
+            The file is replaced atomically, so a run killed while
+            saving always leaves the previous checkpoint intact.
+            Parameters:
+                - path: (string) checkpoint file.
+                - curr_rec: (np.array) current reconstruction.
+                - iteration: (int) number of completed DART iterations.
+                - iters, rec_alg: parameters of the run.
+                - rec_iter: (list) iterations schedule of the run.
+        """
+        # random state of the ordered subsets solver, seeded when created
+        solver_state = ""
+        if rec_alg in ["OS_SART", "OS_SIRT"]:
+            key = (rec_alg, self.n_subsets, self.subset_order)
+            if key in self.matrix_solvers:
+                solver_state = json.dumps(self.matrix_solvers[key].rng.bit_generator.state)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez_compressed(f, rec=curr_rec, iteration=iteration, iters=iters,
+                                rec_alg=rec_alg, rec_iter=np.asarray(rec_iter),
+                                rec_tol=np.nan if self.rec_tol is None else self.rec_tol,
+                                tol_every=self.tol_every, smoothing=self.smoothing,
+                                gray_levels=np.asarray(self.gray_levels),
+                                thresholds=np.asarray(self.thresholds), p=self.p,
+                                n_subsets=self.n_subsets, subset_order=self.subset_order,
+                                rng_state=json.dumps(self.rng.bit_generator.state),
+                                solver_state=solver_state, support=self.support,
+                                # empty when not defined
+                                region_mask=np.zeros(0, dtype=bool) if self.region_mask is None
+                                            else self.region_mask,
+                                fused=self.fused,
+                                n_threads=0 if self.n_threads is None else self.n_threads)
+        os.replace(tmp_path, path)
+
+    def resume(self, checkpoint_path, checkpoint_every=1):
+        """ Resumes a run from a checkpoint created by the run method,
+            continuing with the same parameters and random state.
+            DART needs to be instanciated with the same geometry and
+            sinogram used by the interrupted run.
+            Parameters:
+                - checkpoint_path: (string) checkpoint file, also used for
+                    the checkpoints of the resumed run.
+                - checkpoint_every: (int) number of DART iterations between checkpoints.
+            Output:
+                (np.array) returns the reconstructed phantom
+        """
+        with np.load(checkpoint_path) as state:
+            curr_rec = state["rec"]
+            if curr_rec.shape != tuple(self.rec_shape):
+                raise ValueError(f"Checkpoint of shape {curr_rec.shape} does not "
+                                f"match the reconstruction shape {self.rec_shape}.")
+            self.gray_levels = state["gray_levels"]
+            self.thresholds = list(state["thresholds"])
+            self.p = float(state["p"])
+            self.probs = [self.p, 1-self.p]
+            self.n_subsets = int(state["n_subsets"])
+            self.subset_order = str(state["subset_order"])
+            iteration, iters = int(state["iteration"]), int(state["iters"])
+            rec_alg = str(state["rec_alg"])
+            # checkpoints of older versions do not hold the following settings
+            if "support" in state.files:
+                self._support = state["support"]
+                region_mask = state["region_mask"]
+                self.region_mask = region_mask if region_mask.size > 0 else None
+                self.fused = bool(state["fused"])
+                self.n_threads = int(state["n_threads"]) or None
+            if "solver_state" in state.files and str(state["solver_state"]):
+                # creating the solver draws its seed, the states are restored after
+                self.matrix_solver(rec_alg).rng.bit_generator.state = \
+                    json.loads(str(state["solver_state"]))
+            self.rng.bit_generator.state = json.loads(str(state["rng_state"]))
+            schedule = self.inner_schedule(state["rec_iter"], iters)
+            rec_tol = float(state["rec_tol"])
+            self.rec_tol = None if np.isnan(rec_tol) else rec_tol
+            self.tol_every = int(state["tol_every"])
+            # checkpoints of older versions used the default smoothing
+            self.smoothing = float(state["smoothing"]) if "smoothing" in state.files else 1.
+        self.prev_segmented = None
+        self.inner_history = []
+        return self.iterate(curr_rec, iteration, iters, rec_alg, schedule,
+                            checkpoint_path, checkpoint_every)
+
     def ART(self, rec, mask=None,
-                    alg="SART_CUDA", iters= 5):
+                    alg="SART_CUDA", iters= 5, tol=None, check_every=10):
         """ Reconstruction with ARM techniques.
             Parameters:
                 - rec: initial reconstructed image. (np.array)
                 - mask: mask defining the pixels to update, (np.array)
                 - alg: name of the reconstruction algorithm to use. (string)
                 - iters: number of reconstruction iterations to perform. (int)
+                - tol: stop early when the projection residual decreased by less
+                    than this fraction over the last check_every iterations. (float)
+                - check_every: iterations between two residual checks. (int)
             Output:
                 - reconstructed image. (np.array)
         """
+        if alg in MATRIX_ALGS:
+            return self.matrix_ART(rec, mask=mask, alg=alg, iters=iters,
+                                    tol=tol, check_every=check_every)
+        if alg == "SIRT_THREADS":
+            return self.threaded_ART(rec, mask=mask, iters=iters,
+                                    tol=tol, check_every=check_every)
         if mask is not None:
             # mask free pixels for the fixed pixel sinogram
             free_pixels_idx = np.where(mask > 0)
             fixed_rec = deepcopy(rec)
             fixed_rec[free_pixels_idx[0],
                     free_pixels_idx[1]] = 0
-            # create fixed pixels' sinogram
-            _, fixed_sino = astra.creators.create_sino(fixed_rec, self.projector_id)
+            # create fixed pixels' sinogram, by chunks of angles on CPU
+            if self.threaded_projections():
+                fixed_sino = self.threaded_projector().forward(fixed_rec)
+            else:
+                fixed_sino_id, fixed_sino = astra.creators.create_sino(fixed_rec,
+                                                                    self.projector_id)
+                astra.data2d.delete(fixed_sino_id)
             # create free pixels' sinogram
             free_sino = self.sinogram - fixed_sino
             free_sino_id = astra.data2d.create('-sino', self.proj_geom, free_sino)
@@ -118,7 +962,7 @@ class DART():
         # define configuration parameters
         alg_cfg = astra.astra_dict(alg)
         if alg_cfg != "SIRT" and alg_cfg != "SIRT_CUDA":
-            alg_cfg['ProjectorId'] = self.projector_id
+            alg_cfg['ProjectorId'] = self.projector_for(alg)
         alg_cfg['ProjectionDataId'] = free_sino_id if mask is not None else self.sinogram_id
         alg_cfg['ReconstructionDataId'] = rec_id
         alg_cfg['option'] = {}
@@ -130,11 +974,167 @@ class DART():
         #define algorithm
         algorithm_id = astra.algorithm.create(alg_cfg)
         # run the algorithm
-        astra.algorithm.run(algorithm_id, iters)
+        if tol is None:
+            astra.algorithm.run(algorithm_id, iters)
+            done = iters
+        else:
+            # run by chunks until the residual levels off
+            done, prev_res = 0, None
+            while done < iters:
+                chunk = min(check_every, iters - done)
+                astra.algorithm.run(algorithm_id, chunk)
+                done += chunk
+                res = self.residual(astra.data2d.get_shared(rec_id))
+                if prev_res is not None and prev_res - res <= tol * prev_res:
+                    break
+                prev_res = res
+        self.inner_history.append(done)
+        # return the reconstructed values
+        rec = astra.data2d.get(rec_id)
         # free memory
         astra.algorithm.delete(algorithm_id)
-        # return the reconstructed values
-        return astra.data2d.get(rec_id)
+        astra.data2d.delete(rec_id)
+        if mask is not None:
+            astra.data2d.delete([free_sino_id, mask_id])
+        return rec
+
+    def residual(self, rec):
+        """ Computes the norm of the projection residual of a reconstruction.
+            Parameters:
+                - rec: reconstructed image. (np.array)
+            Output:
+                - (float) norm of the difference between the projections
+                    of rec and the sinogram.
+        """
+        return float(np.linalg.norm(self.forward_project(rec) - self.sinogram))
+
+    def projector_for(self, alg):
+        """ Returns a projector suited for the given astra algorithm.
+            The projector passed to DART is used when it matches the
+            algorithm, otherwise a cuda or linear projector is created
+            once for the same geometry.
+            Parameters:
+                - alg: name of the astra algorithm. (string)
+        """
+        kind = 'cuda' if alg.endswith("_CUDA") else 'linear'
+        if is_cuda_projector(self.projector_id) == (kind == 'cuda'):
+            return self.projector_id
+        if kind not in self.extra_projectors:
+            self.extra_projectors[kind] = astra.create_projector(kind, self.proj_geom,
+                                                                self.vol_geom)
+        return self.extra_projectors[kind]
+
+    def matrix_solver(self, alg):
+        """ Returns the NumPy solver for the given algorithm, creating
+            the system matrix and the solver weights on first use only.
+            Parameters:
+                - alg: one of "SIRT_NUMPY", "CGLS_NUMPY", "OS_SART", "OS_SIRT". (string)
+        """
+        key = alg
+        if alg in ["OS_SART", "OS_SIRT"]:
+            key = (alg, self.n_subsets, self.subset_order)
+        if key not in self.matrix_solvers:
+            if self.W is None:
+                self.load_system_matrix()
+            if alg == "SIRT_NUMPY":
+                solver = SIRTSolver(self.W, self.rec_shape, self.sinogram.shape,
+                                    WT=self.WT)
+            elif alg == "CGLS_NUMPY":
+                solver = CGLSSolver(self.W, self.rec_shape, self.sinogram.shape,
+                                    WT=self.WT)
+            else:
+                # OS_SART uses one angle per subset
+                solver = OSSolver(self.W, self.rec_shape, self.sinogram.shape,
+                                n_subsets=self.n_subsets if alg == "OS_SIRT" else None,
+                                ordering=self.subset_order,
+                                seed=self.rng.integers(2**32))
+            self.matrix_solvers[key] = solver
+        return self.matrix_solvers[key]
+
+    def load_system_matrix(self):
+        """ Computes the system matrix of the geometry, or maps it
+            from the cache directory when one is defined.
+        """
+        kind = self.cpu_projector_type()
+        if self.matrix_cache_dir is None:
+            self.W = system_matrix(self.proj_geom, self.vol_geom, kind)
+            return
+        cache_dir = None if self.matrix_cache_dir == "default" else self.matrix_cache_dir
+        self.W = cached_system_matrix(self.proj_geom, self.vol_geom, kind,
+                                        cache_dir=cache_dir)
+        self.WT = cached_system_matrix(self.proj_geom, self.vol_geom, kind,
+                                        cache_dir=cache_dir, transpose=True)
+
+    def cpu_projector_type(self):
+        """ Returns the astra CPU projector type of the instance, used for
+            the system matrix. The cuda projector is approximated by the
+            linear one, or by the line one for fan beam geometries.
+        """
+        if self.projector_type != 'cuda':
+            return self.projector_type
+        return 'line_fanflat' if self.proj_geom['type'].startswith('fanflat') else 'linear'
+
+    def threaded_projections(self):
+        """ Returns True when the CPU projections are split over threads:
+            parallel beam geometries projected with a line, linear or strip
+            projector. The other geometries and projectors use the astra
+            projector of the instance.
+        """
+        return (self.thread_projections and self.n_threads != 1
+                and self.projector_type in THREADED_PROJECTORS
+                and self.proj_geom['type'] == 'parallel')
+
+    def threaded_projector(self):
+        """ Returns the projector splitting the CPU projections of the
+            geometry by angles over n_threads threads, created on first use.
+            The projector type of the instance is used, linear for cuda.
+        """
+        if self._threaded is None:
+            kind = self.projector_type if self.projector_type in THREADED_PROJECTORS \
+                    else 'linear'
+            self._threaded = ThreadedProjector(self.proj_geom, self.vol_geom, kind,
+                                                self.n_threads)
+        return self._threaded
+
+    def threaded_ART(self, rec, mask=None, iters=5, tol=None, check_every=10):
+        """ Reconstruction with SIRT on the threaded CPU projections.
+            Parameters and output as in the ART method.
+        """
+        projector = self.threaded_projector()
+        if mask is None:  # first reconstruction
+            rec = projector.sirt(self.sinogram, x0=0., iters=iters,
+                                tol=tol, check_every=check_every)
+        else:
+            # create free pixels' sinogram
+            fixed_sino = projector.forward(np.where(mask > 0, 0., rec))
+            rec = projector.sirt(self.sinogram - fixed_sino, x0=rec, iters=iters,
+                                mask=mask, tol=tol, check_every=check_every)
+        self.inner_history.append(projector.last_iters)
+        return rec
+
+    def matrix_ART(self, rec, mask=None,
+                    alg="SIRT_NUMPY", iters=5, tol=None, check_every=10):
+        """ Reconstruction with the NumPy solvers on the explicit system matrix.
+            Parameters and output as in the ART method. rec and mask can also
+            be stacks of shape (K, rows, cols), reconstructed as one batch.
+        """
+        solver = self.matrix_solver(alg)
+        if mask is None:  # first reconstruction
+            rec = solver.solve(self.sinogram, x0=0., iters=iters,
+                                tol=tol, check_every=check_every)
+        else:
+            # create free pixels' sinogram(s)
+            fixed_rec = np.where(mask > 0, 0., rec)
+            if fixed_rec.ndim == 3:
+                n = fixed_rec.shape[0]
+                fixed_sino = (solver.W @ fixed_rec.reshape(n, -1).T).T.reshape(
+                                (n,) + self.sinogram.shape)
+            else:
+                fixed_sino = (solver.W @ fixed_rec.ravel()).reshape(self.sinogram.shape)
+            rec = solver.solve(self.sinogram - fixed_sino, x0=rec, iters=iters,
+                                mask=mask, tol=tol, check_every=check_every)
+        self.inner_history.append(solver.last_iters)
+        return rec
 
     def update_gray_thresholds(self):
         """ Updates algorithms' thresholds for the currently
@@ -158,21 +1158,20 @@ class DART():
             segmented_img[cond] = self.gray_levels[thresh_idx]
         return segmented_img
 
-    def pixel_neighborhood(self, img_shape, x, y):
-        """ Returns an array containing all the neighbours of the given pixel
+    def label_map(self, img):
+        """ Segments an image to a compact label map: the indices of
+            the gray levels in a table, one byte per pixel instead of
+            the float reconstruction. Pixels out of the support are 0.
             Parameters:
-                - x, y: (int) pixel coordinates to calculate boundaries for.
+                - img: (np.array) image or stack of images to segment.
             Returns:
-                - neighbours: (list) list of touples containing the neighbours coordinates.
+                (tuple) label map (np.array of uint8) and gray level table
+                (np.array of uint8), table[labels] is the segmented image.
         """
-        # calculate all possible neighbours
-        # related to the x,y coordinates
-        neighbours = [(i,j) 
-                        for i in range(x-1, x+2) 
-                            if i > -1 and i < img_shape[0]
-                                for j in range(y-1, y+2) 
-                                    if j > -1 and j < img_shape[1] ] # and (x != i & y != j)
-        return neighbours
+        segmented_img = self.segment(img)
+        segmented_img[..., ~self.support] = 0
+        table = label_table(self.gray_levels)
+        return label_map(segmented_img, table), table
 
     def boundary_pixels(self, img):
         """ Computes the boundary pixels of the image.
@@ -185,16 +1184,59 @@ class DART():
                 - bool_mask: (np.array) boolean matrix representing the 
                     mask of boundary pixels.
         """
-        # initialize output mask to 0
-        bool_mask = np.full(fill_value=False, shape=img.shape[:2], dtype=np.bool8)
-        for x in range(img.shape[0]):
-            for y in range(img.shape[1]):
-                pixel = img[x,y]
-                # get actual neighbours values
-                neighbours = [img[i] for i in self.all_neighbours_idx[x][y]]
-                # update pixel value
-                if np.any(neighbours != pixel):
-                    bool_mask[x,y] = True
+        # edge padding only repeats pixels that are already neighbours,
+        # stacks of images (K, rows, cols) are padded on the last two axes
+        padded = np.pad(img, [(0, 0)] * (img.ndim - 2) + [(1, 1), (1, 1)], mode='edge')
+        rows, cols = img.shape[-2:]
+        bool_mask = np.zeros(img.shape, dtype=bool)
+        for dx in range(3):
+            for dy in range(3):
+                bool_mask |= padded[..., dx:dx+rows, dy:dy+cols] != img
+        return bool_mask
+
+    def update_boundary_pixels(self, img, max_changed=0.001):
+        """ Updates the boundary mask of the previous iteration for the
+            new segmented image. Only the neighbourhoods of the pixels whose
+            label changed are recomputed, which costs about 3us per changed
+            pixel against about 4ns per pixel for the full recomputation,
+            so the full mask is recomputed above max_changed changes.
+
+            Parameters:
+                - img: (np.array) segmented image.
+                - max_changed: (float) fraction of changed pixels above which
+                    the full mask is recomputed instead.
+            Returns:
+                - bool_mask: (np.array) read-only boolean mask of boundary pixels,
+                    updated in place by the next call.
+        """
+        if self.prev_segmented is None or self.prev_segmented.shape != img.shape:
+            self.boundary_mask = self.boundary_pixels(img)
+            self.prev_segmented = img.copy()
+        else:
+            changed = np.flatnonzero(img != self.prev_segmented)
+            if changed.size > max_changed * img.size:
+                self.boundary_mask = self.boundary_pixels(img)
+                np.copyto(self.prev_segmented, img)
+            elif changed.size > 0:
+                rows, cols = img.shape
+                offsets = np.arange(-1, 2)
+                x, y = np.divmod(changed, cols)
+                # candidates are the changed pixels and their neighbours
+                cand_x = np.clip(x[:, None, None] + offsets[None, :, None], 0, rows-1)
+                cand_y = np.clip(y[:, None, None] + offsets[None, None, :], 0, cols-1)
+                cand = np.unique((cand_x * cols + cand_y).ravel())
+                x, y = np.divmod(cand, cols)
+                # clipping the neighbours to the image repeats the pixels on the edge
+                nbr_x = np.clip(x[:, None, None] + offsets[None, :, None], 0, rows-1)
+                nbr_y = np.clip(y[:, None, None] + offsets[None, None, :], 0, cols-1)
+                flat = img.ravel()
+                is_boundary = (flat[nbr_x * cols + nbr_y]
+                                != flat[cand][:, None, None]).any(axis=(1, 2))
+                self.boundary_mask.ravel()[cand] = is_boundary
+                self.prev_segmented.ravel()[changed] = flat[changed]
+        # a view instead of a copy, the tracked mask can not be modified through it
+        bool_mask = self.boundary_mask.view()
+        bool_mask.flags.writeable = False
         return bool_mask
 
     def free_pixels(self):
@@ -208,8 +1250,7 @@ class DART():
                 - free_pixels: (np.array) matrix of the defined rec_shape
                     containing the mask of free pixels.
         """
-        free_pixels = np.random.choice(a=self.c, 
-                                    size=self.rec_shape, 
-                                    p=self.probs).astype(np.bool8)
+        # a pixel is free with probability 1-p
+        free_pixels = self.rng.random(self.rec_shape) < self.probs[1]
         return free_pixels
 
@@ -1,9 +1,12 @@
 import astra
+from .backends import resolve_use_gpu
 
 def SART(vol_geom, vol_data, projector_id, sino_id, iters=2000, use_gpu=False):
         """ Simultaneous Algebraic Reconstruction Technique (SART) with
             randomized scheme. Used from DART as the continious update step.
         """
+        # "auto" uses the gpu when available
+        use_gpu = resolve_use_gpu(use_gpu)
         # create starting reconstruction
         rec_id = astra.data2d.create('-vol', vol_geom, data=vol_data)
         # define SART configuration parameters
@@ -1,6 +1,9 @@
 import astra
+from .backends import resolve_use_gpu
 
 def SIRT(vol_geom, vol_data, sino_id, iters=2000, use_gpu=False):
+        # "auto" uses the gpu when available
+        use_gpu = resolve_use_gpu(use_gpu)
         # create starting reconstruction
         rec_id = astra.data2d.create('-vol', vol_geom, data=vol_data)
         # define SIRT config params
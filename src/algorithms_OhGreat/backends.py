@@ -0,0 +1,154 @@
+import time
+import numpy as np
+import astra
+
+# interchangeable implementations of each reconstruction algorithm
+FAMILIES = {"SART": ["SART_CUDA", "SART", "OS_SART"],
+            "SIRT": ["SIRT_CUDA", "SIRT", "SIRT_NUMPY", "SIRT_THREADS"],
+            "FBP": ["FBP_CUDA", "FBP"]}
+
+# results of the probes, computed once per process
+_cuda_available = None
+_cost_models = {}
+
+def cuda_available():
+    """ Checks if astra can project on a GPU, by projecting a small image
+        with a cuda projector. The result is cached for the whole process.
+        Returns:
+            - (bool) True when the CUDA algorithms can be used.
+    """
+    global _cuda_available
+    if _cuda_available is None:
+        proj_id = None
+        try:
+            vol_geom = astra.create_vol_geom(8, 8)
+            proj_geom = astra.create_proj_geom('parallel', 1., 8, np.array([0.]))
+            proj_id = astra.create_projector('cuda', proj_geom, vol_geom)
+            sino_id, _ = astra.creators.create_sino(np.zeros((8, 8)), proj_id)
+            astra.data2d.delete(sino_id)
+            _cuda_available = True
+        except Exception:
+            _cuda_available = False
+        finally:
+            if proj_id is not None:
+                astra.projector.delete(proj_id)
+    return _cuda_available
+
+def resolve_use_gpu(use_gpu):
+    """ Resolves the "auto" value of the use_gpu parameters.
+    """
+    if use_gpu == "auto":
+        return cuda_available()
+    return use_gpu
+
+def is_cuda_projector(projector_id):
+    """ Returns True when the given astra projector is a cuda projector.
+    """
+    try:
+        return bool(astra.projector.is_cuda(projector_id))
+    except Exception:
+        # older astra versions can not tell, assume a cpu projector
+        return False
+
+def rec_iter_for(alg, rec_iter, n_angles):
+    """ Converts a number of iterations of the astra implementation of an
+        algorithm to the iterations of another implementation.
+        An iteration of astra SART uses a single angle, while an iteration
+        of OS_SART is a full pass over all the angles.
+    """
+    if alg == "OS_SART":
+        return max(1, int(np.ceil(rec_iter / n_angles)))
+    return rec_iter
+
+def _time_alg(alg, size, n_angles, rec_iter):
+    """ Times the setup and a reconstruction call of DART with the
+        given algorithm on a disk phantom of the given size.
+        Returns None when the algorithm is not available.
+    """
+    # imported here to avoid a circular import
+    from .DART import DART
+    vol_geom = astra.create_vol_geom(size, size)
+    angles = np.linspace(0, np.pi, n_angles, endpoint=False)
+    proj_geom = astra.create_proj_geom('parallel', 1., size, angles)
+    proj_id = astra.create_projector('cuda' if alg.endswith("_CUDA") else 'linear',
+                                    proj_geom, vol_geom)
+    try:
+        xv, yv = np.meshgrid(np.linspace(-1, 1, size), np.linspace(-1, 1, size))
+        phantom = 255. * (xv**2 + yv**2 < 0.5)
+        sino_id, sinogram = astra.creators.create_sino(phantom, proj_id)
+        astra.data2d.delete(sino_id)
+        start = time.perf_counter()
+        dart = DART(gray_levels=[0, 255], p=0.5, rec_shape=(size, size),
+                    proj_geom=proj_geom, projector_id=proj_id, sinogram=sinogram)
+        # the first call also pays for the lazy setup of the solvers
+        calls = []
+        for _ in range(2):
+            dart.ART(np.zeros((size, size)), mask=None, alg=alg,
+                    iters=rec_iter_for(alg, rec_iter, n_angles))
+            calls.append(time.perf_counter() - start)
+            start = time.perf_counter()
+        return calls[0] - calls[1], calls[1]
+    except Exception:
+        return None
+    finally:
+        astra.projector.delete(proj_id)
+
+def cost_model(alg, sizes=(32, 96), n_angles=16, rec_iter=64):
+    """ Calibrates the cost model of an algorithm on small problems.
+        The setup time (system matrix, weights, gpu initialization) and the
+        time of a reconstruction call are modeled as
+            setup = a + b * work,  call = c + d * work * rec_iter,
+        with work = n_angles * n_detectors * image side.
+        Parameters:
+            - alg: name of the algorithm. (string)
+            - sizes: image sizes of the two calibration problems. (tuple)
+            - n_angles, rec_iter: angles and iterations of the calibration problems.
+        Returns:
+            - (tuple) (a, b, c, d), or None when the algorithm is not available.
+    """
+    if alg in _cost_models:
+        return _cost_models[alg]
+    model = None
+    if not alg.endswith("_CUDA") or cuda_available():
+        timings = [_time_alg(alg, size, n_angles, rec_iter) for size in sizes]
+        if None not in timings:
+            works = [n_angles * size * size for size in sizes]
+            setups, calls = zip(*timings)
+            b = max(0., (setups[1] - setups[0]) / (works[1] - works[0]))
+            a = max(0., setups[0] - b * works[0])
+            d = max(0., (calls[1] - calls[0]) / ((works[1] - works[0]) * rec_iter))
+            c = max(0., calls[0] - d * works[0] * rec_iter)
+            model = (a, b, c, d)
+    _cost_models[alg] = model
+    return model
+
+def select_algorithm(family, rec_shape, n_angles, n_detectors,
+                    rec_iter, n_calls=1):
+    """ Chooses the fastest available implementation of an algorithm
+        for the given problem size, using the calibrated cost models.
+        Parameters:
+            - family: "SART", "SIRT" or "FBP". (string)
+            - rec_shape: shape of the reconstruction. (tuple)
+            - n_angles, n_detectors: shape of the sinogram. (int)
+            - rec_iter: iterations of each reconstruction call, counted
+                as for the astra implementation. (int)
+            - n_calls: number of reconstruction calls, e.g. DART iterations + 1. (int)
+        Returns:
+            - (tuple) name of the chosen algorithm and the number of
+                iterations to run with it.
+    """
+    if family not in FAMILIES:
+        raise ValueError(f"Unknown algorithm family: {family}")
+    work = n_angles * n_detectors * max(rec_shape)
+    best, best_cost = None, np.inf
+    for alg in FAMILIES[family]:
+        model = cost_model(alg)
+        if model is None:
+            continue
+        a, b, c, d = model
+        cost = a + b * work + n_calls * (c + d * work * rec_iter)
+        if cost < best_cost:
+            best, best_cost = alg, cost
+    if best is None:
+        raise RuntimeError(f"No {family} implementation is available.")
+    return best, rec_iter_for(best, rec_iter, n_angles)
@@ -0,0 +1,106 @@
+import numpy as np
+
+def _label_tile(block, thresholds, lut, count, above):
+    """ Labels a block of the reconstruction: count is set to the number of
+        thresholds below each value and the lut maps it to its gray level.
+        The last threshold is strict, so later gray levels win on the
+        thresholds, as in DART.segment, and values out of them get 0.
+    """
+    np.greater_equal(block, thresholds[0], out=above)
+    count[...] = above
+    for t in thresholds[1:-1]:
+        np.greater_equal(block, t, out=above)
+        count += above
+    np.greater(block, thresholds[-1], out=above)
+    count += above
+
+def _extrema(window, first, n, horizontal, out, op):
+    """ Maximum or minimum (op) of the 3x3 neighbourhood of the n rows of
+        the window starting at row first, with the image edges repeated.
+        The window holds the rows of the tile and of its halo.
+    """
+    m = len(window)
+    h = horizontal[:m]
+    op(window[:, 1:], window[:, :-1], out=h[:, 1:])
+    h[:, 0] = window[:, 0]
+    op(h[:, :-1], window[:, 1:], out=h[:, :-1])
+    out = out[:n]
+    out[...] = h[first:first+n]
+    # rows above and below, when in the window
+    op(out[1-first:], h[:first+n-1], out=out[1-first:])
+    k = m - 1 - first
+    op(out[:k], h[first+1:first+1+k], out=out[:k])
+    return out
+
+def fused_stage(rec, thresholds, gray_levels, support, active, draws, free_prob,
+                tile_rows=None):
+    """ Segmentation, boundary detection, free pixel selection and write
+        back of the fixed pixels of a DART iteration in a single pass over
+        the image, instead of one full image pass for each of them. The
+        image is processed in tiles of rows small enough to stay in cache,
+        with one row of halo, and the boundaries are found from the
+        maximum and minimum label of the neighbourhoods on uint8 labels.
+        The results are the same as the separate steps.
+
+        Parameters:
+            - rec: (np.array) reconstruction, the fixed pixels are set to
+                their gray level in place.
+            - thresholds: (list) thresholds of the gray levels, as in DART.
+            - gray_levels: (list) gray levels.
+            - support: (np.array) boolean mask, pixels outside are labeled 0.
+            - active: (np.array) boolean mask of the pixels that can be free.
+            - draws: (np.array) uniform random values, pixels with a draw
+                below free_prob are free. A np.random.Generator draws them
+                tile by tile instead, the same values as its random(rec.shape).
+            - free_prob: (float) probability of a pixel to be free.
+            - tile_rows: (int) rows of the tiles, defaults to about
+                64k pixels per tile.
+        Returns:
+            (tuple) segmented image (np.array of uint8) and mask of the free
+            pixels (np.array of bool).
+    """
+    rows, cols = rec.shape
+    thresholds = np.asarray(thresholds, dtype=np.float64)
+    levels = np.asarray(gray_levels).astype(np.uint8)
+    support = np.asarray(support, dtype=bool)
+    active = np.asarray(active, dtype=bool)
+    labels = np.empty((rows, cols), dtype=np.uint8)
+    free = np.empty((rows, cols), dtype=bool)
+    tile_rows = tile_rows or max(1, 65536 // cols)
+    # gray level of each threshold count, 0 out of the thresholds
+    lut = np.zeros(len(thresholds) + 1, dtype=np.uint8)
+    lut[1:len(levels)+1] = levels
+    # buffers of a tile and its halo, reused by all the tiles
+    shape = (tile_rows + 2, cols)
+    count, above = np.empty(shape, dtype=np.uint8), np.empty(shape, dtype=bool)
+    horizontal = np.empty(shape, dtype=np.uint8)
+    upper, lower = np.empty(shape, dtype=np.uint8), np.empty(shape, dtype=np.uint8)
+    rng = draws if isinstance(draws, np.random.Generator) else None
+    tile_draws = np.empty(shape) if rng is not None else None
+    labeled = 0
+    for start in range(0, rows, tile_rows):
+        stop = min(start + tile_rows, rows)
+        n = stop - start
+        # label the tile and the halo row below, the one above is already labeled
+        end = min(stop + 1, rows)
+        m = end - labeled
+        _label_tile(rec[labeled:end], thresholds, lut, count[:m], above[:m])
+        count[:m] *= support[labeled:end]
+        np.take(lut, count[:m], out=labels[labeled:end])
+        labeled = end
+        # a pixel is a boundary when its neighbourhood has several labels
+        top = max(start - 1, 0)
+        window = labels[top:end]
+        tile_max = _extrema(window, start - top, n, horizontal, upper, np.maximum)
+        tile_min = _extrema(window, start - top, n, horizontal, lower, np.minimum)
+        tile_free = free[start:stop]
+        np.not_equal(tile_max, tile_min, out=tile_free)
+        if rng is not None:
+            uniform = tile_draws[:n]
+            rng.random(out=uniform)
+        else:
+            uniform = draws[start:stop]
+        tile_free |= uniform < free_prob
+        tile_free &= active[start:stop]
+        np.copyto(rec[start:stop], labels[start:stop], where=~tile_free)
+    return labels, free
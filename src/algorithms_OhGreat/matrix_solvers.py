@@ -0,0 +1,234 @@
+import numpy as np
+
+class MatrixSolver():
+    def __init__(self, W, rec_shape, sino_shape,
+                min_constraint=0, max_constraint=255, WT=None):
+        """ Base class for the NumPy reconstruction solvers working
+            directly on the explicit system matrix of a geometry.
+            Batches of sinograms (K, n_angles, n_detectors) and of starting
+            images (K, rows, cols) are solved together as sparse
+            matrix-matrix products, one column per reconstruction.
+
+            Parameters:
+                - W: (scipy.sparse matrix) system matrix of shape (n_rays, n_pixels).
+                    (Can be created with the **system_matrix** function)
+                - rec_shape: shape of the reconstructed image. (tuple)
+                - sino_shape: shape of the sinogram, (n_angles, n_detectors). (tuple)
+                - min_constraint, max_constraint: values the reconstruction
+                    is clipped to after each iteration, None to disable.
+                - WT: transposed system matrix, computed on first use when not given.
+        """
+        self.W = W.tocsr()
+        self._WT = None if WT is None else WT.tocsr()
+        self.rec_shape = tuple(rec_shape)
+        self.sino_shape = tuple(sino_shape)
+        self.min_constraint = min_constraint
+        self.max_constraint = max_constraint
+        # iterations run by the last solve
+        self.last_iters = 0
+
+    @property
+    def WT(self):
+        """ Transposed copy of W in csr format for fast backprojections,
+            computed on first use.
+        """
+        if self._WT is None:
+            self._WT = self.W.T.tocsr()
+        return self._WT
+
+    def close(self):
+        """ Releases the resources of the solver.
+        """
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _to_columns(self, data, shape, n_cols=None):
+        """ Flattens a single array or a batch of arrays of the given shape
+            into a matrix with one column per element of the batch.
+            Scalars and None are broadcasted to n_cols columns.
+        """
+        size = int(np.prod(shape))
+        if data is None:
+            data = 0.
+        data = np.asarray(data, dtype=np.float64)
+        if data.ndim == 0:
+            return np.full((size, n_cols or 1), data.item())
+        if data.shape == shape:
+            cols = data.reshape(size, 1)
+        elif data.shape[1:] == shape:
+            cols = data.reshape(data.shape[0], size).T
+        else:
+            raise ValueError(f"Expected shape {shape} or (K, *{shape}), got {data.shape}.")
+        if n_cols is not None and cols.shape[1] != n_cols:
+            if cols.shape[1] != 1:
+                raise ValueError("Batch sizes of the inputs do not match.")
+            cols = np.repeat(cols, n_cols, axis=1)
+        return np.ascontiguousarray(cols)
+
+    def _from_columns(self, cols, batched):
+        """ Inverse of _to_columns for reconstructions.
+        """
+        if not batched:
+            return cols[:, 0].reshape(self.rec_shape)
+        return cols.T.reshape((cols.shape[1],) + self.rec_shape)
+
+    def _prepare(self, sinogram, x0, mask):
+        """ Brings sinogram, starting images and mask to column format.
+        """
+        # batch size is given by the inputs passed as stacks
+        batch_sizes = [np.shape(arr)[0] for arr in (sinogram, x0, mask)
+                        if arr is not None and np.ndim(arr) == 3]
+        batched = len(batch_sizes) > 0
+        n_cols = max(batch_sizes, default=1)
+        b = self._to_columns(sinogram, self.sino_shape, n_cols)
+        x = self._to_columns(x0, self.rec_shape, n_cols)
+        M = None
+        if mask is not None:
+            M = self._to_columns(mask, self.rec_shape, n_cols) > 0
+        return b, x, M, batched
+
+    def _inverse(self, sums, eps=1e-6):
+        """ Inverts the given sums, zeroing rays and pixels with no weight.
+        """
+        inv = np.zeros_like(sums, dtype=np.float64)
+        np.divide(1., sums, out=inv, where=np.abs(sums) > eps)
+        return inv
+
+    def _check_residual(self, residual, prev_norms, tol):
+        """ Computes the residual norm of each column and checks if none of
+            them decreased by more than the fraction tol since prev_norms.
+            Returns the norms and True when the solve can stop.
+        """
+        norms = np.linalg.norm(residual, axis=0)
+        if prev_norms is None:
+            return norms, False
+        return norms, bool(np.all(prev_norms - norms <= tol * prev_norms))
+
+    def _clip(self, x, M):
+        """ Applies the min/max constraints to the updated pixels.
+        """
+        if self.min_constraint is None and self.max_constraint is None:
+            return x
+        clipped = np.clip(x, self.min_constraint, self.max_constraint)
+        if M is None:
+            return clipped
+        return np.where(M, clipped, x)
+
+
+class SIRTSolver(MatrixSolver):
+    def __init__(self, W, rec_shape, sino_shape,
+                min_constraint=0, max_constraint=255, WT=None):
+        """ Simultaneous Iterative Reconstruction Technique (SIRT)
+            on the explicit system matrix. Column sums are computed once
+            per geometry, row sums once per reconstruction mask.
+            Parameters as in MatrixSolver.
+        """
+        super().__init__(W, rec_shape, sino_shape,
+                        min_constraint, max_constraint, WT)
+        # inverse column sums are the same for every mask
+        self.col_weights = self._inverse(self.WT @ np.ones(self.W.shape[0]))[:, None]
+        self.full_row_weights = self._inverse(self.W @ np.ones(self.W.shape[1]))[:, None]
+        self._mask_key, self._mask_row_weights = None, None
+
+    def row_weights(self, M):
+        """ Returns the inverse row sums restricted to the mask M,
+            reusing the last computed ones when the mask did not change.
+        """
+        if M is None:
+            return self.full_row_weights
+        key = (M.shape, hash(np.packbits(M).tobytes()))
+        if key != self._mask_key:
+            self._mask_row_weights = self._inverse(self.W @ M.astype(np.float64))
+            self._mask_key = key
+        return self._mask_row_weights
+
+    def solve(self, sinogram, x0=None, iters=100, mask=None,
+                tol=None, check_every=10):
+        """ Runs SIRT on one sinogram or on a batch of sinograms.
+            Parameters:
+                - sinogram: (np.array) of shape (n_angles, n_detectors)
+                    or (K, n_angles, n_detectors).
+                - x0: starting image(s), scalar, (rows, cols) or (K, rows, cols).
+                - iters: number of iterations to run. (int)
+                - mask: pixels to update, (rows, cols) or (K, rows, cols).
+                    Pixels outside the mask are not projected nor updated.
+                - tol: when defined, stop as soon as the residual of no column
+                    decreased by more than this fraction over check_every iterations.
+                - check_every: iterations between two residual checks. (int)
+            Returns:
+                - reconstructed image(s). (np.array)
+        """
+        b, x, M, batched = self._prepare(sinogram, x0, mask)
+        R = self.row_weights(M)
+        norms = None
+        self.last_iters = 0
+        for it in range(iters):
+            x_proj = np.where(M, x, 0.) if M is not None else x
+            residual = b - self.W @ x_proj
+            if tol is not None and it % check_every == 0:
+                norms, stop = self._check_residual(residual, norms, tol)
+                if stop:
+                    break
+            update = self.col_weights * (self.WT @ (R * residual))
+            if M is not None:
+                update[~M] = 0.
+            x = self._clip(x + update, M)
+            self.last_iters = it + 1
+        return self._from_columns(x, batched)
+
+
+class CGLSSolver(MatrixSolver):
+    def __init__(self, W, rec_shape, sino_shape, WT=None):
+        """ Conjugate Gradient Least Squares (CGLS) on the explicit
+            system matrix. Each column of a batch keeps its own step sizes,
+            so a batch converges as the individual solves would.
+            Constraints are not applied, as for the astra CGLS algorithm.
+        """
+        super().__init__(W, rec_shape, sino_shape, None, None, WT)
+
+    def solve(self, sinogram, x0=None, iters=100, mask=None,
+                tol=None, check_every=10):
+        """ Runs CGLS on one sinogram or on a batch of sinograms.
+            Parameters and output as in SIRTSolver.solve.
+        """
+        b, x, M, batched = self._prepare(sinogram, x0, mask)
+        # pixels outside the mask keep their starting values,
+        # x is updated in place and can be a view of x0
+        x_fixed = x
+        x = np.where(M, x, 0.) if M is not None else x.copy()
+        r = b - self.W @ x
+        s = self.WT @ r
+        if M is not None:
+            s[~M] = 0.
+        p = s.copy()
+        gamma = np.einsum('ij,ij->j', s, s)
+        norms = None
+        self.last_iters = 0
+        for it in range(iters):
+            if tol is not None and it % check_every == 0:
+                norms, stop = self._check_residual(r, norms, tol)
+                if stop:
+                    break
+            q = self.W @ p
+            q_norm = np.einsum('ij,ij->j', q, q)
+            alpha = np.zeros_like(gamma)
+            np.divide(gamma, q_norm, out=alpha, where=q_norm > 0)
+            x += alpha * p
+            r -= alpha * q
+            s = self.WT @ r
+            if M is not None:
+                s[~M] = 0.
+            gamma_new = np.einsum('ij,ij->j', s, s)
+            beta = np.zeros_like(gamma)
+            np.divide(gamma_new, gamma, out=beta, where=gamma > 0)
+            p = s + beta * p
+            gamma = gamma_new
+            self.last_iters = it + 1
+        if M is not None:
+            x = np.where(M, x, x_fixed)
+        return self._from_columns(x, batched)
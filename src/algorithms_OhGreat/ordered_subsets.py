@@ -0,0 +1,137 @@
+import numpy as np
+from os import cpu_count
+from concurrent.futures import ThreadPoolExecutor
+from .matrix_solvers import MatrixSolver
+
+def subset_order(n_subsets, ordering="golden", rng=None):
+    """ Returns the order in which the subsets are visited in one pass.
+        Parameters:
+            - n_subsets: number of subsets. (int)
+            - ordering: "sequential", "random" (new permutation at every call)
+                or "golden" (golden ratio ordering, consecutive subsets are
+                always far apart in angle). (string)
+            - rng: (np.random.Generator) used by the random ordering.
+        Returns:
+            - (np.array) of subset indexes.
+    """
+    if ordering == "sequential":
+        return np.arange(n_subsets)
+    if ordering == "random":
+        rng = rng if rng is not None else np.random.default_rng()
+        return rng.permutation(n_subsets)
+    if ordering == "golden":
+        golden = (np.sqrt(5) - 1) / 2
+        return np.argsort((np.arange(n_subsets) * golden) % 1, kind="stable")
+    raise ValueError(f"Unknown subset ordering: {ordering}")
+
+
+class OSSolver(MatrixSolver):
+    def __init__(self, W, rec_shape, sino_shape, n_subsets=None,
+                ordering="golden", n_threads=None, relaxation=1.,
+                seed=None, min_constraint=0, max_constraint=255):
+        """ Ordered-subsets SART/SIRT on the explicit system matrix.
+            The projection angles are split in interleaved subsets and the
+            image is updated after each subset. Using one angle per subset
+            gives SART, a single subset gives SIRT. The rows of each subset
+            are split in contiguous blocks, one thread per block, so that
+            the detectors of a single angle are projected in parallel too.
+            The transposed system matrix of the base class is not used.
+
+            Parameters:
+                - W, rec_shape, sino_shape, min_constraint, max_constraint:
+                    as in MatrixSolver.
+                - n_subsets: number of subsets, defaults to one subset per angle. (int)
+                - ordering: order of the subsets, see subset_order. (string)
+                - n_threads: number of threads, defaults to the cpu count. (int)
+                - relaxation: relaxation factor of the updates. (float)
+                - seed: seed of the random subset ordering. (int)
+        """
+        super().__init__(W, rec_shape, sino_shape,
+                        min_constraint, max_constraint)
+        n_angles, n_detectors = self.sino_shape
+        if n_subsets is None:
+            n_subsets = n_angles
+        self.n_subsets = max(1, min(n_subsets, n_angles))
+        self.ordering = ordering
+        self.relaxation = relaxation
+        self.rng = np.random.default_rng(seed)
+        self.n_threads = n_threads or cpu_count() or 1
+        self.pool = ThreadPoolExecutor(self.n_threads) if self.n_threads > 1 else None
+        # each subset is split in blocks of rows, one per thread
+        self.subsets = []
+        for s in range(self.n_subsets):
+            angles = np.arange(s, n_angles, self.n_subsets)
+            subset_rows = (angles[:, None] * n_detectors + np.arange(n_detectors)).ravel()
+            blocks = []
+            for rows in np.array_split(subset_rows, min(self.n_threads, len(subset_rows))):
+                W_block = self.W[rows]
+                blocks.append((rows, W_block, W_block.T.tocsr()))
+            col_sums = sum(W_bT @ np.ones(W_bT.shape[1]) for _, _, W_bT in blocks)
+            self.subsets.append({"blocks": blocks,
+                                "col_weights": self._inverse(col_sums)[:, None]})
+        self._mask_key, self._mask_row_weights = None, None
+
+    def close(self):
+        """ Stops the threads of the solver.
+        """
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+
+    def _map(self, fn, items):
+        """ Runs fn over items on the thread pool, when available.
+        """
+        if self.pool is None:
+            return [fn(item) for item in items]
+        return list(self.pool.map(fn, items))
+
+    def row_weights(self, M):
+        """ Returns the inverse row sums of every block for the mask M,
+            reusing the last computed ones when the mask did not change.
+        """
+        key = None if M is None else (M.shape, hash(np.packbits(M).tobytes()))
+        if self._mask_row_weights is not None and key == self._mask_key:
+            return self._mask_row_weights
+        x = np.ones((self.W.shape[1], 1)) if M is None else M.astype(np.float64)
+        self._mask_row_weights = [self._map(lambda block: self._inverse(block[1] @ x),
+                                            subset["blocks"])
+                                    for subset in self.subsets]
+        self._mask_key = key
+        return self._mask_row_weights
+
+    def solve(self, sinogram, x0=None, iters=10, mask=None,
+                tol=None, check_every=1):
+        """ Runs the ordered-subsets reconstruction on one sinogram
+            or on a batch of sinograms.
+            Parameters:
+                - sinogram, x0, mask, tol: as in SIRTSolver.solve.
+                - iters: number of full passes over all the subsets. (int)
+                - check_every: passes between two residual checks, each
+                    check costs an additional projection. (int)
+            Returns:
+                - reconstructed image(s). (np.array)
+        """
+        b, x, M, batched = self._prepare(sinogram, x0, mask)
+        R = self.row_weights(M)
+        norms = None
+        self.last_iters = 0
+        for it in range(iters):
+            if tol is not None and it % check_every == 0:
+                x_proj = np.where(M, x, 0.) if M is not None else x
+                norms, stop = self._check_residual(b - self.W @ x_proj, norms, tol)
+                if stop:
+                    break
+            for s in subset_order(self.n_subsets, self.ordering, self.rng):
+                subset = self.subsets[s]
+                x_proj = np.where(M, x, 0.) if M is not None else x
+                # partial backprojections of the blocks of the subset
+                def backproject(i):
+                    rows, W_block, W_blockT = subset["blocks"][i]
+                    return W_blockT @ (R[s][i] * (b[rows] - W_block @ x_proj))
+                update = sum(self._map(backproject, range(len(subset["blocks"]))))
+                update *= self.relaxation * subset["col_weights"]
+                if M is not None:
+                    update[~M] = 0.
+                x = self._clip(x + update, M)
+            self.last_iters = it + 1
+        return self._from_columns(x, batched)
@@ -0,0 +1,153 @@
+import numpy as np
+import astra
+from itertools import product
+from concurrent.futures import ProcessPoolExecutor
+from .DART import DART
+
+def config_grid(**values):
+    """ Returns the list of configurations of all the combinations of
+        the given values, e.g. config_grid(p=[0.8, 0.9], rec_iter=[100, 500]).
+        Each configuration is a dict of DART.run parameters.
+    """
+    names = list(values)
+    return [dict(zip(names, combination))
+            for combination in product(*[values[name] for name in names])]
+
+def make_problem(phantom, n_projections=50, angle_range=180, n_detectors=None,
+                det_spacing=1., noise_factor=None, gray_levels=None, seed=None):
+    """ Creates a tuning problem by projecting a phantom.
+        Parameters:
+            - phantom: (np.array) 2D phantom, used as ground truth.
+            - n_projections: (int) number of projection angles.
+            - angle_range: (float) angular range in degrees.
+            - n_detectors: (int) defaults to the phantom width.
+            - det_spacing: (float) size of the detectors.
+            - noise_factor: Poisson noise as in project_from_2D.
+            - gray_levels: (list) defaults to the values of the phantom.
+            - seed: (int) seed of the noise.
+        Returns:
+            (dict) problem to pass to the tune function.
+    """
+    phantom = np.asarray(phantom)
+    n_detectors = n_detectors or phantom.shape[1]
+    vol_geom = astra.create_vol_geom(phantom.shape)
+    angles = np.linspace(0, np.pi*(angle_range/180), n_projections, endpoint=False)
+    proj_geom = astra.create_proj_geom('parallel', det_spacing, n_detectors, angles)
+    proj_id = astra.create_projector('linear', proj_geom, vol_geom)
+    sino_id, sinogram = astra.creators.create_sino(phantom.astype(np.float32), proj_id)
+    # free memory
+    astra.data2d.delete(sino_id)
+    astra.projector.delete(proj_id)
+    if noise_factor is not None:
+        rng = np.random.default_rng(seed)
+        sinogram = sinogram + rng.poisson(lam=noise_factor, size=sinogram.shape)
+    if gray_levels is None:
+        gray_levels = np.unique(phantom).astype(np.float32)
+    return {"proj_geom": proj_geom, "rec_shape": phantom.shape,
+            "sinogram": sinogram, "gray_levels": gray_levels,
+            "phantom": phantom, "projector_type": 'linear'}
+
+def evaluate(problem, config, iters, seed=0, x0=None, return_rec=False):
+    """ Runs DART with a configuration on a problem and scores the result.
+        Parameters:
+            - problem: (dict) with the keys proj_geom, rec_shape, sinogram and
+                gray_levels, and optionally phantom (ground truth) and
+                projector_type ('linear' by default).
+            - config: (dict) parameters of DART.run, p included.
+            - iters: (int) number of DART iterations.
+            - seed: (int) seed of the free pixels.
+            - x0: (np.array) reconstruction to continue from, e.g. the one
+                of a previous evaluation with fewer iterations.
+            - return_rec: (bool) also return the reconstruction.
+        Returns:
+            (float) mean absolute error with the phantom when available,
+            projection residual of the reconstruction otherwise.
+            With return_rec, a tuple (score, reconstruction).
+    """
+    config = dict(config)
+    dart = DART(gray_levels=problem["gray_levels"], p=config.pop("p", 0.85),
+                rec_shape=problem["rec_shape"], proj_geom=problem["proj_geom"],
+                projector_id=None, sinogram=problem["sinogram"], seed=seed,
+                projector_type=problem.get("projector_type", 'linear'))
+    rec = dart.run(iters, x0=x0, **config)
+    if problem.get("phantom") is not None:
+        score = float(np.abs(problem["phantom"] - rec).mean())
+    else:
+        score = dart.residual(rec)
+    return (score, rec) if return_rec else score
+
+def _evaluate_task(task):
+    """ Unpacks a task of the worker pool.
+    """
+    return evaluate(*task)
+
+def successive_halving(problems, configs, min_iters=2, max_iters=16, eta=2,
+                    seed=0, pool=None):
+    """ Successive halving over configurations of DART. All the
+        configurations run min_iters DART iterations, the best 1/eta of
+        them run eta times more iterations, and so on until one
+        configuration is left or max_iters is reached. The survivors
+        continue from their reconstruction of the previous round,
+        running only the iterations they are missing.
+        Parameters:
+            - problems: (list) problems as returned by make_problem, the score
+                of a configuration is its mean score over the problems.
+            - configs: (list) configurations, e.g. from config_grid.
+            - min_iters, max_iters: (int) DART iterations of the first and last round.
+                At least 2 iterations are run in the first round, as the last
+                iteration of a run does not smooth: with one iteration,
+                configurations differing by their smoothing would tie.
+            - eta: (int) reduction factor of each round.
+            - seed: (int) seed of the free pixels.
+            - pool: (concurrent.futures.Executor) runs the evaluations when given.
+        Returns:
+            (tuple) best configuration, its score and the history of the
+            rounds, as a list of (iters, [(config, score), ...]).
+    """
+    iters = min(max(min_iters, 2), max_iters)
+    survivors, history = list(configs), []
+    # reconstructions of the survivors on each problem, and their iterations
+    recs, done = [[None] * len(problems) for _ in survivors], 0
+    while True:
+        tasks = [(problem, config, iters - done, seed, recs[c][j], True)
+                for c, config in enumerate(survivors)
+                for j, problem in enumerate(problems)]
+        if pool is None:
+            results = [_evaluate_task(task) for task in tasks]
+        else:
+            results = list(pool.map(_evaluate_task, tasks))
+        scores = np.reshape([score for score, _ in results],
+                            (len(survivors), len(problems))).mean(axis=1)
+        recs = [[rec for _, rec in results[c*len(problems):(c+1)*len(problems)]]
+                for c in range(len(survivors))]
+        order = np.argsort(scores, kind="stable")
+        history.append((iters, [(survivors[i], float(scores[i])) for i in order]))
+        if len(survivors) == 1 or iters >= max_iters:
+            return survivors[order[0]], float(scores[order[0]]), history
+        order = order[:max(1, len(survivors) // eta)]
+        survivors, recs = [survivors[i] for i in order], [recs[i] for i in order]
+        iters, done = min(iters * eta, max_iters), iters
+
+def tune(problems, configs, min_iters=2, max_iters=16, eta=2,
+        seed=0, n_workers=None):
+    """ Finds the best DART configuration of each phantom family with
+        successive halving, evaluating the configurations on a process pool.
+        Parameters:
+            - problems: (dict) list of problems of each family.
+            - n_workers: (int) number of processes, defaults to the cpu count.
+                With 1 the evaluations run in the current process.
+            - other parameters as in successive_halving.
+        Returns:
+            (dict) best configuration, score and history of each family.
+    """
+    results = {}
+    if n_workers == 1:
+        for family, family_problems in problems.items():
+            results[family] = successive_halving(family_problems, configs, min_iters,
+                                                max_iters, eta, seed)
+        return results
+    with ProcessPoolExecutor(n_workers) as pool:
+        for family, family_problems in problems.items():
+            results[family] = successive_halving(family_problems, configs, min_iters,
+                                                max_iters, eta, seed, pool)
+    return results
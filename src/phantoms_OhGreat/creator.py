@@ -1,23 +1,31 @@
 import numpy as np
 from PIL import Image
 from os import makedirs
-from os.path import exists
+from os.path import exists, dirname
 
 def create_phantoms(phantoms="semilunars",img_size=512, gray_values=[80,120,180], n=1, 
-                        overlap=False, seed=None, img_name=None):
+                        overlap=False, seed=None, img_name=None, return_shapes=False):
+    """ Creates phantoms of the given family, see the create_<family>
+        functions for the parameters. With return_shapes=True the shape
+        descriptions of the phantoms are returned too, as (phantoms, shapes).
+    """
     generated = []
     if phantoms == "semilunars":
         generated = create_semilunars(img_size=img_size, gray_values=gray_values,
-                                    n=n, overlap=overlap, seed=seed, img_name=img_name)
+                                    n=n, overlap=overlap, seed=seed, img_name=img_name,
+                                    return_shapes=return_shapes)
     elif phantoms == "aliens":
         generated = create_aliens(img_size=img_size, gray_values=gray_values,
-                                    n=n, overlap=overlap, seed=seed, img_name=img_name)
+                                    n=n, overlap=overlap, seed=seed, img_name=img_name,
+                                    return_shapes=return_shapes)
     elif phantoms == "clouds":
         generated = create_clouds(img_size=img_size, gray_values=gray_values,
-                                    n=n, overlap=overlap, seed=seed, img_name=img_name)
+                                    n=n, overlap=overlap, seed=seed, img_name=img_name,
+                                    return_shapes=return_shapes)
     elif phantoms == "paws":
         generated = create_paws(img_size=img_size, gray_values=gray_values,
-                                    n=n, overlap=overlap, seed=seed, img_name=img_name)
+                                    n=n, overlap=overlap, seed=seed, img_name=img_name,
+                                    return_shapes=return_shapes)
     else:
         exit("please choose a valid class.")
     return generated
@@ -38,8 +46,27 @@ def create_image(x,y):
     xv, yv = np.meshgrid(_,_)
     return image, xv, yv
 
+def ellipse(center, scale, r, value):
+    """ Shape description of the pixels where
+        (xv-center[0])**2/scale[0] + (yv-center[1])**2/scale[1] < r,
+        in the coordinates of create_image, painted with value.
+    """
+    return {"type": "ellipse", "center": [float(center[0]), float(center[1])],
+            "scale": [float(scale[0]), float(scale[1])], "r": float(r),
+            "value": float(value)}
+
+def rectangle(rows, cols, size, value):
+    """ Shape description of the pixels image[rows[0]:rows[1], cols[0]:cols[1]]
+        of an image of the given size, painted with value. The rectangle
+        spans the pixels up to their edges.
+    """
+    step = 2 / (size - 1)
+    edges = lambda start, stop: [-1 + (start - 0.5)*step, -1 + (stop - 0.5)*step]
+    return {"type": "rectangle", "x": edges(*cols), "y": edges(*rows),
+            "value": float(value)}
+
 def create_semilunars(img_size=512, gray_values=[80,120,180], n=1, 
-                        overlap=False, seed=None, img_name=None):
+                        overlap=False, seed=None, img_name=None, return_shapes=False):
     """ Create lunar like phantoms.
 
         Input:
@@ -55,9 +82,12 @@ def create_semilunars(img_size=512, gray_values=[80,120,180], n=1,
                 it will be created as a png by default.
                 Example of definition of img_name:
                     img_name = "dir/to/save/filename"
+            - return_shapes: also return the shape description of
+                each phantom, as used by projections.analytic.
 
         Output:
             returns a list of phantoms. (Phantoms as numpy arrays)
+            With return_shapes, a tuple (phantoms, shape descriptions).
     """
     # control correct image size
     if img_size == 512:
@@ -70,11 +100,11 @@ def create_semilunars(img_size=512, gray_values=[80,120,180], n=1,
     if seed != None:
         np.random.seed(seed)
     # define save paths
-    if img_name != None:
-        if not exists('data/'):
-            makedirs('data/')
+    if img_name != None and dirname(img_name) != '':
+        if not exists(dirname(img_name)):
+            makedirs(dirname(img_name))
     # create phantoms
-    semilunars = []
+    semilunars, shapes = [], []
     for i in range(n):
         image, xv, yv = create_image(x,y)
         # define noise for randomization
@@ -94,16 +124,26 @@ def create_semilunars(img_size=512, gray_values=[80,120,180], n=1,
             image[(xv-0.1+noise[0])**2 + (yv-0.1+noise[0])**2 <0.11] = gray_values[1]
             image[(xv-0.2+noise[0])**2 + (yv-0.2+noise[0])**2 <0.02] = gray_values[2]
         semilunars.append(image.astype(np.uint8))
+        # same shapes, in painting order over a zero background
+        k = 1 if overlap == True else 0
+        shapes.append({"size": image.shape[0], "shapes": [
+            ellipse((0, 0), (1, 1), 0.49, gray_values[1]),
+            ellipse((0.1-noise[0], 0.1-noise[0]), (1, 1), 0.3, gray_values[0]),
+            ellipse((0.1-noise[k], 0.1-noise[k]), (1, 1), 0.19, gray_values[2]),
+            ellipse((0.1-noise[0], 0.1-noise[0]), (1, 1), 0.11, gray_values[1]),
+            ellipse((0.2-noise[k], 0.2-noise[k]), (1, 1), 0.02, gray_values[2])]})
         # save image
         if img_name != None:
             Image.fromarray(image.astype(np.uint8)).save(f"{img_name}_{i}.png")
+    if return_shapes:
+        return semilunars, shapes
     return semilunars
 
 
 
 
 def create_aliens(img_size=512, gray_values=[40,80,100], n=1, 
-                overlap=False, seed=None, img_name=None):
+                overlap=False, seed=None, img_name=None, return_shapes=False):
     """ Create alien like phantoms.
 
         Input:
@@ -119,9 +159,12 @@ def create_aliens(img_size=512, gray_values=[40,80,100], n=1,
                 it will be created as a png by default.
                 Example of definition of img_name:
                     img_name = "dir/to/save/filename"
+            - return_shapes: also return the shape description of
+                each phantom, as used by projections.analytic.
 
         Output:
             returns a list of phantoms. (Phantoms as numpy arrays)
+            With return_shapes, a tuple (phantoms, shape descriptions).
     """
     # control image size
     if img_size == 512:
@@ -134,11 +177,11 @@ def create_aliens(img_size=512, gray_values=[40,80,100], n=1,
     if seed != None:
         np.random.seed(seed)
     # define save paths
-    if img_name != None:
-        if not exists('data/'):
-            makedirs('data/')
+    if img_name != None and dirname(img_name) != '':
+        if not exists(dirname(img_name)):
+            makedirs(dirname(img_name))
     # create alien phantoms
-    aliens = []
+    aliens, shapes = [], []
     for i in range(n):
         image, xv, yv = create_image(x,y)
         # create noise for randomization
@@ -160,13 +203,29 @@ def create_aliens(img_size=512, gray_values=[40,80,100], n=1,
             image[(xv-0.3+noise[0])**2/0.2+(yv+0.1-noise[0])**2<0.01] = gray_values[0]
             image[(xv-0.01-noise[0])**2+(yv-0.6+noise[0])**2/0.025<0.02] = gray_values[0] 
         aliens.append(image.astype(np.uint8))
+        # same shapes, in painting order over a zero background
+        if overlap == True:
+            eyes = [ellipse((-0.3+noise[0], -0.01+noise[0]), (0.2, 1), 0.05, gray_values[1]),
+                    ellipse((-0.3+noise[1], -0.1+noise[1]), (0.2, 1), 0.01, gray_values[0]),
+                    ellipse((0.3-noise[0], -0.01-noise[0]), (0.2, 1), 0.05, gray_values[1]),
+                    ellipse((0.3-noise[1], -0.1-noise[1]), (0.2, 1), 0.01, gray_values[0])]
+        else:
+            eyes = [ellipse((-0.3+noise[0], -0.01+noise[0]), (0.2, 1), 0.05, gray_values[1]),
+                    ellipse((-0.3+noise[0], -0.1+noise[0]), (0.2, 1), 0.01, gray_values[0]),
+                    ellipse((0.3-noise[0], -0.01+noise[0]), (0.2, 1), 0.05, gray_values[1]),
+                    ellipse((0.3-noise[0], -0.1+noise[0]), (0.2, 1), 0.01, gray_values[0])]
+        shapes.append({"size": image.shape[0], "shapes":
+            [ellipse((0.01, -0.01), (0.5, 1), 0.48, gray_values[2])] + eyes +
+            [ellipse((0.01+noise[0], 0.6-noise[0]), (1, 0.025), 0.02, gray_values[0])]})
         # save image
         if img_name != None:
             Image.fromarray(image.astype(np.uint8)).save(f"{img_name}_{i}.png") 
+    if return_shapes:
+        return aliens, shapes
     return aliens
 
 def create_paws(img_size=512, gray_values=[80,120,180], n=1, 
-                        overlap=False, seed=None, img_name=None):
+                        overlap=False, seed=None, img_name=None, return_shapes=False):
     """ Create paw like phantoms.
 
         Input:
@@ -182,9 +241,12 @@ def create_paws(img_size=512, gray_values=[80,120,180], n=1,
                 it will be created as a png by default.
                 Example of definition of img_name:
                     img_name = "dir/to/save/filename"
+            - return_shapes: also return the shape description of
+                each phantom, as used by projections.analytic.
 
         Output:
             returns a list of phantoms. (Phantoms as numpy arrays)
+            With return_shapes, a tuple (phantoms, shape descriptions).
     """
     # img size control
     if img_size == 512:
@@ -197,10 +259,10 @@ def create_paws(img_size=512, gray_values=[80,120,180], n=1,
     if seed != None:
         np.random.seed(seed)
     # define save paths
-    if img_name != None:
-        if not exists('data/'):
-            makedirs('data/')
-    paws = []
+    if img_name != None and dirname(img_name) != '':
+        if not exists(dirname(img_name)):
+            makedirs(dirname(img_name))
+    paws, shapes = [], []
     for i in range(n):
         image, xv, yv = create_image(x,y)
 
@@ -241,14 +303,34 @@ def create_paws(img_size=512, gray_values=[80,120,180], n=1,
         image[image == 1] = 0
         
         paws.append(image.astype(np.uint8))
+        # same shapes, in painting order over a zero background
+        size = image.shape[0]
+        if img_size==256:
+            boxes = [([25,231], [30,40]), ([25,231], [216,226]), ([25,35], [40,216]),
+                    ([221,231], [40,216]), ([180,210+shift_y], [50,80+shift_x])]
+        else:
+            boxes = [([50,462], [60,80]), ([50,462], [432,452]), ([50,70], [80,432]),
+                    ([442,462], [80,432]), ([360,420+shift_y], [100,160+shift_x])]
+        paw = [ellipse((0, 0), (1, 1), 0.09, 255)]
+        paw += [rectangle(rows, cols, size, 255) for rows, cols in boxes]
+        paw.append(ellipse((0.5, -0.3+noise[0]), (0.2, 1), 0.05, 255))
+        if thresh[0] <7:
+            paw.append(ellipse((0.006, -0.18), (0.4, 0.7), 0.01, 0))
+        if thresh[1] > 5:
+            paw.append(ellipse((-0.17, -0.1), (0.4, 0.7), 0.01, 0))
+        paw.append(ellipse((0.17, -0.1), (0.4, 0.7), 0.01, 0))
+        paw.append(ellipse((0.01, 0.1), (0.7, 0.7), 0.02, 0))
+        shapes.append({"size": size, "shapes": paw})
         # save image
         if img_name != None:
             Image.fromarray(image.astype(np.uint8)).save(f"{img_name}_{i}.png") 
+    if return_shapes:
+        return paws, shapes
     return paws
 
 
 def create_clouds(img_size=512, gray_values=[80,120,180], n=1, 
-                        overlap=False, seed=None, img_name=None):
+                        overlap=False, seed=None, img_name=None, return_shapes=False):
     """ Create cloud like phantoms.
 
         Input:
@@ -264,9 +346,12 @@ def create_clouds(img_size=512, gray_values=[80,120,180], n=1,
                 it will be created as a png by default.
                 Example of definition of img_name:
                     img_name = "dir/to/save/filename"
+            - return_shapes: also return the shape description of
+                each phantom, as used by projections.analytic.
 
         Output:
             returns a list of phantoms. (Phantoms as numpy arrays)
+            With return_shapes, a tuple (phantoms, shape descriptions).
     """
     # img size control
     if img_size == 512:
@@ -279,12 +364,12 @@ def create_clouds(img_size=512, gray_values=[80,120,180], n=1,
     if seed != None:
         np.random.seed(seed)
     # define save paths
-    if img_name != None:
-        if not exists('data/'):
-            makedirs('data/')
+    if img_name != None and dirname(img_name) != '':
+        if not exists(dirname(img_name)):
+            makedirs(dirname(img_name))
 
 
-    clouds=[]
+    clouds, shapes = [], []
     for i in range(n):
         image, xv, yv = create_image(x,y)
 
@@ -318,8 +403,30 @@ def create_clouds(img_size=512, gray_values=[80,120,180], n=1,
             image[(xv-0.1)**2+(yv-0.1)**2/0.4<0.02] = 0
 
         clouds.append(image.astype(np.uint8))
+        # same shapes, in painting order over a zero background
+        cloud = [ellipse((0.1, -0.01), (1, 0.4), 0.6, 255),
+                ellipse((0.1, -0.5), (1, 0.4), 0.1, 255),
+                ellipse((0.1, 0.5), (1, 0.4), 0.1+noise[1], 255),
+                ellipse((-0.4, -0.5), (1, 0.4), 0.1, 255),
+                ellipse((0.4, 0.5), (1, 0.4), 0.1+noise[1], 255),
+                ellipse((0.6, -0.3), (1, 0.4), 0.1-noise[2], 255),
+                ellipse((-0.4, 0.3), (1, 0.4), 0.1-noise[2], 255)]
+        if 0.15<n[0]>0.3 :
+            holes = [(0.1, 0.1, 0.02), (-0.4, 0.2, 0.005), (0.1, -0.2, 0.01),
+                    (0.4, -0.2, 0.02), (-0.3, -0.3, 0.01), (0.4, 0.3, 0.02)]
+        elif n[0]<0.09:
+            holes = [(-0.4, 0.2, 0.005), (0.4, -0.2, 0.02), (0.4, 0.3, 0.02),
+                    (-0.3, -0.3, 0.01)]
+        else:
+            holes = [(-0.3, -0.3, 0.01), (0.4, 0.3, 0.02), (0.1, 0.1, 0.02)]
+        cloud += [ellipse((cx, cy), (1, 0.4), r, 0) for cx, cy, r in holes]
+        # shapes of negative size paint no pixel
+        shapes.append({"size": image.shape[0],
+                    "shapes": [shape for shape in cloud if shape["r"] > 0]})
 
         # save image
         if img_name != None:
             Image.fromarray(image.astype(np.uint8)).save(f"{img_name}_{i}.png") 
+    if return_shapes:
+        return clouds, shapes
     return clouds
\ No newline at end of file
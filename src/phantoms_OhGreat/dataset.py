@@ -0,0 +1,159 @@
+import json
+import numpy as np
+import astra
+from os import makedirs, replace, cpu_count
+from os.path import exists, join
+from itertools import product
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from .creator import create_phantoms
+
+FAMILIES = ["semilunars", "aliens", "clouds", "paws"]
+
+def dataset_plan(n, families=FAMILIES, img_sizes=(256,), angle_sets=(50,),
+                noise_levels=(None,), shard_size=64):
+    """ Splits the generation of n samples in shards. The samples are
+        distributed evenly over all the combinations of family, image size,
+        number of angles and noise level, and every shard holds samples
+        of a single combination, so its arrays have fixed shapes.
+
+        Parameters:
+            - n: (int) total number of samples.
+            - families: (list) phantom families to generate.
+            - img_sizes: (list) image sizes, 256 or 512.
+            - angle_sets: (list) numbers of projection angles over 180 degrees.
+            - noise_levels: (list) noise factors as in project_from_2D,
+                None for noiseless sinograms.
+            - shard_size: (int) maximum number of samples of a shard.
+
+        Returns:
+            (list) of shard descriptions (dict).
+    """
+    configs = list(product(families, img_sizes, angle_sets, noise_levels))
+    shards, start = [], 0
+    for c, (family, img_size, n_angles, noise) in enumerate(configs):
+        # the first configurations take the remainder
+        n_config = n // len(configs) + (c < n % len(configs))
+        for offset in range(0, n_config, shard_size):
+            count = min(shard_size, n_config - offset)
+            shards.append({"file": f"shard_{len(shards):05d}.npz",
+                        "family": family, "img_size": int(img_size),
+                        "n_angles": int(n_angles), "noise": noise,
+                        "samples": [start, start + count]})
+            start += count
+    return shards
+
+def sample_seed(seed, sample):
+    """ Returns the seed of a sample, from an independent stream of
+        the dataset seed, so every sample can be generated on its own.
+    """
+    return int(np.random.SeedSequence(seed, spawn_key=(sample,)).generate_state(1)[0])
+
+def generate_shard(out_dir, shard, seed=0, gray_values=[80,120,180]):
+    """ Generates the phantoms and sinograms of a shard and saves them as
+        an uncompressed numpy archive with the arrays:
+            - phantoms: (uint8) of shape (samples, img_size, img_size).
+            - sinograms: (float32) of shape (samples, n_angles, img_size).
+            - angles: projection angles in radians.
+            - ids, seeds: index and seed of each sample.
+        The file is written under a temporary name and renamed when complete.
+
+        Parameters:
+            - out_dir: (string) directory of the dataset.
+            - shard: (dict) shard description, as returned by dataset_plan.
+            - seed: (int) seed of the dataset.
+            - gray_values: (list) gray values of the phantoms.
+
+        Returns:
+            the shard description (dict).
+    """
+    img_size, n_angles, noise = shard["img_size"], shard["n_angles"], shard["noise"]
+    ids = np.arange(*shard["samples"])
+    seeds = np.array([sample_seed(seed, i) for i in ids], dtype=np.uint32)
+    angles = np.linspace(0, np.pi, n_angles, endpoint=False)
+    vol_geom = astra.create_vol_geom(img_size, img_size)
+    proj_geom = astra.create_proj_geom('parallel', 1., img_size, angles)
+    proj_id = astra.create_projector('linear', proj_geom, vol_geom)
+    phantoms = np.empty((len(ids), img_size, img_size), dtype=np.uint8)
+    sinograms = np.empty((len(ids), n_angles, img_size), dtype=np.float32)
+    for k, sample_seed_k in enumerate(seeds):
+        phantoms[k] = create_phantoms(shard["family"], img_size=img_size,
+                                    gray_values=gray_values, n=1,
+                                    seed=int(sample_seed_k))[0]
+        sino_id, sinograms[k] = astra.creators.create_sino(phantoms[k].astype(np.float32),
+                                                            proj_id)
+        astra.data2d.delete(sino_id)
+        # Poisson noise from the stream of the sample
+        if noise is not None:
+            rng = np.random.default_rng([int(sample_seed_k), 1])
+            sinograms[k] += rng.poisson(lam=noise, size=sinograms[k].shape)
+    astra.projector.delete(proj_id)
+    path = join(out_dir, shard["file"])
+    with open(path + ".tmp", "wb") as f:
+        np.savez(f, phantoms=phantoms, sinograms=sinograms, angles=angles,
+                ids=ids, seeds=seeds)
+    replace(path + ".tmp", path)
+    return shard
+
+def generate_dataset(out_dir, n, families=FAMILIES, img_sizes=(256,),
+                    angle_sets=(50,), noise_levels=(None,), shard_size=64,
+                    seed=0, gray_values=[80,120,180], n_workers=None):
+    """ Generates a dataset of (phantom, sinogram) pairs in shards, on a
+        pool of processes. Shards already present in out_dir are skipped,
+        so an interrupted generation is resumed by running it again with
+        the same parameters. When all the shards are written, the index
+        file index.json describes the dataset and its shards.
+
+        Parameters:
+            - out_dir: (string) directory of the dataset.
+            - n, families, img_sizes, angle_sets, noise_levels, shard_size:
+                as in dataset_plan.
+            - seed: (int) seed of the dataset, each sample has its own stream.
+            - gray_values: (list) gray values of the phantoms.
+            - n_workers: (int) number of processes, defaults to the cpu count.
+
+        Returns:
+            (string) path of the index file.
+    """
+    for family in families:
+        if family not in FAMILIES:
+            raise ValueError(f"Unknown phantom family: {family}")
+    makedirs(out_dir, exist_ok=True)
+    params = {"n": n, "families": list(families), "img_sizes": list(img_sizes),
+            "angle_sets": list(angle_sets), "noise_levels": list(noise_levels),
+            "shard_size": shard_size, "seed": seed, "gray_values": list(gray_values)}
+    # the parameters of a resumed generation have to match
+    params_path = join(out_dir, "dataset.json")
+    if exists(params_path):
+        with open(params_path) as f:
+            if json.load(f) != json.loads(json.dumps(params)):
+                raise ValueError(f"{out_dir} contains a dataset generated with "
+                                "different parameters.")
+    else:
+        with open(params_path, "w") as f:
+            json.dump(params, f, indent=2)
+    shards = dataset_plan(n, families, img_sizes, angle_sets, noise_levels, shard_size)
+    todo = [shard for shard in shards if not exists(join(out_dir, shard["file"]))]
+    if todo:
+        with ProcessPoolExecutor(n_workers or cpu_count()) as pool:
+            futures = [pool.submit(generate_shard, out_dir, shard, seed, gray_values)
+                        for shard in todo]
+            for future in as_completed(futures):
+                shard = future.result()
+                print(f"{shard['file']}: {shard['family']}, size {shard['img_size']}, "
+                    f"{shard['n_angles']} angles, noise {shard['noise']}")
+    index_path = join(out_dir, "index.json")
+    with open(index_path + ".tmp", "w") as f:
+        json.dump({**params, "shards": shards}, f, indent=2)
+    replace(index_path + ".tmp", index_path)
+    return index_path
+
+def load_shard(out_dir, shard):
+    """ Loads the arrays of a shard.
+        Parameters:
+            - out_dir: (string) directory of the dataset.
+            - shard: (dict) shard description from the index file.
+        Returns:
+            (dict) of the arrays saved by generate_shard.
+    """
+    with np.load(join(out_dir, shard["file"])) as data:
+        return {key: data[key] for key in data.files}
@@ -0,0 +1,73 @@
+import numpy as np
+from os import cpu_count
+from concurrent.futures import ThreadPoolExecutor
+
+def reference_frame(frames, frame_shape):
+    """ Returns a dark or flat reference of the shape of a frame as
+        float32, averaging a stack of reference frames when given.
+    """
+    frames = np.asarray(frames, dtype=np.float32)
+    if frames.ndim == len(frame_shape) + 1:
+        frames = frames.mean(axis=0, dtype=np.float32)
+    return np.broadcast_to(frames, frame_shape)
+
+def preprocess(frames, dark, flat, out=None, chunk_size=None, n_threads=None,
+                min_transmission=1e-6, max_transmission=1.):
+    """ Converts raw detector frames to line integrals, ready to be
+        reconstructed: dark and flat field normalization, clipping of the
+        transmission and negative logarithm. The frames are processed in
+        chunks on a pool of threads, every chunk being read once and
+        transformed in place in the output, so memory mapped frames and
+        outputs larger than memory are supported.
+
+        Parameters:
+            - frames: (np.array) raw frames of shape (n_angles, ...), e.g.
+                (n_angles, n_detectors) for a sinogram or (n_angles, rows,
+                n_detectors) for a stack of sinograms. Can be a memory map.
+            - dark, flat: (np.array) dark and flat field of the shape of a
+                frame, or stacks of them that are averaged.
+            - out: float32 array of the shape of frames, e.g. a memory map
+                or frames itself when float32, or the path of a .npy file to
+                create as a memory map. A new array is created when None.
+            - chunk_size: (int) number of frames of a chunk, defaults to about
+                one million pixels per chunk.
+            - n_threads: (int) threads processing the chunks, defaults to the cpu count.
+            - min_transmission, max_transmission: (float) bounds of the normalized
+                frames before the logarithm, None to disable the upper one.
+                Pixels with a flat no brighter than the dark get min_transmission.
+        Returns:
+            (np.array) float32 line integrals of the shape of frames.
+    """
+    frame_shape = frames.shape[1:]
+    dark = reference_frame(dark, frame_shape)
+    # inverse gain of every pixel, dead pixels have none
+    gain = reference_frame(flat, frame_shape) - dark
+    gain = np.divide(1., gain, out=np.zeros(frame_shape, dtype=np.float32), where=gain > 0)
+    if out is None:
+        out = np.empty(frames.shape, dtype=np.float32)
+    elif isinstance(out, str):
+        out = np.lib.format.open_memmap(out, mode='w+', dtype=np.float32, shape=frames.shape)
+    if out.shape != frames.shape or out.dtype != np.float32:
+        raise ValueError(f"Output of shape {out.shape} and type {out.dtype}, "
+                        f"float32 of shape {frames.shape} expected.")
+    frame_size = int(np.prod(frame_shape))
+    chunk_size = chunk_size or max(1, 2**20 // max(1, frame_size))
+    chunks = [slice(start, min(start + chunk_size, len(frames)))
+                for start in range(0, len(frames), chunk_size)]
+    def process(chunk):
+        block = out[chunk]
+        np.subtract(frames[chunk], dark, out=block)
+        np.multiply(block, gain, out=block)
+        np.clip(block, min_transmission, max_transmission, out=block)
+        np.log(block, out=block)
+        np.negative(block, out=block)
+    n_threads = min(n_threads or cpu_count() or 1, len(chunks))
+    if n_threads <= 1:
+        for chunk in chunks:
+            process(chunk)
+    else:
+        with ThreadPoolExecutor(n_threads) as pool:
+            list(pool.map(process, chunks))
+    if isinstance(out, np.memmap):
+        out.flush()
+    return out
@@ -2,11 +2,13 @@ import astra
 import numpy as np
 from os import mkdir
 from os.path import isdir
-from PIL import Image
+from algorithms_OhGreat.backends import resolve_use_gpu
+from .threaded import ThreadedProjector
 
 def project_from_2D(phantom_id, vol_geom, n_projections, 
                     n_detectors, detector_spacing, angles, 
-                    noise_factor=None, save_dir=None, use_gpu=False):
+                    noise_factor=None, save_dir=None, use_gpu=False,
+                    n_threads=None):
         """ Creates projection for the given input data.
             
             Parameters:
@@ -18,7 +20,10 @@ def project_from_2D(phantom_id, vol_geom, n_projections,
                 - noise_factor:
                 - save_dir: path of the directory to save image representation 
                     of projections, when defined. To be passed as a string.
-                - use_gpu: (boolean) set to True to use gpu.
+                - use_gpu: (boolean) set to True to use gpu, or "auto" to
+                    use it when available.
+                - n_threads: (int) threads projecting chunks of angles on CPU.
+                    None (default) projects with a single astra call, as before.
 
             Returns:
                 projector_id, sinogram_id and sinogram matrix
@@ -28,11 +33,20 @@ def project_from_2D(phantom_id, vol_geom, n_projections,
         proj_geom = astra.create_proj_geom('parallel', detector_spacing, 
                                             n_detectors, angles)
         # choose projector
-        if use_gpu:
+        if resolve_use_gpu(use_gpu):
             proj_id = astra.create_projector('cuda', proj_geom, vol_geom)
+            sino_id, sinogram = astra.creators.create_sino(phantom_id, proj_id)
         else:
             proj_id = astra.create_projector('linear', proj_geom, vol_geom)
-        sino_id, sinogram = astra.creators.create_sino(phantom_id, proj_id)
+            if n_threads is None or n_threads == 1:
+                sino_id, sinogram = astra.creators.create_sino(phantom_id, proj_id)
+            else:
+                phantom = phantom_id
+                if not isinstance(phantom, np.ndarray):
+                    phantom = astra.data2d.get_shared(phantom_id)
+                with ThreadedProjector(proj_geom, vol_geom, n_threads=n_threads) as projector:
+                    sinogram = projector.forward(phantom)
+                sino_id = astra.data2d.create('-sino', proj_geom, sinogram)
         # Apply Poisson noise.
         if noise_factor != None:
             sinogram += np.random.poisson(lam=noise_factor, size=sinogram.shape)
@@ -43,8 +57,80 @@ def project_from_2D(phantom_id, vol_geom, n_projections,
                 save_dir += '/'
             if not isdir(save_dir):
                 mkdir(save_dir)
+            from PIL import Image
             proj_for_img = np.round(sinogram * (2**8- 1)).astype(np.uint8)
             for i in range(n_projections):
                 Image.fromarray(proj_for_img[i]).save(save_dir+f'proj_{i}.png')
 
-        return proj_id, sino_id, sinogram
\ No newline at end of file
+        return proj_id, sino_id, sinogram
+
+def stream_projections(phantom, vol_geom, n_detectors, detector_spacing,
+                        angles, batch_size=1, use_gpu=False):
+        """ Simulates an acquisition, yielding the projections of a 2D
+            phantom in batches of consecutive angles, as they would
+            arrive from the scanner. To be fed to DART.update.
+
+            Parameters:
+                - phantom: numpy array containing the 2D phantom.
+                - vol_geom, n_detectors, detector_spacing, angles, use_gpu:
+                    as in project_from_2D.
+                - batch_size: (int) number of angles of each batch.
+
+            Yields:
+                angles of the batch and their projections, of shape
+                (batch angles, n_detectors)
+        """
+        proj_geom = astra.create_proj_geom('parallel', detector_spacing,
+                                            n_detectors, angles)
+        proj_id = astra.create_projector('cuda' if resolve_use_gpu(use_gpu) else 'linear',
+                                        proj_geom, vol_geom)
+        sino_id, sinogram = astra.creators.create_sino(phantom, proj_id)
+        # free memory
+        astra.data2d.delete(sino_id)
+        astra.projector.delete(proj_id)
+        for start in range(0, len(angles), batch_size):
+            yield angles[start:start+batch_size], sinogram[start:start+batch_size]
+
+def noise_realizations(sinogram, n_realizations, photon_counts,
+                        max_attenuation=2., seed=None, out=None):
+        """ Creates Monte-Carlo noisy realizations of a clean sinogram
+            at several doses, with a photon-count model. The sinogram is
+            scaled to attenuation values (max_attenuation at its maximum),
+            each detector pixel receives photon_count * exp(-attenuation)
+            photons on average, the measured counts are drawn from a Poisson
+            distribution and converted back to sinogram units.
+            Counts of zero are clipped to one photon.
+
+            Parameters:
+                - sinogram: (np.array) clean sinogram, (n_angles, n_detectors).
+                - n_realizations: (int) number of realizations of each dose.
+                - photon_counts: (list) incident photons per detector pixel,
+                    one dose per value. Lower counts give noisier sinograms.
+                - max_attenuation: (float) attenuation of the highest
+                    sinogram value.
+                - seed: (int) seed of the random generator.
+                - out: (np.array) preallocated float32 output array to fill.
+
+            Returns:
+                (np.array) of shape (len(photon_counts), n_realizations,
+                n_angles, n_detectors). out[i] is a batch of sinograms that
+                can be passed as is to the NumPy solvers of the
+                algorithms_OhGreat.matrix_solvers module.
+        """
+        sinogram = np.asarray(sinogram, dtype=np.float64)
+        photon_counts = np.atleast_1d(photon_counts)
+        shape = (len(photon_counts), n_realizations) + sinogram.shape
+        if out is None:
+            out = np.empty(shape, dtype=np.float32)
+        elif out.shape != shape:
+            raise ValueError(f"Expected an output array of shape {shape}, got {out.shape}.")
+        # sinogram units per attenuation unit
+        scale = sinogram.max() / max_attenuation if sinogram.max() > 0 else 1.
+        transmission = np.exp(-sinogram / scale)
+        rng = np.random.default_rng(seed)
+        for i, photons in enumerate(photon_counts):
+            counts = rng.poisson(photons * transmission,
+                                size=(n_realizations,) + sinogram.shape)
+            np.maximum(counts, 1, out=counts)
+            out[i] = -np.log(counts / photons) * scale
+        return out
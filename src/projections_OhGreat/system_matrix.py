@@ -0,0 +1,113 @@
+import json
+import hashlib
+import shutil
+import numpy as np
+import astra
+from os import getenv, makedirs, rename, getpid
+from os.path import exists, expanduser, join
+from scipy.sparse import csr_matrix
+
+def system_matrix(proj_geom, vol_geom, projector_type="linear"):
+        """ Computes the explicit system matrix of a 2D geometry.
+            Row r = angle_idx * n_detectors + detector_idx holds the weights
+            of ray r over the flattened (row-major) volume pixels.
+
+            Parameters:
+                - proj_geom: astra-toolbox projection geometry.
+                - vol_geom: astra-toolbox volume geometry.
+                - projector_type: (string) CPU astra projector used to
+                    compute the ray weights ('linear', 'line' or 'strip').
+
+            Returns:
+                - (scipy.sparse.csr_matrix) of shape (n_rays, n_pixels).
+        """
+        proj_id = astra.create_projector(projector_type, proj_geom, vol_geom)
+        matrix_id = astra.projector.matrix(proj_id)
+        W = astra.matrix.get(matrix_id).tocsr()
+        # free memory
+        astra.matrix.delete(matrix_id)
+        astra.projector.delete(proj_id)
+        return W
+
+def geometry_key(proj_geom, vol_geom, projector_type="linear"):
+        """ Returns a hash identifying the system matrix of a geometry,
+            computed from the projector type, the volume shape and window,
+            and the projection geometry: its type, angles or vectors, the
+            number of detectors, their spacing and the fan beam distances.
+        """
+        description = {"vol": [vol_geom['GridRowCount'], vol_geom['GridColCount'],
+                            sorted(vol_geom.get('option', {}).items())],
+                        "type": proj_geom['type'],
+                        "det_count": proj_geom['DetectorCount'],
+                        "det_spacing": proj_geom.get('DetectorWidth'),
+                        "distances": [proj_geom.get('DistanceOriginSource'),
+                                    proj_geom.get('DistanceOriginDetector')],
+                        "projector": projector_type}
+        h = hashlib.sha1(json.dumps(description, sort_keys=True, default=str).encode())
+        angles = proj_geom['Vectors'] if 'Vectors' in proj_geom else proj_geom['ProjectionAngles']
+        h.update(np.asarray(angles, dtype=np.float64).tobytes())
+        return h.hexdigest()
+
+def save_system_matrix(W, path):
+        """ Saves a system matrix and its transpose as raw CSR arrays in the
+            directory path. The directory is written under a temporary name
+            and renamed when complete, so readers never see partial files.
+            Parameters:
+                - W: (scipy.sparse matrix) system matrix.
+                - path: (string) directory to create.
+        """
+        tmp_path = f"{path}.tmp{getpid()}"
+        makedirs(tmp_path, exist_ok=True)
+        W = W.tocsr()
+        for name, M in [("W", W), ("WT", W.T.tocsr())]:
+            np.save(join(tmp_path, f"{name}_data.npy"), M.data)
+            np.save(join(tmp_path, f"{name}_indices.npy"), M.indices)
+            np.save(join(tmp_path, f"{name}_indptr.npy"), M.indptr)
+        with open(join(tmp_path, "shape.json"), "w") as f:
+            json.dump(list(W.shape), f)
+        try:
+            rename(tmp_path, path)
+        except OSError:
+            # another process saved the same matrix first
+            shutil.rmtree(tmp_path, ignore_errors=True)
+
+def load_system_matrix(path, transpose=False):
+        """ Memory maps a system matrix saved with save_system_matrix.
+            The arrays are mapped read-only, so all the processes using
+            the same matrix share its pages in the page cache.
+            Parameters:
+                - path: (string) directory of the saved matrix.
+                - transpose: (bool) load the transposed matrix instead.
+            Returns:
+                - (scipy.sparse.csr_matrix) backed by the mapped files.
+        """
+        name = "WT" if transpose else "W"
+        with open(join(path, "shape.json")) as f:
+            shape = tuple(json.load(f))
+        if transpose:
+            shape = shape[::-1]
+        arrays = [np.load(join(path, f"{name}_{part}.npy"), mmap_mode='r')
+                    for part in ["data", "indices", "indptr"]]
+        return csr_matrix(tuple(arrays), shape=shape, copy=False)
+
+def cached_system_matrix(proj_geom, vol_geom, projector_type="linear",
+                        cache_dir=None, transpose=False):
+        """ Returns the memory mapped system matrix of a geometry,
+            computing and saving it on disk the first time it is requested.
+            Parameters:
+                - proj_geom, vol_geom, projector_type: as in system_matrix.
+                - cache_dir: (string) directory of the cache, defaults to the
+                    DART_MATRIX_CACHE environment variable or
+                    ~/.cache/dart_ohgreat/system_matrices.
+                - transpose: (bool) return the transposed matrix instead.
+            Returns:
+                - (scipy.sparse.csr_matrix) backed by the mapped files.
+        """
+        if cache_dir is None:
+            cache_dir = getenv("DART_MATRIX_CACHE",
+                            expanduser("~/.cache/dart_ohgreat/system_matrices"))
+        makedirs(cache_dir, exist_ok=True)
+        path = join(cache_dir, geometry_key(proj_geom, vol_geom, projector_type))
+        if not exists(path):
+            save_system_matrix(system_matrix(proj_geom, vol_geom, projector_type), path)
+        return load_system_matrix(path, transpose)
@@ -0,0 +1,159 @@
+import numpy as np
+import astra
+from os import cpu_count
+from concurrent.futures import ThreadPoolExecutor
+
+class ThreadedProjector():
+    def __init__(self, proj_geom, vol_geom, projector_type="linear", n_threads=None):
+        """ CPU forward and back projection of a parallel geometry split
+            by angles. The angles are split in contiguous chunks with one
+            astra projector each, and the chunks are projected on a pool
+            of threads, as astra releases the GIL while projecting.
+            Forward projections fill the rows of each chunk in a single
+            sinogram, back projections sum the partial volumes of the chunks.
+
+            Parameters:
+                - proj_geom: astra-toolbox parallel projection geometry.
+                - vol_geom: astra-toolbox volume geometry.
+                - projector_type: (string) CPU astra projector ('linear', 'line' or 'strip').
+                - n_threads: (int) number of threads and chunks, defaults
+                    to the cpu count.
+        """
+        if proj_geom['type'] != 'parallel':
+            raise ValueError(f"Only parallel geometries can be split by angles, "
+                            f"got {proj_geom['type']}.")
+        angles = np.asarray(proj_geom['ProjectionAngles'], dtype=np.float64)
+        self.proj_geom, self.vol_geom = proj_geom, vol_geom
+        self.sino_shape = (len(angles), proj_geom['DetectorCount'])
+        self.rec_shape = (vol_geom['GridRowCount'], vol_geom['GridColCount'])
+        self.n_threads = n_threads or cpu_count() or 1
+        # (first row, last row + 1, projector) of each chunk
+        self.chunks = []
+        for rows in np.array_split(np.arange(len(angles)), min(self.n_threads, len(angles))):
+            chunk_geom = astra.create_proj_geom('parallel', proj_geom['DetectorWidth'],
+                                                proj_geom['DetectorCount'], angles[rows])
+            self.chunks.append((rows[0], rows[-1] + 1,
+                                astra.create_projector(projector_type, chunk_geom, vol_geom)))
+        self.pool = ThreadPoolExecutor(len(self.chunks)) if len(self.chunks) > 1 else None
+        # inverse column sums, and inverse row sums of the last mask
+        self._col_weights = None
+        self._mask_key, self._row_weights = None, None
+        # iterations run by the last sirt call
+        self.last_iters = 0
+
+    def _map(self, fn):
+        """ Runs fn on every chunk on the thread pool, when available.
+        """
+        if self.pool is None:
+            return [fn(chunk) for chunk in self.chunks]
+        return list(self.pool.map(fn, self.chunks))
+
+    def forward(self, volume, out=None):
+        """ Projects a volume.
+            Parameters:
+                - volume: (np.array) image of shape rec_shape.
+                - out: (np.array) preallocated float32 sinogram to fill.
+            Returns:
+                (np.array) sinogram of shape (n_angles, n_detectors).
+        """
+        volume = np.ascontiguousarray(volume, dtype=np.float32)
+        if out is None:
+            out = np.empty(self.sino_shape, dtype=np.float32)
+        def project(chunk):
+            start, stop, proj_id = chunk
+            sino_id, out[start:stop] = astra.creators.create_sino(volume, proj_id)
+            astra.data2d.delete(sino_id)
+        self._map(project)
+        return out
+
+    def backward(self, sinogram):
+        """ Back projects a sinogram.
+            Parameters:
+                - sinogram: (np.array) of shape (n_angles, n_detectors).
+            Returns:
+                (np.array) float32 image of shape rec_shape.
+        """
+        sinogram = np.asarray(sinogram, dtype=np.float32)
+        def backproject(chunk):
+            start, stop, proj_id = chunk
+            bp_id, bp = astra.creators.create_backprojection(
+                            np.ascontiguousarray(sinogram[start:stop]), proj_id)
+            astra.data2d.delete(bp_id)
+            return bp
+        partials = self._map(backproject)
+        volume = np.array(partials[0], dtype=np.float32)
+        for partial in partials[1:]:
+            volume += partial
+        return volume
+
+    def _inverse(self, sums, eps=1e-6):
+        """ Inverts the given sums, zeroing rays and pixels with no weight.
+        """
+        inv = np.zeros_like(sums, dtype=np.float32)
+        np.divide(1., sums, out=inv, where=np.abs(sums) > eps)
+        return inv
+
+    def sirt(self, sinogram, x0=0., iters=100, mask=None,
+            min_constraint=0, max_constraint=255, tol=None, check_every=10):
+        """ SIRT with the threaded projections, as the astra CPU SIRT
+            algorithm that runs on a single core.
+            Parameters:
+                - sinogram: (np.array) of shape (n_angles, n_detectors).
+                - x0: starting image, scalar or of shape rec_shape.
+                - iters: number of iterations to run. (int)
+                - mask: pixels to update. Pixels outside the mask are not
+                    projected nor updated.
+                - min_constraint, max_constraint: values the updated pixels
+                    are clipped to, None to disable.
+                - tol: when defined, stop as soon as the residual decreased by
+                    less than this fraction over check_every iterations.
+                - check_every: iterations between two residual checks. (int)
+            Returns:
+                - reconstructed image. (np.array)
+        """
+        sinogram = np.asarray(sinogram, dtype=np.float32)
+        x = np.broadcast_to(np.asarray(x0, dtype=np.float32), self.rec_shape).copy()
+        M = None if mask is None else np.asarray(mask) > 0
+        if self._col_weights is None:
+            self._col_weights = self._inverse(self.backward(np.ones(self.sino_shape)))
+        key = None if M is None else hash(np.packbits(M).tobytes())
+        if self._row_weights is None or key != self._mask_key:
+            self._row_weights = self._inverse(self.forward(np.ones(self.rec_shape)
+                                                            if M is None else M))
+            self._mask_key = key
+        residual = np.empty(self.sino_shape, dtype=np.float32)
+        prev_norm = None
+        self.last_iters = 0
+        for it in range(iters):
+            self.forward(x if M is None else np.where(M, x, 0.), out=residual)
+            np.subtract(sinogram, residual, out=residual)
+            if tol is not None and it % check_every == 0:
+                norm = float(np.linalg.norm(residual))
+                if prev_norm is not None and prev_norm - norm <= tol * prev_norm:
+                    break
+                prev_norm = norm
+            update = self._col_weights * self.backward(self._row_weights * residual)
+            if M is not None:
+                update[~M] = 0.
+            x += update
+            if min_constraint is not None or max_constraint is not None:
+                clipped = np.clip(x, min_constraint, max_constraint)
+                x = clipped if M is None else np.where(M, clipped, x)
+            self.last_iters = it + 1
+        return x
+
+    def close(self):
+        """ Deletes the astra projectors and stops the threads.
+        """
+        for _, _, proj_id in self.chunks:
+            astra.projector.delete(proj_id)
+        self.chunks = []
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
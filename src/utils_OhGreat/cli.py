@@ -0,0 +1,274 @@
+""" Command line entry point of the package, installed as `dart`.
+    Only the standard library is imported at startup, numpy, astra,
+    scipy, PIL and matplotlib are imported by the subcommands needing them.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+# the startup of the command is measured from the process start when
+# possible, and from the import of this module otherwise
+_IMPORTED = time.perf_counter()
+
+# image formats read and written with PIL
+IMAGE_EXTS = (".png", ".tif", ".tiff", ".jpg", ".jpeg", ".bmp")
+
+def process_age():
+    """ Returns the seconds elapsed since the start of the process, read
+        from /proc with the resolution of the clock ticks, None when
+        not available.
+    """
+    try:
+        with open("/proc/self/stat") as f:
+            # fields after the command name, which can contain spaces
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return uptime - start_ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+def load_array(path):
+    """ Reads an array from a .npy file, the first array of a .npz
+        file or an image file.
+    """
+    import numpy as np
+    if path.lower().endswith(IMAGE_EXTS):
+        from PIL import Image
+        return np.array(Image.open(path))
+    data = np.load(path)
+    if path.endswith(".npz"):
+        with data:
+            return data[data.files[0]]
+    return data
+
+def save_array(path, array):
+    """ Writes an array to a .npy file or, clipped to 0-255,
+        to an image file.
+    """
+    import numpy as np
+    if path.lower().endswith(IMAGE_EXTS):
+        from PIL import Image
+        Image.fromarray(np.clip(np.round(array), 0, 255).astype(np.uint8)).save(path)
+    else:
+        np.save(path, array)
+
+def parse_use_gpu(value):
+    """ Converts the --gpu option to the use_gpu parameter values.
+    """
+    return {"auto": "auto", "yes": True, "no": False}[value]
+
+def make_angles(n_angles, angle_range):
+    """ Projection angles in radians over angle_range degrees.
+    """
+    import numpy as np
+    return np.linspace(0, np.pi*(angle_range/180), n_angles, endpoint=False)
+
+def cmd_project(args):
+    import numpy as np
+    import astra
+    from projections_OhGreat.project import project_from_2D
+    phantom = load_array(args.input).astype(np.float32)
+    n_detectors = args.n_detectors or phantom.shape[1]
+    angles = make_angles(args.n_angles, args.angle_range)
+    vol_geom = astra.create_vol_geom(phantom.shape)
+    proj_id, sino_id, sinogram = project_from_2D(phantom, vol_geom, args.n_angles,
+                                                n_detectors, args.detector_spacing,
+                                                angles, noise_factor=args.noise,
+                                                use_gpu=parse_use_gpu(args.gpu))
+    astra.data2d.delete(sino_id)
+    astra.projector.delete(proj_id)
+    if args.output.endswith(".npz"):
+        # the geometry is stored with the sinogram, for the reconstruct command
+        np.savez(args.output, sinogram=sinogram, angles=angles,
+                detector_spacing=args.detector_spacing)
+    else:
+        save_array(args.output, sinogram)
+
+def cmd_preprocess(args):
+    import numpy as np
+    from projections_OhGreat.preprocess import preprocess
+    # .npy frames are memory mapped and read one chunk at a time
+    if args.input.endswith(".npy"):
+        frames = np.load(args.input, mmap_mode='r')
+    else:
+        frames = load_array(args.input)
+    out = args.output if args.output.endswith(".npy") else None
+    sinogram = preprocess(frames, load_array(args.dark), load_array(args.flat), out=out,
+                        chunk_size=args.chunk_size, n_threads=args.threads,
+                        min_transmission=args.min_transmission)
+    if out is None:
+        save_array(args.output, sinogram)
+
+def cmd_reconstruct(args):
+    import numpy as np
+    import astra
+    from algorithms_OhGreat.DART import DART
+    from algorithms_OhGreat.backends import resolve_use_gpu
+    detector_spacing = args.detector_spacing
+    if args.input.endswith(".npz"):
+        with np.load(args.input) as data:
+            sinogram = data["sinogram"]
+            angles = data["angles"] if "angles" in data.files else None
+            if "detector_spacing" in data.files:
+                detector_spacing = float(data["detector_spacing"])
+    else:
+        sinogram, angles = load_array(args.input), None
+    if args.angles is not None:
+        angles = load_array(args.angles)
+    if angles is None:
+        angles = make_angles(sinogram.shape[0], args.angle_range)
+    rec_shape = tuple(args.rec_shape or (sinogram.shape[1], sinogram.shape[1]))
+    proj_geom = astra.create_proj_geom('parallel', detector_spacing,
+                                        sinogram.shape[1], angles)
+    projector_type = 'cuda' if resolve_use_gpu(parse_use_gpu(args.gpu)) else 'linear'
+    # a concrete default, 'auto' times the backends before reconstructing
+    rec_alg = args.rec_alg or ("SART_CUDA" if projector_type == 'cuda' else "SIRT_THREADS")
+    dart = DART(gray_levels=args.gray_levels, p=args.p, rec_shape=rec_shape,
+                proj_geom=proj_geom, projector_id=None, sinogram=sinogram,
+                seed=args.seed, projector_type=projector_type)
+    rec = dart.run(args.iters, rec_alg=rec_alg, rec_iter=args.rec_iter)
+    save_array(args.output, rec)
+
+def cmd_generate_phantoms(args):
+    from os.path import join
+    from phantoms_OhGreat.creator import create_phantoms
+    if args.family not in ["semilunars", "aliens", "clouds", "paws"]:
+        raise SystemExit(f"Unknown phantom family: {args.family}")
+    create_phantoms(args.family, img_size=args.size, gray_values=args.gray_values,
+                    n=args.n, overlap=args.overlap, seed=args.seed,
+                    img_name=join(args.out_dir, args.family))
+
+def cmd_sweep(args):
+    from utils_OhGreat.work_queue import WorkQueue
+    queue = WorkQueue(args.queue_dir, timeout=args.timeout)
+    if args.action == "submit":
+        if args.fn is None or args.grid is None:
+            raise SystemExit("submit needs --fn and --grid.")
+        with open(args.grid) as f:
+            grid = json.load(f)
+        ids = queue.submit_grid(args.fn, grid.get("grid", {}), **grid.get("params", {}))
+        print(f"{len(ids)} jobs in the queue.")
+    elif args.action == "work":
+        print(f"{queue.work(wait=not args.no_wait)} jobs run.")
+    else:
+        print(json.dumps(queue.status()))
+
+def cmd_bench(args):
+    from algorithms_OhGreat.backends import FAMILIES, cost_model, cuda_available
+    print(f"cuda available: {cuda_available()}")
+    for family in args.families:
+        for alg in FAMILIES[family]:
+            model = cost_model(alg)
+            if model is None:
+                print(f"{alg}: not available")
+                continue
+            a, b, c, d = model
+            work = args.n_angles * args.size * args.size
+            print(f"{alg}: setup {a + b*work:.3f}s, {args.rec_iter} iterations "
+                f"{c + d*work*args.rec_iter:.3f}s on {args.size}x{args.size}, "
+                f"{args.n_angles} angles")
+
+def build_parser():
+    """ Returns the argument parser of the dart command.
+    """
+    parser = argparse.ArgumentParser(prog="dart",
+                                    description="Discrete Algebraic Reconstruction Technique.")
+    parser.add_argument("--timing", action="store_true",
+                        help="report startup, import and run times on stderr.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("project", help="project a 2D phantom to a sinogram.")
+    p.add_argument("input", help="phantom, .npy or image file.")
+    p.add_argument("output", help="sinogram, .npy, image or .npz (with the geometry).")
+    p.add_argument("--n-angles", type=int, default=50)
+    p.add_argument("--angle-range", type=float, default=180., help="in degrees.")
+    p.add_argument("--n-detectors", type=int, default=None,
+                    help="defaults to the phantom width.")
+    p.add_argument("--detector-spacing", type=float, default=1.)
+    p.add_argument("--noise", type=float, default=None, help="Poisson noise factor.")
+    p.add_argument("--gpu", choices=["auto", "yes", "no"], default="auto")
+    p.set_defaults(func=cmd_project)
+
+    p = sub.add_parser("preprocess",
+                        help="dark/flat correct and log transform raw frames to a sinogram.")
+    p.add_argument("input", help="raw frames, .npy (memory mapped), .npz or image file.")
+    p.add_argument("output", help="sinogram, .npy (written as a memory map) or image file.")
+    p.add_argument("--dark", required=True, help="dark field, or stack of dark fields.")
+    p.add_argument("--flat", required=True, help="flat field, or stack of flat fields.")
+    p.add_argument("--chunk-size", type=int, default=None, help="frames per chunk.")
+    p.add_argument("--threads", type=int, default=None)
+    p.add_argument("--min-transmission", type=float, default=1e-6)
+    p.set_defaults(func=cmd_preprocess)
+
+    p = sub.add_parser("reconstruct", help="reconstruct a sinogram with DART.")
+    p.add_argument("input", help="sinogram, .npy, image or .npz written by project.")
+    p.add_argument("output", help="reconstruction, .npy or image file.")
+    p.add_argument("--gray-levels", type=float, nargs="+", required=True)
+    p.add_argument("--p", type=float, default=0.85)
+    p.add_argument("--iters", type=int, default=10)
+    p.add_argument("--rec-alg", default=None,
+                    help="SART_CUDA on the GPU and SIRT_THREADS on CPU by default, "
+                        "'auto' times the available backends first.")
+    p.add_argument("--rec-iter", type=int, default=1000)
+    p.add_argument("--angles", default=None, help="file of the angles in radians.")
+    p.add_argument("--angle-range", type=float, default=180.,
+                    help="in degrees, used when the angles are not given.")
+    p.add_argument("--detector-spacing", type=float, default=1.)
+    p.add_argument("--rec-shape", type=int, nargs=2, default=None)
+    p.add_argument("--seed", type=int, default=None)
+    p.add_argument("--gpu", choices=["auto", "yes", "no"], default="auto")
+    p.set_defaults(func=cmd_reconstruct)
+
+    p = sub.add_parser("generate-phantoms", help="generate phantoms as png images.")
+    p.add_argument("family", help="semilunars, aliens, clouds or paws.")
+    p.add_argument("out_dir")
+    p.add_argument("--n", type=int, default=1)
+    p.add_argument("--size", type=int, choices=[256, 512], default=512)
+    p.add_argument("--gray-values", type=int, nargs=3, default=[80, 120, 180])
+    p.add_argument("--overlap", action="store_true")
+    p.add_argument("--seed", type=int, default=None)
+    p.set_defaults(func=cmd_generate_phantoms)
+
+    p = sub.add_parser("sweep", help="run experiments through a shared-directory work queue.")
+    p.add_argument("action", choices=["submit", "work", "status"])
+    p.add_argument("queue_dir")
+    p.add_argument("--fn", default=None, help="job function, as module:function.")
+    p.add_argument("--grid", default=None,
+                    help='json file {"grid": {name: [values]}, "params": {name: value}}.')
+    p.add_argument("--timeout", type=float, default=600.)
+    p.add_argument("--no-wait", action="store_true",
+                    help="stop when no job is pending, even if others are running.")
+    p.set_defaults(func=cmd_sweep)
+
+    p = sub.add_parser("bench", help="time the available reconstruction backends.")
+    p.add_argument("--families", nargs="+", choices=["SART", "SIRT", "FBP"],
+                    default=["SART", "SIRT", "FBP"])
+    p.add_argument("--size", type=int, default=512)
+    p.add_argument("--n-angles", type=int, default=50)
+    p.add_argument("--rec-iter", type=int, default=1000)
+    p.set_defaults(func=cmd_bench)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    modules = set(sys.modules)
+    parsed = time.perf_counter()
+    startup = process_age()
+    args.func(args)
+    if args.timing:
+        done = time.perf_counter()
+        if startup is None:
+            startup_msg = f"startup {parsed - _IMPORTED:.3f}s since the cli import"
+        else:
+            # the interpreter and site imports come before the cli import
+            startup_msg = (f"startup {startup:.3f}s, {startup - (parsed - _IMPORTED):.3f}s "
+                            "before the cli import")
+        print(f"{startup_msg}, command {done - parsed:.3f}s, "
+            f"{len(set(sys.modules) - modules)} modules imported by the command",
+            file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
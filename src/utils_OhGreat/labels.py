@@ -0,0 +1,135 @@
+import json
+import zipfile
+import numpy as np
+from os import remove, replace
+
+def label_table(gray_levels):
+    """ Returns the gray level table of the label maps: the sorted gray
+        levels as uint8, with 0 added for the pixels out of the support.
+    """
+    return np.union1d(np.asarray(gray_levels).astype(np.uint8), [0]).astype(np.uint8)
+
+def label_map(segmented, table):
+    """ Converts a segmented image to the indices of its gray levels in
+        the table, so that table[labels] is the segmented image.
+        Parameters:
+            - segmented: (np.array) segmented image or stack of images.
+            - table: (np.array) gray level table, sorted.
+        Returns:
+            (np.array) label map of uint8.
+    """
+    table = np.asarray(table)
+    labels = np.searchsorted(table, segmented).astype(np.uint8)
+    if not np.array_equal(table[np.minimum(labels, len(table) - 1)], segmented):
+        raise ValueError("The segmented image has values missing from the gray level table.")
+    return labels
+
+def label_bits(n_levels):
+    """ Returns the bits used to store a label of a table of n_levels
+        gray levels, up to 8.
+    """
+    return min(8, max(1, int(np.ceil(np.log2(n_levels)))))
+
+def pack_labels(labels, bits):
+    """ Packs a label map to bits bits per pixel.
+        Parameters:
+            - labels: (np.array) label map of uint8 smaller than 2**bits.
+            - bits: (int) bits per label, from 1 to 8.
+        Returns:
+            (np.array) 1D array of uint8, of ceil(labels.size*bits/8) bytes.
+    """
+    flat = np.ascontiguousarray(labels, dtype=np.uint8).reshape(-1, 1)
+    if bits == 8:
+        return flat.ravel().copy()
+    return np.packbits(np.unpackbits(flat, axis=1, bitorder='little')[:, :bits],
+                        bitorder='little')
+
+def unpack_labels(packed, bits, shape):
+    """ Unpacks a label map packed by pack_labels.
+        Parameters:
+            - packed: (np.array) packed labels.
+            - bits: (int) bits per label.
+            - shape: (tuple) shape of the label map.
+        Returns:
+            (np.array) label map of uint8.
+    """
+    size = int(np.prod(shape))
+    if bits == 8:
+        return np.array(packed[:size], dtype=np.uint8).reshape(shape)
+    flat = np.unpackbits(packed, count=size*bits, bitorder='little').reshape(size, bits)
+    return np.packbits(flat, axis=1, bitorder='little').reshape(shape)
+
+def save_labels(path, slices, table):
+    """ Saves a stack of label maps as a zip archive readable by np.load,
+        with every slice bit packed and compressed on its own, so a slice
+        is read without decompressing the others. The slices are written
+        one at a time and the file is renamed when complete.
+        Parameters:
+            - path: (string) file to write, usually a .npz.
+            - slices: (iterable) label maps of the same shape, e.g. a
+                3D array or a generator.
+            - table: (np.array) gray level table of the labels.
+        Returns:
+            (int) number of slices written.
+    """
+    table = np.asarray(table, dtype=np.uint8)
+    bits = label_bits(len(table))
+    shape, n_slices = None, 0
+    with zipfile.ZipFile(path + ".tmp", "w", zipfile.ZIP_DEFLATED, allowZip64=True) as zf:
+        for labels in slices:
+            labels = np.asarray(labels)
+            if shape is None:
+                shape = labels.shape
+            elif labels.shape != shape:
+                zf.close()
+                remove(path + ".tmp")
+                raise ValueError(f"Slice of shape {labels.shape} in a stack of shape {shape}.")
+            with zf.open(f"slice_{n_slices:06d}.npy", "w", force_zip64=True) as f:
+                np.lib.format.write_array(f, pack_labels(labels, bits))
+            n_slices += 1
+        for name, array in [("table", table),
+                            ("header", np.array(json.dumps({"shape": list(shape or ()),
+                                                            "bits": bits,
+                                                            "n_slices": n_slices})))]:
+            with zf.open(f"{name}.npy", "w") as f:
+                np.lib.format.write_array(f, array)
+    replace(path + ".tmp", path)
+    return n_slices
+
+class LabelVolume():
+    def __init__(self, path):
+        """ Random access to the slices of a file written by save_labels.
+            Only the requested slices are decompressed.
+            Parameters:
+                - path: (string) file written by save_labels.
+        """
+        self.data = np.load(path)
+        self.table = self.data["table"]
+        header = json.loads(str(self.data["header"]))
+        self.shape, self.bits = tuple(header["shape"]), header["bits"]
+        self.n_slices = header["n_slices"]
+
+    def __len__(self):
+        return self.n_slices
+
+    def __getitem__(self, i):
+        """ Returns the label map of slice i. (np.array of uint8)
+        """
+        if not -self.n_slices <= i < self.n_slices:
+            raise IndexError(f"Slice {i} out of {self.n_slices}.")
+        return unpack_labels(self.data[f"slice_{i % self.n_slices:06d}"],
+                            self.bits, self.shape)
+
+    def gray(self, i):
+        """ Returns the segmented image of slice i. (np.array of uint8)
+        """
+        return self.table[self[i]]
+
+    def close(self):
+        self.data.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
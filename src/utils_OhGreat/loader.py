@@ -0,0 +1,149 @@
+import json
+import threading
+import numpy as np
+from os import listdir
+from os.path import join, isdir
+from itertools import islice
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+# image formats of the phantom directories
+IMAGE_EXTS = (".png", ".tif", ".tiff")
+
+def prefetch(fn, items, depth=4, n_threads=2):
+    """ Yields fn(item) for every item, in order, computing up to depth
+        results ahead on a pool of threads while the caller works on
+        the current one. At most depth results are held in memory.
+        Exceptions of fn are raised when their result is reached.
+        Parameters:
+            - fn: function applied to every item.
+            - items: iterable of the items, consumed lazily.
+            - depth: (int) number of results computed ahead.
+            - n_threads: (int) number of threads running fn.
+        Yields:
+            the results of fn, in the order of the items.
+    """
+    items = iter(items)
+    pool = ThreadPoolExecutor(n_threads)
+    pending = deque()
+    try:
+        for item in islice(items, max(1, depth)):
+            pending.append(pool.submit(fn, item))
+        while pending:
+            result = pending.popleft().result()
+            # keep the queue full while the caller uses the result
+            for item in islice(items, 1):
+                pending.append(pool.submit(fn, item))
+            yield result
+    finally:
+        # the loop was left early, drop the results not started yet
+        for future in pending:
+            future.cancel()
+        pool.shutdown(wait=True)
+
+def phantom_paths(dirs):
+    """ Returns the sorted paths of the phantom images of the given
+        directories (string or list of strings), as the experiment scripts
+        walk them, or the paths themselves when they are files.
+    """
+    if isinstance(dirs, str):
+        dirs = [dirs]
+    paths = []
+    for path in dirs:
+        if isdir(path):
+            paths += [join(path, name) for name in sorted(listdir(path))
+                    if name.lower().endswith(IMAGE_EXTS)]
+        else:
+            paths.append(path)
+    return paths
+
+def load_phantom(path):
+    """ Reads and decodes a phantom image. (np.array of uint8)
+    """
+    # imported here, so that sinogram stores can be read without PIL
+    from PIL import Image
+    with Image.open(path) as img:
+        return np.array(img, dtype=np.uint8)
+
+class SinogramProjector():
+    def __init__(self, n_detectors, angles, detector_spacing=1., projector_type="linear"):
+        """ Forward projection of phantoms on a fixed parallel geometry,
+            callable from the threads of a loader. The astra projector is
+            created for the shape of the first phantom and reused.
+            Parameters:
+                - n_detectors: (int) number of detectors.
+                - angles: (np.array) projection angles in radians.
+                - detector_spacing: (float) size of the detectors.
+                - projector_type: (string) astra projector, 'cuda' for the gpu.
+        """
+        # astra is only needed by the loaders projecting their phantoms
+        import astra
+        self.proj_geom = astra.create_proj_geom('parallel', detector_spacing,
+                                                n_detectors, angles)
+        self.projector_type = projector_type
+        self.projectors = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, phantom):
+        """ Returns the sinogram of a phantom. (np.array)
+        """
+        import astra
+        shape = tuple(phantom.shape)
+        with self._lock:
+            if shape not in self.projectors:
+                self.projectors[shape] = astra.create_projector(
+                    self.projector_type, self.proj_geom, astra.create_vol_geom(shape))
+        sino_id, sinogram = astra.creators.create_sino(phantom.astype(np.float32),
+                                                        self.projectors[shape])
+        astra.data2d.delete(sino_id)
+        return sinogram
+
+    def close(self):
+        """ Deletes the astra projectors.
+        """
+        import astra
+        for proj_id in self.projectors.values():
+            astra.projector.delete(proj_id)
+        self.projectors = {}
+
+def load_phantoms(dirs, project=None, depth=4, n_threads=2):
+    """ Iterates over the phantoms of directories, reading and decoding
+        the next ones in background threads, and optionally projecting
+        them, while the current one is reconstructed.
+        Parameters:
+            - dirs: (string or list) phantom directories or image files.
+            - project: function returning the sinogram of a phantom,
+                e.g. a SinogramProjector. Phantoms are not projected when None.
+            - depth, n_threads: as in prefetch.
+        Yields:
+            (path, phantom) tuples, or (path, phantom, sinogram) when project is given.
+    """
+    def load(path):
+        phantom = load_phantom(path)
+        if project is None:
+            return path, phantom
+        return path, phantom, project(phantom)
+    return prefetch(load, phantom_paths(dirs), depth, n_threads)
+
+def load_samples(out_dir, depth=2):
+    """ Iterates over the samples of a dataset written by generate_dataset,
+        loading the next shards in a background thread.
+        Parameters:
+            - out_dir: (string) directory of the dataset.
+            - depth: (int) number of shards loaded ahead.
+        Yields:
+            (dict) with the phantom, sinogram, angles, id and seed of a sample,
+            and the family and noise level of its shard.
+    """
+    # imported here, so that phantom loops do not load the phantom creators
+    from phantoms_OhGreat.dataset import load_shard
+    with open(join(out_dir, "index.json")) as f:
+        shards = json.load(f)["shards"]
+    loaded = prefetch(lambda shard: (shard, load_shard(out_dir, shard)), shards,
+                        depth, n_threads=1)
+    for shard, arrays in loaded:
+        for k in range(len(arrays["ids"])):
+            yield {"phantom": arrays["phantoms"][k], "sinogram": arrays["sinograms"][k],
+                    "angles": arrays["angles"], "id": int(arrays["ids"][k]),
+                    "seed": int(arrays["seeds"][k]), "family": shard["family"],
+                    "noise": shard["noise"]}
@@ -1,6 +1,5 @@
 import numpy as np
 from os import listdir
-import matplotlib.pyplot as plt
 
 def plot_results(res_dir, labels=None, tick_labels=None,
                 title=None, use_log=False, fig_size=(6,4),
@@ -16,6 +15,8 @@ def plot_results(res_dir, labels=None, tick_labels=None,
                     --- alg_1.npy
                 ...
     """
+    # imported here, so that headless workers never load matplotlib
+    import matplotlib.pyplot as plt
     #check path
     if res_dir[-1] != "/":
         res_dir += "/"
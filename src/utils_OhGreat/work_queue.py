@@ -0,0 +1,241 @@
+import os
+import json
+import time
+import socket
+import uuid
+import hashlib
+import importlib
+import threading
+import traceback
+import numpy as np
+from itertools import product
+from glob import escape, glob
+from os.path import join, exists, getmtime
+
+# a job moves from one state directory to the next by atomic renames
+STATES = ["pending", "running", "done", "failed"]
+
+class WorkQueue():
+    def __init__(self, queue_dir, timeout=600, heartbeat=30):
+        """ Work queue on a directory shared between machines (e.g. NFS),
+            needing no scheduler nor message broker. Jobs are json files
+            moving between the pending, running, done and failed
+            subdirectories. Workers claim a job by renaming it from pending
+            to running under a name of their own, which only one of them can
+            do, and keep touching it while working on it. Running jobs not
+            touched for longer than timeout seconds are put back in the queue,
+            the worker that lost them does not touch the claims of others.
+
+            Parameters:
+                - queue_dir: (string) shared directory of the queue.
+                - timeout: (float) seconds without heartbeat after which
+                    a running job is considered abandoned.
+                - heartbeat: (float) seconds between two heartbeats of a worker.
+        """
+        self.queue_dir = queue_dir
+        self.timeout = timeout
+        self.heartbeat = heartbeat
+        for state in STATES:
+            os.makedirs(join(queue_dir, state), exist_ok=True)
+
+    def path(self, state, job_id):
+        """ Path of the file of a job in the given state.
+        """
+        return join(self.queue_dir, state, f"{job_id}.json")
+
+    def running_path(self, job):
+        """ Path of the file of a job claimed by this worker, named
+            after the job and the token of the claim.
+        """
+        return join(self.queue_dir, "running", f"{job['id']}.{job['token']}.json")
+
+    def _write(self, path, content):
+        """ Writes a json file atomically.
+        """
+        tmp_path = f"{path}.{socket.gethostname()}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(content, f, indent=2,
+                    default=lambda o: o.item() if np.ndim(o) == 0 else np.asarray(o).tolist())
+        os.replace(tmp_path, path)
+
+    def submit(self, fn, params, job_id=None):
+        """ Adds a job to the queue, unless a job with the same id exists.
+            Parameters:
+                - fn: (string) function to call, as "module:function". The
+                    module has to be importable by the workers.
+                - params: (dict) json serializable keyword arguments of fn.
+                - job_id: (string) name of the job, defaults to a hash of
+                    fn and params, so submitting a grid twice adds no jobs.
+            Returns:
+                (string) id of the job.
+        """
+        if job_id is None:
+            key = json.dumps([fn, params], sort_keys=True, default=str)
+            job_id = hashlib.sha1(key.encode()).hexdigest()[:16]
+        if not any(exists(self.path(state, job_id)) for state in STATES) and \
+            not glob(join(escape(join(self.queue_dir, "running")), f"{escape(job_id)}.*.json")):
+            self._write(self.path("pending", job_id),
+                        {"id": job_id, "fn": fn, "params": params})
+        return job_id
+
+    def submit_grid(self, fn, grid, **fixed_params):
+        """ Adds one job for every combination of the grid values.
+            Parameters:
+                - fn: as in submit.
+                - grid: (dict) list of values of each varying parameter.
+                - fixed_params: parameters shared by all the jobs.
+            Returns:
+                (list) ids of the jobs.
+        """
+        names = list(grid)
+        return [self.submit(fn, {**fixed_params, **dict(zip(names, values))})
+                for values in product(*[grid[name] for name in names])]
+
+    def now(self):
+        """ Current time of the shared filesystem, to compare with the
+            modification times of the job files of other machines.
+        """
+        clock = join(self.queue_dir, ".clock")
+        with open(clock, "a"):
+            os.utime(clock, None)
+        return getmtime(clock)
+
+    def requeue_stale(self):
+        """ Moves back to pending the running jobs whose worker did not
+            send a heartbeat for longer than the timeout.
+            Returns:
+                (int) number of requeued jobs.
+        """
+        now, requeued = self.now(), 0
+        for name in os.listdir(join(self.queue_dir, "running")):
+            if not name.endswith(".json"):
+                continue
+            path = join(self.queue_dir, "running", name)
+            try:
+                if now - getmtime(path) > self.timeout:
+                    # drop the token of the claim
+                    job_id = name[:-len(".json")].rsplit(".", 1)[0]
+                    os.rename(path, self.path("pending", job_id))
+                    requeued += 1
+            except FileNotFoundError:
+                # completed or requeued by another process meanwhile
+                continue
+        return requeued
+
+    def claim(self):
+        """ Claims a pending job.
+            Returns:
+                (dict) the claimed job, None when no job is pending.
+        """
+        pending = sorted(os.listdir(join(self.queue_dir, "pending")))
+        for name in pending:
+            if not name.endswith(".json"):
+                continue
+            job_id = name[:-len(".json")]
+            token = uuid.uuid4().hex
+            running = join(self.queue_dir, "running", f"{job_id}.{token}.json")
+            try:
+                # the rename keeps the modification time, which has to be
+                # fresh as soon as the job is running or it could be requeued
+                os.utime(self.path("pending", job_id), None)
+                os.rename(self.path("pending", job_id), running)
+            except FileNotFoundError:
+                # claimed by another worker
+                continue
+            try:
+                with open(running) as f:
+                    return dict(json.load(f), token=token)
+            except FileNotFoundError:
+                # requeued meanwhile, the job is lost for this worker
+                continue
+        return None
+
+    def _beat(self, job, stop):
+        """ Touches the file of a running job until stop is set,
+            or until the job is not claimed by this worker anymore.
+        """
+        while not stop.wait(self.heartbeat):
+            try:
+                os.utime(self.running_path(job), None)
+            except FileNotFoundError:
+                return
+
+    def run_job(self, job, worker_id=None):
+        """ Runs a claimed job, sending heartbeats from a background
+            thread. The result, or the traceback of the error, is written
+            in the job file, moved to done or failed.
+            Returns:
+                (bool) True when the job succeeded.
+        """
+        stop = threading.Event()
+        beat = threading.Thread(target=self._beat, args=(job, stop), daemon=True)
+        beat.start()
+        job = dict(job, worker=worker_id or f"{socket.gethostname()}-{os.getpid()}")
+        start = time.time()
+        try:
+            module, name = job["fn"].split(":")
+            result = getattr(importlib.import_module(module), name)(**job["params"])
+            job.update(result=result, seconds=time.time() - start)
+            state = "done"
+        except Exception:
+            job.update(error=traceback.format_exc(), seconds=time.time() - start)
+            state = "failed"
+        finally:
+            stop.set()
+            beat.join()
+        # results are written next to the job, before releasing it
+        self._write(self.path(state, job["id"]), job)
+        try:
+            # only the claim of this worker, another one can hold the job
+            os.remove(self.running_path(job))
+        except FileNotFoundError:
+            # requeued meanwhile, the duplicate run will find it done
+            pass
+        return state == "done"
+
+    def work(self, worker_id=None, poll=10., wait=True):
+        """ Worker loop: requeues abandoned jobs and runs pending ones.
+            Parameters:
+                - worker_id: (string) name of the worker written in the results,
+                    defaults to hostname-pid.
+                - poll: (float) seconds between two checks of an empty queue.
+                - wait: (bool) keep waiting while jobs are running on other
+                    workers, as they could be requeued. Return as soon as no
+                    job is pending otherwise.
+            Returns:
+                (int) number of jobs run by this worker.
+        """
+        n_jobs = 0
+        while True:
+            self.requeue_stale()
+            job = self.claim()
+            if job is not None:
+                if exists(self.path("done", job["id"])):
+                    # finished by a worker that was considered dead
+                    try:
+                        os.remove(self.running_path(job))
+                    except FileNotFoundError:
+                        pass
+                    continue
+                self.run_job(job, worker_id)
+                n_jobs += 1
+                continue
+            if not wait or self.status()["running"] == 0:
+                return n_jobs
+            time.sleep(poll)
+
+    def status(self):
+        """ Returns the number of jobs in each state. (dict)
+        """
+        return {state: len([name for name in os.listdir(join(self.queue_dir, state))
+                            if name.endswith(".json")])
+                for state in STATES}
+
+    def results(self, state="done"):
+        """ Yields the job files in the given state, with their
+            parameters and results.
+        """
+        for name in sorted(os.listdir(join(self.queue_dir, state))):
+            if name.endswith(".json"):
+                with open(join(self.queue_dir, state, name)) as f:
+                    yield json.load(f)
@@ -0,0 +1,24 @@
+import numpy as np
+import pytest
+
+astra = pytest.importorskip("astra")
+from phantoms_OhGreat.creator import create_phantoms
+from projections_OhGreat.analytic import analytic_sinogram
+
+@pytest.mark.parametrize("family, seed", [("semilunars", 0), ("aliens", 0), ("paws", 0),
+                                        ("clouds", 0), ("clouds", 2)])
+def test_analytic_sinogram_matches_the_raster_projection(family, seed):
+    phantoms, shapes = create_phantoms(family, img_size=256, n=1, seed=seed,
+                                        return_shapes=True)
+    phantom = phantoms[0]
+    if (family, seed) == ("clouds", 2):
+        # the shapes of this cloud are cropped by the border of the image
+        assert phantom[[0, -1]].any() or phantom[:, [0, -1]].any()
+    angles = np.linspace(0, np.pi, 30, endpoint=False)
+    proj_geom = astra.create_proj_geom('parallel', 1., 256, angles)
+    proj_id = astra.create_projector('linear', proj_geom, astra.create_vol_geom(256, 256))
+    sino_id, sinogram = astra.creators.create_sino(phantom.astype(np.float32), proj_id)
+    astra.data2d.delete(sino_id)
+    astra.projector.delete(proj_id)
+    analytic = analytic_sinogram(shapes[0], angles, 256)
+    assert np.abs(analytic - sinogram).sum() / np.abs(sinogram).sum() < 0.02
@@ -0,0 +1,153 @@
+import time
+import numpy as np
+import pytest
+
+astra = pytest.importorskip("astra")
+from algorithms_OhGreat.DART import DART
+from algorithms_OhGreat.kernels import fused_stage
+
+def make_dart(gray_levels, support=None, shape=(32, 32), n_angles=20, seed=0,
+                projector_type='linear', **params):
+    phantom = np.zeros(shape)
+    phantom[8:24, 6:20] = gray_levels[-1]
+    proj_geom = astra.create_proj_geom('parallel', 1., shape[1],
+                                        np.linspace(0, np.pi, n_angles, endpoint=False))
+    proj_id = astra.create_projector('linear', proj_geom, astra.create_vol_geom(shape))
+    sino_id, sinogram = astra.creators.create_sino(phantom.astype(np.float32), proj_id)
+    astra.data2d.delete(sino_id)
+    astra.projector.delete(proj_id)
+    dart = DART(gray_levels, 0.85, shape, proj_geom, None, sinogram, seed=seed,
+                projector_type=projector_type, support=support, **params)
+    return dart, phantom
+
+def test_ensemble_vote_counts_pixels_out_of_the_support():
+    support = np.zeros((32, 32), dtype=bool)
+    support[4:28, 4:28] = True
+    # 0 is not a gray level, the pixels out of the support are 0 in every member
+    dart, _ = make_dart([80, 160], support=support)
+    mean, majority, disagreement = dart.run_ensemble(4, 2, rec_alg="SIRT_NUMPY", rec_iter=20)
+    assert (majority[~support] == 0).all()
+    assert (disagreement[~support] == 0).all()
+    assert set(np.unique(majority[support])) <= {0, 80, 160}
+
+def astra_projections(image, sinogram, proj_id):
+    sino_id, expected_sino = astra.creators.create_sino(image, proj_id)
+    bp_id, expected_bp = astra.creators.create_backprojection(sinogram, proj_id)
+    astra.data2d.delete([sino_id, bp_id])
+    return expected_sino, expected_bp
+
+@pytest.mark.parametrize("geometry, kind", [("parallel", "strip"),
+                                            ("parallel", "line"),
+                                            ("fanflat", "line_fanflat")])
+def test_cpu_projections_match_astra(geometry, kind):
+    shape, angles = (24, 24), np.linspace(0, np.pi, 12, endpoint=False)
+    if geometry == "fanflat":
+        proj_geom = astra.create_proj_geom('fanflat', 1.5, 40, angles, 60., 30.)
+    else:
+        proj_geom = astra.create_proj_geom('parallel', 1., 32, angles)
+    vol_geom = astra.create_vol_geom(shape)
+    rng = np.random.default_rng(0)
+    image = rng.random(shape).astype(np.float32)
+    sinogram = rng.random((len(angles), proj_geom['DetectorCount'])).astype(np.float32)
+    proj_id = astra.create_projector(kind, proj_geom, vol_geom)
+    expected_sino, expected_bp = astra_projections(image, sinogram, proj_id)
+    dart = DART([0, 1], 0.85, shape, proj_geom, None, sinogram, seed=0,
+                projector_type=kind, support="auto")
+    dart.n_threads = 4
+    assert np.allclose(dart.forward_project(image), expected_sino, atol=1e-4)
+    assert np.allclose(dart.backproject(sinogram), expected_bp, atol=1e-3)
+    assert dart.support.shape == shape
+    # a projector given without its type is used as it is
+    dart = DART([0, 1], 0.85, shape, proj_geom, proj_id, sinogram, seed=0)
+    assert np.allclose(dart.forward_project(image), expected_sino, atol=1e-4)
+    assert np.allclose(dart.backproject(sinogram), expected_bp, atol=1e-3)
+    astra.projector.delete(proj_id)
+
+def test_fused_stage_matches_the_separate_steps():
+    recs = []
+    for fused in [False, True]:
+        dart, _ = make_dart([0, 120])
+        dart.fused = fused
+        recs.append(dart.run(3, rec_alg="SIRT_NUMPY", rec_iter=10))
+    assert np.array_equal(recs[0], recs[1])
+
+@pytest.mark.parametrize("rec_alg, subset_order", [("SIRT_NUMPY", "golden"),
+                                                    ("OS_SIRT", "random")])
+def test_resume_reproduces_the_uninterrupted_run(tmp_path, rec_alg, subset_order):
+    support = np.zeros((32, 32), dtype=bool)
+    support[2:30, 2:30] = True
+    path, interrupted = str(tmp_path / "run.npz"), str(tmp_path / "interrupted.npz")
+    dart, _ = make_dart([0, 120], support=support)
+    dart.region_mask = np.ones((32, 32), dtype=bool)
+    dart.region_mask[:, :3] = False
+    save_checkpoint = dart.save_checkpoint
+    def save_and_copy(path, curr_rec, iteration, *args):
+        save_checkpoint(path, curr_rec, iteration, *args)
+        # keep the checkpoint of the second iteration as if the run stopped there
+        if iteration == 2:
+            with open(path, "rb") as src, open(interrupted, "wb") as dst:
+                dst.write(src.read())
+    dart.save_checkpoint = save_and_copy
+    rec = dart.run(4, rec_alg=rec_alg, rec_iter=3, subset_order=subset_order,
+                    n_subsets=4, checkpoint_path=path)
+    # a new instance, with another seed and without the support and region mask
+    resumed, _ = make_dart([0, 120], seed=1)
+    assert np.array_equal(resumed.resume(interrupted), rec)
+    assert np.array_equal(resumed.support, support)
+    assert np.array_equal(resumed.region_mask, dart.region_mask)
+
+@pytest.mark.parametrize("n_changed", [0, 3, 40, 2000])
+def test_incremental_boundary_matches_the_full_recomputation(n_changed):
+    dart, phantom = make_dart([0, 120], support=None, shape=(64, 64))
+    rng = np.random.default_rng(n_changed)
+    img = phantom.astype(np.uint8)
+    dart.update_boundary_pixels(img)
+    for _ in range(3):
+        img = img.copy()
+        idx = rng.choice(img.size, n_changed, replace=False)
+        img.ravel()[idx] = rng.choice([0, 120], n_changed)
+        mask = dart.update_boundary_pixels(img)
+        assert np.array_equal(mask, dart.boundary_pixels(img))
+        assert not mask.flags.writeable
+
+def test_pixels_out_of_the_support_stay_zero():
+    support = np.zeros((32, 32), dtype=bool)
+    support[6:26, 4:22] = True
+    dart, phantom = make_dart([0, 120], support=support)
+    rec = dart.run(3, rec_alg="SIRT_NUMPY", rec_iter=20)
+    assert (rec[~support] == 0).all()
+    # the automatic support carves the pixels crossed by zero rays
+    dart, phantom = make_dart([0, 120], support="auto")
+    assert dart.support[phantom > 0].all()
+    assert not dart.support[0].any()
+
+def test_add_projections_keeps_the_projector_type():
+    dart, phantom = make_dart([0, 120], projector_type='strip')
+    dart.add_projections(0.1, np.zeros(32))
+    assert dart.projector_type == 'strip'
+    assert dart.proj_geom['ProjectionAngles'].shape == (21,)
+    # a projector of unknown type is not replaced by a linear one
+    proj_id = astra.create_projector('strip', dart.proj_geom, dart.vol_geom)
+    dart = DART([0, 120], 0.85, (32, 32), dart.proj_geom, proj_id, dart.sinogram)
+    with pytest.raises(ValueError):
+        dart.add_projections(0.2, np.zeros(32))
+    assert dart.sinogram.shape == (21, 32)
+    astra.projector.delete(proj_id)
+
+def test_fused_stage_is_faster_than_the_separate_steps():
+    dart, phantom = make_dart([0, 120, 220], shape=(512, 512), n_angles=2)
+    dart._prepare_run(1, None, None, "SIRT_NUMPY", 1, None, None, None, 10, None)
+    noisy = phantom + np.random.default_rng(0).normal(0, 20, phantom.shape)
+    def best_time(stage):
+        times = []
+        for _ in range(5):
+            rec = noisy.copy()
+            start = time.perf_counter()
+            stage(rec)
+            times.append(time.perf_counter() - start)
+        return min(times)
+    fused = best_time(lambda rec: fused_stage(rec, dart.thresholds, dart.gray_levels,
+                                            dart.support, dart.active_pixels(),
+                                            dart.rng, dart.probs[1]))
+    separate = best_time(dart.separate_stage)
+    assert fused < separate
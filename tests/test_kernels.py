@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+from algorithms_OhGreat.kernels import fused_stage
+
+def stage_rows(rec, thresholds, levels, support, active, draws, free_prob):
+    """ Pixel by pixel reference of the fused stage.
+    """
+    rows, cols = rec.shape
+    labels = np.zeros((rows, cols), dtype=np.uint8)
+    free = np.zeros((rows, cols), dtype=bool)
+    for i in range(rows):
+        for j in range(cols):
+            if support[i, j]:
+                # later gray levels win on the thresholds, as in DART.segment
+                for k in range(len(levels)):
+                    if thresholds[k] <= rec[i, j] <= thresholds[k+1]:
+                        labels[i, j] = levels[k]
+    for i in range(rows):
+        for j in range(cols):
+            window = labels[max(i-1, 0):i+2, max(j-1, 0):j+2]
+            boundary = (window != labels[i, j]).any()
+            free[i, j] = (boundary or draws[i, j] < free_prob) and active[i, j]
+            if not free[i, j]:
+                rec[i, j] = labels[i, j]
+    return labels, free
+
+@pytest.mark.parametrize("shape", [(1, 1), (1, 7), (5, 1), (17, 23), (64, 40)])
+@pytest.mark.parametrize("tile_rows", [1, 2, 5, None])
+def test_tiles_match_the_pixel_reference(shape, tile_rows):
+    rng = np.random.default_rng(0)
+    rec = rng.random(shape) * 300 - 20
+    rec.ravel()[::7] = 40
+    thresholds, gray_levels = [0, 40, 100.25, 150, 255], [0, 80, 120, 180]
+    support, active = rng.random(shape) < 0.9, rng.random(shape) < 0.8
+    draws = rng.random(shape)
+    rec_tiles = rec.copy()
+    labels, free = fused_stage(rec_tiles, thresholds, gray_levels, support, active,
+                                draws, 0.15, tile_rows=tile_rows)
+    rec_rows = rec.copy()
+    labels_rows, free_rows = stage_rows(rec_rows, thresholds, gray_levels, support,
+                                        active, draws, 0.15)
+    assert np.array_equal(labels, labels_rows)
+    assert np.array_equal(free, free_rows)
+    assert np.array_equal(rec_tiles, rec_rows)
+    assert not free[~active].any()
+    assert np.array_equal(rec_tiles[~free], labels[~free])
+
+@pytest.mark.parametrize("tile_rows", [1, 3, None])
+def test_generator_draws_match_a_full_draw(tile_rows):
+    rng = np.random.default_rng(0)
+    rec = rng.random((19, 11)) * 200
+    mask = np.ones(rec.shape, dtype=bool)
+    results = [fused_stage(rec.copy(), [0, 100, 200], [0, 150], mask, mask, draws, 0.3,
+                            tile_rows=tile_rows)
+                for draws in [np.random.default_rng(1).random(rec.shape),
+                                np.random.default_rng(1)]]
+    assert np.array_equal(results[0][1], results[1][1])
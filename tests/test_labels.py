@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+from utils_OhGreat.labels import (label_table, label_map, label_bits, pack_labels,
+                                unpack_labels, save_labels, LabelVolume)
+
+@pytest.mark.parametrize("bits", [1, 2, 4, 8])
+@pytest.mark.parametrize("shape", [(1,), (7, 3), (16, 16), (5, 9, 11)])
+def test_pack_round_trip(bits, shape):
+    labels = np.random.default_rng(bits).integers(0, 2**bits, size=shape).astype(np.uint8)
+    packed = pack_labels(labels, bits)
+    assert packed.dtype == np.uint8 and packed.size == -(-labels.size * bits // 8)
+    assert np.array_equal(unpack_labels(packed, bits, shape), labels)
+
+def test_label_map_of_a_segmentation():
+    table = label_table([120, 40.0, 255])
+    assert table.tolist() == [0, 40, 120, 255]
+    assert label_bits(len(table)) == 2
+    segmented = np.array([[0, 40], [255, 120]], dtype=np.uint8)
+    labels = label_map(segmented, table)
+    assert np.array_equal(table[labels], segmented)
+    with pytest.raises(ValueError):
+        label_map(np.array([[41]]), table)
+
+def test_label_volume_reads_the_saved_slices(tmp_path):
+    table = label_table([30, 60, 90, 120, 150])
+    rng = np.random.default_rng(0)
+    volume = rng.integers(0, len(table), size=(6, 13, 17)).astype(np.uint8)
+    path = str(tmp_path / "labels.npz")
+    # slices can be streamed from a generator
+    assert save_labels(path, (labels for labels in volume), table) == 6
+    with LabelVolume(path) as stored:
+        assert len(stored) == 6 and stored.bits == 3
+        assert np.array_equal(stored.table, table)
+        assert np.array_equal(stored[2], volume[2])
+        assert np.array_equal(stored[-1], volume[-1])
+        assert np.array_equal(stored.gray(4), table[volume[4]])
+        with pytest.raises(IndexError):
+            stored[6]
+
+def test_save_labels_rejects_slices_of_another_shape(tmp_path):
+    path = str(tmp_path / "labels.npz")
+    with pytest.raises(ValueError):
+        save_labels(path, [np.zeros((4, 4)), np.zeros((4, 5))], [0, 1])
+    assert not list(tmp_path.iterdir())
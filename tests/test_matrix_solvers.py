@@ -0,0 +1,56 @@
+import numpy as np
+from scipy.sparse import random as sparse_random
+from algorithms_OhGreat.matrix_solvers import SIRTSolver, CGLSSolver
+
+def make_problem(seed=0, rec_shape=(6, 5), sino_shape=(4, 7)):
+    rng = np.random.default_rng(seed)
+    W = sparse_random(int(np.prod(sino_shape)), int(np.prod(rec_shape)), density=0.3,
+                    random_state=seed, format="csr")
+    x_true = rng.random(rec_shape) * 100
+    sinogram = (W @ x_true.ravel()).reshape(sino_shape)
+    return W, rec_shape, sino_shape, sinogram
+
+def test_cgls_does_not_modify_x0():
+    W, rec_shape, sino_shape, sinogram = make_problem()
+    x0 = np.full(rec_shape, 10.)
+    x0_copy = x0.copy()
+    rec = CGLSSolver(W, rec_shape, sino_shape).solve(sinogram, x0=x0, iters=5)
+    assert np.array_equal(x0, x0_copy)
+    assert not np.array_equal(rec, x0)
+
+def test_sirt_does_not_modify_x0():
+    W, rec_shape, sino_shape, sinogram = make_problem()
+    x0 = np.full(rec_shape, 10.)
+    SIRTSolver(W, rec_shape, sino_shape).solve(sinogram, x0=x0, iters=5)
+    assert np.array_equal(x0, np.full(rec_shape, 10.))
+
+def test_batch_matches_individual_solves():
+    W, rec_shape, sino_shape, sinogram = make_problem()
+    batch = np.stack([sinogram, 0.5 * sinogram, 2 * sinogram])
+    masks = np.stack([np.ones(rec_shape, dtype=bool)] * 3)
+    masks[1, :2] = False
+    for solver in [SIRTSolver(W, rec_shape, sino_shape, max_constraint=None),
+                    CGLSSolver(W, rec_shape, sino_shape)]:
+        recs = solver.solve(batch, x0=5., iters=10, mask=masks)
+        assert recs.shape == (3,) + rec_shape
+        for k in range(3):
+            rec = solver.solve(batch[k], x0=5., iters=10, mask=masks[k])
+            assert np.allclose(recs[k], rec)
+
+def test_masked_pixels_keep_their_starting_values():
+    W, rec_shape, sino_shape, sinogram = make_problem()
+    x0 = np.random.default_rng(1).random(rec_shape) * 50
+    mask = np.zeros(rec_shape, dtype=bool)
+    mask[2:5, 1:4] = True
+    for solver in [SIRTSolver(W, rec_shape, sino_shape), CGLSSolver(W, rec_shape, sino_shape)]:
+        rec = solver.solve(sinogram, x0=x0, iters=10, mask=mask)
+        assert np.array_equal(rec[~mask], x0[~mask])
+        assert not np.array_equal(rec[mask], x0[mask])
+
+def test_sirt_reduces_the_residual_and_stops_at_tolerance():
+    W, rec_shape, sino_shape, sinogram = make_problem()
+    solver = SIRTSolver(W, rec_shape, sino_shape, max_constraint=None)
+    residual = lambda rec: np.linalg.norm(W @ rec.ravel() - sinogram.ravel())
+    assert residual(solver.solve(sinogram, iters=50)) < 0.5 * residual(np.zeros(rec_shape))
+    solver.solve(sinogram, iters=10000, tol=0.5, check_every=10)
+    assert solver.last_iters < 10000
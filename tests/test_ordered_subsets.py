@@ -0,0 +1,44 @@
+import numpy as np
+from scipy.sparse import random as sparse_random
+from algorithms_OhGreat.matrix_solvers import SIRTSolver
+from algorithms_OhGreat.ordered_subsets import OSSolver, subset_order
+
+def make_problem(seed=0, rec_shape=(8, 8), sino_shape=(6, 10)):
+    rng = np.random.default_rng(seed)
+    W = sparse_random(int(np.prod(sino_shape)), int(np.prod(rec_shape)), density=0.3,
+                    random_state=seed, format="csr")
+    sinogram = (W @ (rng.random(rec_shape) * 100).ravel()).reshape(sino_shape)
+    return W, rec_shape, sino_shape, sinogram
+
+def test_os_sart_splits_single_angles_over_threads():
+    W, rec_shape, sino_shape, sinogram = make_problem()
+    with OSSolver(W, rec_shape, sino_shape, n_threads=4, ordering="sequential") as threaded, \
+            OSSolver(W, rec_shape, sino_shape, n_threads=1, ordering="sequential") as serial:
+        # one angle per subset, its detectors are split in blocks
+        assert all(len(subset["blocks"]) == 4 for subset in threaded.subsets)
+        assert np.allclose(threaded.solve(sinogram, iters=3), serial.solve(sinogram, iters=3))
+        # the transposed matrix of the base class is never built
+        assert threaded._WT is None
+    assert threaded.pool is None
+
+def test_subset_orders_are_permutations():
+    for ordering in ["sequential", "random", "golden"]:
+        order = subset_order(12, ordering, np.random.default_rng(0))
+        assert sorted(order) == list(range(12))
+    # consecutive golden subsets are far apart
+    assert np.abs(np.diff(subset_order(12, "golden"))).min() > 1
+
+def test_single_subset_is_sirt():
+    W, rec_shape, sino_shape, sinogram = make_problem()
+    with OSSolver(W, rec_shape, sino_shape, n_subsets=1, n_threads=3) as os_sirt:
+        rec = os_sirt.solve(sinogram, iters=5)
+    assert np.allclose(rec, SIRTSolver(W, rec_shape, sino_shape).solve(sinogram, iters=5))
+
+def test_random_order_is_reproducible_with_a_seed():
+    W, rec_shape, sino_shape, sinogram = make_problem()
+    recs = []
+    for _ in range(2):
+        with OSSolver(W, rec_shape, sino_shape, n_subsets=3, ordering="random",
+                    seed=4, n_threads=1) as solver:
+            recs.append(solver.solve(sinogram, iters=3))
+    assert np.array_equal(recs[0], recs[1])
@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+from projections_OhGreat.preprocess import preprocess
+
+def make_frames(shape=(9, 4, 13), seed=0):
+    rng = np.random.default_rng(seed)
+    dark = rng.uniform(90, 110, size=(3,) + shape[1:])
+    flat = rng.uniform(3000, 4000, size=(2,) + shape[1:])
+    transmission = rng.uniform(0.05, 1., size=shape)
+    raw = dark.mean(axis=0) + transmission * (flat.mean(axis=0) - dark.mean(axis=0))
+    return raw.astype(np.float32), dark, flat
+
+def expected(raw, dark, flat):
+    dark, flat = dark.mean(axis=0), flat.mean(axis=0)
+    return -np.log((raw - dark) / (flat - dark))
+
+@pytest.mark.parametrize("chunk_size, n_threads", [(None, None), (1, 1), (2, 3), (4, None)])
+def test_matches_the_normalized_log(chunk_size, n_threads):
+    raw, dark, flat = make_frames()
+    sinogram = preprocess(raw, dark, flat, chunk_size=chunk_size, n_threads=n_threads)
+    assert sinogram.dtype == np.float32 and sinogram.shape == raw.shape
+    assert np.allclose(sinogram, expected(raw, dark, flat), rtol=1e-4, atol=1e-5)
+
+def test_memmap_output(tmp_path):
+    raw, dark, flat = make_frames()
+    path = str(tmp_path / "sinogram.npy")
+    sinogram = preprocess(raw, dark, flat, out=path, chunk_size=2)
+    assert isinstance(sinogram, np.memmap)
+    assert np.allclose(np.load(path), expected(raw, dark, flat), rtol=1e-4, atol=1e-5)
+    # memory mapped frames, processed in place
+    np.save(tmp_path / "raw.npy", raw)
+    frames = np.load(tmp_path / "raw.npy", mmap_mode="r+")
+    assert preprocess(frames, dark, flat, out=frames, chunk_size=3) is frames
+    assert np.allclose(np.load(tmp_path / "raw.npy"), expected(raw, dark, flat),
+                        rtol=1e-4, atol=1e-5)
+
+def test_transmission_is_clipped():
+    raw = np.array([[50., 100., 300., 600.]], dtype=np.float32)
+    dark, flat = np.full(4, 100.), np.array([500., 500., 500., 100.])
+    sinogram = preprocess(raw, dark, flat)
+    # below the dark, above the flat and on a dead pixel
+    assert np.allclose(sinogram, [-np.log(1e-6), -np.log(1e-6), -np.log(0.5), -np.log(1e-6)])
+    assert np.isfinite(preprocess(raw, dark, flat, max_transmission=None)).all()
+
+def test_rejects_a_wrong_output():
+    raw, dark, flat = make_frames()
+    with pytest.raises(ValueError):
+        preprocess(raw, dark, flat, out=np.empty(raw.shape, dtype=np.float64))
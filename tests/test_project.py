@@ -0,0 +1,23 @@
+import numpy as np
+import pytest
+astra = pytest.importorskip("astra")
+from projections_OhGreat import project
+from projections_OhGreat.project import project_from_2D
+
+def test_threads_are_opt_in(monkeypatch):
+    phantom = np.zeros((32, 32), dtype=np.float32)
+    phantom[8:24, 6:20] = 1.
+    vol_geom = astra.create_vol_geom(phantom.shape)
+    angles = np.linspace(0, np.pi, 12, endpoint=False)
+    proj_id, sino_id, threaded = project_from_2D(phantom, vol_geom, 12, 32, 1., angles,
+                                                n_threads=4)
+    astra.data2d.delete(sino_id)
+    astra.projector.delete(proj_id)
+    # the default is the single astra call
+    def no_threads(*args, **kwargs):
+        raise AssertionError("threaded projection by default")
+    monkeypatch.setattr(project, "ThreadedProjector", no_threads)
+    proj_id, sino_id, sinogram = project_from_2D(phantom, vol_geom, 12, 32, 1., angles)
+    astra.data2d.delete(sino_id)
+    astra.projector.delete(proj_id)
+    assert np.allclose(threaded, sinogram, atol=1e-4)
@@ -0,0 +1,28 @@
+import numpy as np
+import pytest
+
+astra = pytest.importorskip("astra")
+from projections_OhGreat.system_matrix import geometry_key
+
+def test_geometry_key_depends_on_projector_and_geometry_type():
+    vol_geom = astra.create_vol_geom(16, 16)
+    angles = np.linspace(0, np.pi, 10, endpoint=False)
+    parallel = astra.create_proj_geom('parallel', 1., 16, angles)
+    fanflat = astra.create_proj_geom('fanflat', 1., 16, angles, 100., 50.)
+    keys = {geometry_key(parallel, vol_geom, "linear"),
+            geometry_key(parallel, vol_geom, "strip"),
+            geometry_key(fanflat, vol_geom, "line_fanflat")}
+    assert len(keys) == 3
+
+@pytest.mark.parametrize("cache", [False, True])
+def test_dart_matrix_uses_projector_type(tmp_path, cache):
+    from algorithms_OhGreat.DART import DART
+    from projections_OhGreat.system_matrix import system_matrix
+    vol_geom = astra.create_vol_geom(16, 16)
+    proj_geom = astra.create_proj_geom('parallel', 1., 16,
+                                        np.linspace(0, np.pi, 8, endpoint=False))
+    dart = DART([0, 120], 0.85, (16, 16), proj_geom, None, np.zeros((8, 16)), seed=0,
+                projector_type='strip', matrix_cache_dir=str(tmp_path) if cache else None)
+    dart.load_system_matrix()
+    assert abs(dart.W - system_matrix(proj_geom, vol_geom, 'strip')).max() == 0
+    assert abs(dart.W - system_matrix(proj_geom, vol_geom, 'linear')).max() > 0
@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+astra = pytest.importorskip("astra")
+from algorithms_OhGreat import tuning
+from algorithms_OhGreat.tuning import successive_halving, config_grid, make_problem
+
+def make_problems():
+    phantom = np.zeros((24, 24))
+    phantom[6:18, 4:16] = 120
+    phantom[10:14, 8:12] = 0
+    return [make_problem(phantom, n_projections=6, angle_range=120)]
+
+def test_first_round_separates_the_smoothing():
+    configs = config_grid(smoothing=[0., 1.], rec_alg=["SIRT_NUMPY"], rec_iter=[10])
+    _, _, history = successive_halving(make_problems(), configs, min_iters=1, max_iters=2)
+    iters, scores = history[0]
+    assert iters == 2
+    assert scores[0][1] != scores[1][1]
+
+def test_survivors_continue_their_reconstruction(monkeypatch):
+    calls = []
+    evaluate = tuning.evaluate
+    def spy(problem, config, iters, seed=0, x0=None, return_rec=False):
+        calls.append((config["p"], iters, x0 is not None))
+        return evaluate(problem, config, iters, seed, x0, return_rec)
+    monkeypatch.setattr(tuning, "evaluate", spy)
+    configs = config_grid(p=[0.8, 0.85, 0.9, 0.95], rec_alg=["SIRT_NUMPY"], rec_iter=[10])
+    best, score, history = successive_halving(make_problems(), configs,
+                                            min_iters=2, max_iters=8)
+    assert [iters for iters, _ in history] == [2, 4, 8]
+    assert [len(scores) for _, scores in history] == [4, 2, 1]
+    # the later rounds only run the missing iterations, from the previous result
+    assert [(iters, warm) for _, iters, warm in calls] == \
+        [(2, False)] * 4 + [(2, True)] * 2 + [(4, True)]
+    assert best == history[-1][1][0][0] and score == history[-1][1][0][1]
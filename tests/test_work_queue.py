@@ -0,0 +1,59 @@
+import os
+from os.path import exists, join
+from utils_OhGreat.work_queue import WorkQueue
+
+def test_submit_skips_known_jobs(tmp_path):
+    queue = WorkQueue(str(tmp_path))
+    ids = queue.submit_grid("json:dumps", {"obj": [1, 2, 3]}, sort_keys=True)
+    assert queue.submit_grid("json:dumps", {"obj": [1, 2, 3]}, sort_keys=True) == ids
+    assert queue.status()["pending"] == 3
+    # also while the job is running
+    job = queue.claim()
+    queue.submit("json:dumps", job["params"])
+    assert queue.status() == {"pending": 2, "running": 1, "done": 0, "failed": 0}
+
+def test_claim_and_complete(tmp_path):
+    queue = WorkQueue(str(tmp_path))
+    job_id = queue.submit("json:dumps", {"obj": [1, 2]})
+    job = queue.claim()
+    assert job["id"] == job_id and exists(queue.running_path(job))
+    # the claimed job has a fresh heartbeat
+    assert queue.requeue_stale() == 0
+    assert queue.claim() is None
+    assert queue.run_job(job)
+    assert queue.status() == {"pending": 0, "running": 0, "done": 1, "failed": 0}
+    assert next(queue.results())["result"] == "[1, 2]"
+
+def test_failed_job_keeps_its_traceback(tmp_path):
+    queue = WorkQueue(str(tmp_path))
+    queue.submit("json:loads", {"s": "{"})
+    assert not queue.run_job(queue.claim())
+    job = next(queue.results("failed"))
+    assert "JSONDecodeError" in job["error"]
+
+def test_requeued_job_is_not_released_by_its_old_worker(tmp_path):
+    queue = WorkQueue(str(tmp_path), timeout=600)
+    queue.submit("json:dumps", {"obj": 1})
+    lost = queue.claim()
+    # no heartbeat for longer than the timeout
+    os.utime(queue.running_path(lost), (0, 0))
+    assert queue.requeue_stale() == 1
+    assert queue.status()["pending"] == 1
+    job = queue.claim()
+    assert job["id"] == lost["id"] and job["token"] != lost["token"]
+    # the old worker finishes, the claim of the new one stays
+    assert queue.run_job(lost)
+    assert exists(queue.running_path(job))
+    assert queue.status()["running"] == 1
+    assert queue.run_job(job)
+    assert queue.status() == {"pending": 0, "running": 0, "done": 1, "failed": 0}
+
+def test_requeue_only_stale_jobs(tmp_path):
+    queue = WorkQueue(str(tmp_path), timeout=600)
+    for i in range(2):
+        queue.submit("json:dumps", {"obj": i})
+    stale, fresh = queue.claim(), queue.claim()
+    os.utime(queue.running_path(stale), (0, 0))
+    assert queue.requeue_stale() == 1
+    assert exists(join(str(tmp_path), "pending", f"{stale['id']}.json"))
+    assert exists(queue.running_path(fresh))